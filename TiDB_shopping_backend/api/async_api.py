@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Header, Query, status
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_async import get_async_db
+from pagination import set_next_cursor
+from serialization import json_response
+from dependencies.auth import get_current_user_id
+from schemas.order import OrderOut, OrderCreationRequest
+from schemas.product import ProductOut, ProductDetailOut, ErrorDetail
+from services import async_order_service, async_product_service, idempotency_service
+from metrics import ProfiledRoute
+
+# DB_MODE=async 時由 main.py 優先註冊，覆蓋同路徑的同步版路由
+router = APIRouter(prefix="/api", tags=["async"], route_class=ProfiledRoute)
+
+@router.get("/products", response_model=List[ProductOut])
+async def list_products(
+    skip: int = 0,
+    limit: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    body, next_cursor = await async_product_service.list_products(db, category, sort_by, skip, limit, cursor)
+    response = json_response(body)
+    set_next_cursor(response, next_cursor)
+    return response
+
+# 使用 :int 路徑轉換，避免搶走 /products/bestsellers 等同步版路由
+@router.get("/products/{product_id:int}", response_model=ProductDetailOut, responses={404: {"model": ErrorDetail}})
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_product_service.get_product(db, product_id)
+
+@router.post("/orders", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
+async def create_order(
+    order_data: OrderCreationRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency_service.IDEMPOTENCY_HEADER)
+):
+    items = [item.model_dump() for item in order_data.items]
+    return await idempotency_service.run_idempotent_async(
+        db, f"orders:{current_user_id}", idempotency_key, idempotency_service.request_hash(items),
+        lambda claim: async_order_service.place_order(db, current_user_id, items, claim)
+    )
+
+@router.get("/orders", response_model=List[OrderOut])
+async def get_orders(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    orders, next_cursor = await async_order_service.list_orders(db, current_user_id, limit, cursor)
+    response = json_response(orders)
+    set_next_cursor(response, next_cursor)
+    return response
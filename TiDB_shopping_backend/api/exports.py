@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from database import AdminSessionLocal
+from services import export_service
+from metrics import ProfiledRoute
+
+router = APIRouter(prefix="/api", tags=["exports"], route_class=ProfiledRoute)
+
+def get_export_session_factory():
+    # 匯出在 StreamingResponse 內才開始讀取，因此傳入 session factory，由產生器自行建立 / 關閉 session
+    return AdminSessionLocal
+
+@router.get("/admin/export/{dataset}")
+def export_dataset(
+    dataset: Literal["products", "orders", "order_items"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    session_factory=Depends(get_export_session_factory)
+):
+    """
+    📤 管理端：串流匯出商品 / 訂單 / 訂單明細（NDJSON 或 CSV）
+    以伺服器端 cursor 分批讀取並逐批送出，記憶體用量不隨資料量增加；
+    since 可只匯出該時間之後的訂單與訂單明細（供每日對帳增量拉取）
+    """
+    filename = f"{dataset}-{datetime.now():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        export_service.export_stream(session_factory, dataset, format, since),
+        media_type=export_service.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,125 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from database import get_db
-from models import Order, OrderItem, Product
-from models.order import PriceAdjustHistory
+from models import Order
 from schemas import OrderOut, OrderCreationRequest, OrderItemBase
 from schemas.order import OrderOut
-from schemas.order_item import OrderItemOut
-import uuid
-from datetime import datetime
-from sqlalchemy import select
 from dependencies.auth import get_current_user_id
+from services import idempotency_service, order_service
+from pagination import set_next_cursor
+from serialization import json_response, order_dict
+from metrics import ProfiledRoute
 
-router = APIRouter(prefix="/api", tags=["orders"])
+router = APIRouter(prefix="/api", tags=["orders"], route_class=ProfiledRoute)
 
 @router.post("/orders", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
 def create_order(
     order_data: OrderCreationRequest,
     current_user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency_service.IDEMPOTENCY_HEADER)
 ):
-    order_id = str(uuid.uuid4())
-    order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{order_id[:8]}"
-    
-    # 計算 total amount - 從數據庫獲取實際價格
-    total_amount = 0
-    for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough stock for product {product.name}")
-        total_amount += product.price * item.quantity
-    
-    new_order = Order(
-        id=order_id,
-        order_number=order_number,
-        order_date=datetime.utcnow(),
-        total_amount=total_amount,
-        status="PENDING",
-        user_id=current_user_id
-    )
-    db.add(new_order)
-    
-    # 建立訂單項目 & 扣庫存
-    for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        # 產品存在性和庫存已在上面檢查過，但我們需要再次獲取以更新庫存
-        
-        product.stock -= item.quantity
-        already_adjusted = db.query(PriceAdjustHistory).filter_by(product_id=product.id).first()
-        if product.stock < 500 and not already_adjusted:
-            product.price += 10
-            db.add(PriceAdjustHistory(product_id=product.id, adjusted_at=datetime.utcnow()))
-        
-        # 🔥 HTAP 相容：可選的即時更新 sold 欄位（展示即時性）
-        # 注意：真正的 HTAP 不應該依賴這個欄位，而是即時從訂單計算
-        product.sold = (product.sold or 0) + item.quantity
-        
-        order_item = OrderItem(
-            id=str(uuid.uuid4()),
-            order_id=order_id,
-            product_id=product.id,
-            product_name=product.name,
-            quantity=item.quantity,
-            price=product.price  # 使用從數據庫獲取的價格
-        )
-        db.add(order_item)
-
-    # 🚀 HTAP 展示：印出即時分析訊息
-    print(f"📦 訂單 {order_number} 已創建，TiDB HTAP 可即時分析最新銷售數據")
-
-    db.commit()
-    db.refresh(new_order)
-    
-    return OrderOut(
-        id=new_order.id,
-        order_number=new_order.order_number,
-        order_date=new_order.order_date,
-        total_amount=new_order.total_amount,
-        status=new_order.status,
-        user_id=new_order.user_id,
-        items=[
-            OrderItemOut(
-                id=oi.id,
-                product_id=oi.product_id,
-                product_name=oi.product_name,
-                quantity=oi.quantity,
-                price=oi.price
-            ) for oi in new_order.items
-        ]
+    # 帶 Idempotency-Key 重送時直接回傳第一次的回應（標頭 Idempotent-Replayed: true），不會重複扣庫存
+    items = [item.model_dump() for item in order_data.items]
+    return idempotency_service.run_idempotent(
+        db, f"orders:{current_user_id}", idempotency_key, idempotency_service.request_hash(items),
+        lambda claim: order_service.place_order(db, current_user_id, items, claim)
     )
 
 
 @router.get("/orders", response_model=List[OrderOut])
 def get_orders(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
-    orders = db.query(Order).filter(Order.user_id == current_user_id).all()
-    
-    orders_response = []
-    for order in orders:
-        orders_response.append(OrderOut(
-            id=order.id,
-            order_number=order.order_number,
-            order_date=order.order_date,
-            total_amount=order.total_amount,
-            status=order.status,
-            user_id=order.user_id,
-            items=[
-                OrderItemOut(
-                    id=item.id,
-                    product_id=item.product_id,
-                    product_name=item.product_name,
-                    quantity=item.quantity,
-                    price=item.price
-                ) for item in order.items
-            ]
-        ))
-    return orders_response
+    # 未指定 limit 時回傳完整歷史（相容既有前端）；分頁請帶回應標頭 X-Next-Cursor 的值作為 cursor
+    # 直接回傳已序列化的回應，FastAPI 不會再以 response_model 驗證一次
+    orders, next_cursor = order_service.list_orders(db, current_user_id, limit, cursor)
+    response = json_response(orders)
+    set_next_cursor(response, next_cursor)
+    return response
 
 
 @router.get("/orders/{order_id}", response_model=OrderOut)
@@ -132,23 +53,7 @@ def get_order_detail(
     if not order or order.user_id != current_user_id:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    return OrderOut(
-        id=order.id,
-        order_number=order.order_number,
-        order_date=order.order_date,
-        total_amount=order.total_amount,
-        status=order.status,
-        user_id=order.user_id,
-        items=[
-            OrderItemOut(
-                id=item.id,
-                product_id=item.product_id,
-                product_name=item.product_name,
-                quantity=item.quantity,
-                price=item.price
-            ) for item in order.items
-        ]
-    )
+    return json_response(order_dict(order))
 
 @router.post("/orders/{order_id}/cancel", response_model=OrderOut)
 def cancel_order_route(
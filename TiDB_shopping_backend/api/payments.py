@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
+from typing import Optional
 from sqlalchemy.orm import Session
 from database import get_db
+from services import idempotency_service
 from services.payment_service import simulate_payment
 from models.order import Order
 from schemas.order import OrderOut
+from metrics import ProfiledRoute
 
-router = APIRouter(prefix="/api", tags=["Payments"])
+router = APIRouter(prefix="/api", tags=["Payments"], route_class=ProfiledRoute)
 
 @router.post("/payments/simulate/{order_id}", response_model=OrderOut)
 def simulate_order_payment(
     order_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency_service.IDEMPOTENCY_HEADER)
 ):
-    return simulate_payment(order_id=order_id, db=db)
+    # key 的範圍限定在單一訂單：不同訂單的付款請求沿用同一個 key 也不會互相重播
+    return idempotency_service.run_idempotent(
+        db, f"payments:{order_id}", idempotency_key, idempotency_service.request_hash(order_id),
+        lambda claim: simulate_payment(order_id=order_id, db=db, idempotency=claim)
+    )
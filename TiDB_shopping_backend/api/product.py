@@ -1,142 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from database import get_db
+from database import get_db, get_analytics_db, get_admin_db
 from models.product import Product
 from models import Category
-from schemas.product import ProductOut, ProductDetailOut, ErrorDetail
+from schemas.product import ProductOut, ProductDetailOut, ErrorDetail, StockUpdateItem
+from services import catalog_cache, inventory_service, product_service, sold_sync_service
+from pagination import set_next_cursor
+from serialization import json_response, product_dict
+from metrics import ProfiledRoute
 
-router = APIRouter(prefix="/api", tags=["products"])
+router = APIRouter(prefix="/api", tags=["products"], route_class=ProfiledRoute)
+logger = logging.getLogger(__name__)
 
 @router.get("/products", response_model=List[ProductOut])
 def list_products(
     skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = None,
     sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Product)
-
-    # 篩選分類
-    if category:
-        cat = db.query(Category).filter(Category.name == category).first()
-        if (cat):
-            query = query.filter(Product.category_name == cat.name)
-        else:
-            return []
-
-    # 排序
-    if sort_by == "price_asc":
-        query = query.order_by(Product.price.asc())
-    elif sort_by == "price_desc":
-        query = query.order_by(Product.price.desc())
-    elif sort_by == "name_asc":
-        query = query.order_by(Product.name.asc())
-
-    products = query.offset(skip).limit(limit).all()
-    return products
+    # 先讀商品目錄快取，商品被修改時由寫入路徑讓快取失效
+    # 下一頁請帶回應標頭 X-Next-Cursor 的值作為 cursor（keyset 分頁，深頁不需掃描前面的資料）
+    # 快取存的是已序列化的 JSON，命中時直接送出，不經 response_model 驗證與序列化
+    body, next_cursor, _ = catalog_cache.product_lists.get_or_load(
+        (category, sort_by, skip, limit, cursor),
+        lambda: product_service.load_product_list_json(db, category, sort_by, skip, limit, cursor),
+        tags=catalog_cache.list_page_tags(sort_by)
+    )
+    response = json_response(body)
+    set_next_cursor(response, next_cursor)
+    return response
 
 @router.get("/products/bestsellers", response_model=List[ProductOut])
-def read_best_sellers(limit: int = 5, db: Session = Depends(get_db)):
+def read_best_sellers(limit: int = 5, db: Session = Depends(get_analytics_db)):
     """
-    🔥 TiDB HTAP 展示：熱銷排行榜即時分析
-    完全不依賴過時的 sold 欄位，直接從最新交易數據即時計算真實銷量
-    這展現了 TiDB HTAP 的核心價值：無需 ETL，即時分析最新業務數據
+    🔥 熱銷排行榜
+    銷量由訂單建立 / 取消 / 狀態變更以增量方式維護在 product_sales，
+    不再每次掃描全部歷史訂單；可用 /api/admin/leaderboard/reconcile 與完整重算對帳
     """
-    from sqlalchemy import func, distinct, case
-    from models.order_item import OrderItem
-    from models.order import Order
-    
+    from services.leaderboard_service import top_products
+
     try:
-        # 🚀 純 HTAP 查詢：即時從訂單表分析真實銷量
-        htap_query = (
-            db.query(
-                Product,
-                func.coalesce(func.sum(
-                    case(
-                        (Order.status.in_(["PENDING", "paid", "shipped", "delivered"]), OrderItem.quantity),
-                        else_=0
-                    )
-                ), 0).label("real_sales"),
-                func.count(distinct(Order.id)).label("order_count"),
-                func.max(Order.order_date).label("last_sold_date"),
-                func.sum(
-                    case(
-                        (Order.status.in_(["PENDING", "paid", "shipped", "delivered"]), 
-                         OrderItem.quantity * OrderItem.price),
-                        else_=0
-                    )
-                ).label("total_revenue")
-            )
-            .outerjoin(OrderItem, Product.id == OrderItem.product_id)
-            .outerjoin(Order, Order.id == OrderItem.order_id)
-            .group_by(Product.id, Product.name, Product.price, Product.stock, Product.sold, Product.image_url, Product.category_name)
-            .order_by(func.coalesce(func.sum(
-                case(
-                    (Order.status.in_(["PENDING", "paid", "shipped", "delivered"]), OrderItem.quantity),
-                    else_=0
-                )
-            ), 0).desc())
-            .limit(limit)
-        )
-        
-        results = htap_query.all()
-        
-        # 展示 HTAP 分析結果
-        print(f"🔥 TiDB HTAP 即時分析結果：")
-        products = []
-        for product, real_sales, order_count, last_sold, total_revenue in results:
-            print(f"   📊 {product.name}: 實際銷量 {real_sales} (vs 舊sold欄位 {product.sold})")
-            
-            # 動態更新產品的銷量顯示（不修改資料庫，純粹為了展示）
-            product.sold = int(real_sales) if real_sales else 0
-            products.append(product)
-        
-        if any(p.sold > 0 for p in products):
-            print(f"✨ 成功使用 HTAP 分析了 {len([p for p in products if p.sold > 0])} 個有銷量的商品")
-        else:
-            print("📝 目前沒有有效訂單數據，顯示所有商品（銷量為0）")
-            
-        return products
-        
-    except Exception as e:
-        print(f"⚠️ HTAP 查詢異常: {e}")
-        # 極簡備用方案
-        products = db.query(Product).limit(limit).all()
-        for product in products:
-            product.sold = 0  # 重置為0，表示無法計算真實銷量
-        return products
+        results = top_products(db, limit)
+
+        # 以排行榜銷量取代舊的 sold 欄位（不修改資料庫，純粹為了顯示）
+        return json_response([
+            {**product_dict(product), "sold": int(units_sold or 0)}
+            for product, units_sold in results
+        ])
+
+    except Exception:
+        logger.warning("排行榜查詢異常，改用備用清單", exc_info=True)
+        # 極簡備用方案：sold 為 0 表示無法計算真實銷量
+        return json_response([
+            {**product_dict(product), "sold": 0}
+            for product in db.query(Product).limit(limit).all()
+        ])
 
 @router.get("/analytics/sales-trends")
-def get_sales_trends(days: int = 7, db: Session = Depends(get_db)):
+def get_sales_trends(
+    days: int = Query(7, ge=1, le=3650),
+    granularity: Literal["day", "hour"] = "day",
+    db: Session = Depends(get_analytics_db)
+):
     """
     📊 TiDB HTAP 展示：銷售趨勢即時分析
-    展示指定天數內的銷售趨勢，展現 HTAP 的即時分析能力
+    展示指定天數內的銷售趨勢（每日或每小時）；已結束的區間讀取預先彙總的 sales_daily / sales_hourly，
+    只有今天（或這個小時）即時從訂單計算，查詢成本不隨歷史資料增加
     """
-    from sqlalchemy import func, text
-    from datetime import datetime, timedelta
-    from models.order import Order
+    from services.sales_rollup_service import sales_trends
     
     try:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        trends = (
-            db.query(
-                func.date(Order.order_date).label("sale_date"),
-                func.count(Order.id).label("orders_count"),
-                func.sum(Order.total_amount).label("revenue"),
-                func.avg(Order.total_amount).label("avg_order_value")
-            )
-            .filter(Order.order_date >= cutoff_date)
-            .filter(Order.status.in_(["paid", "shipped", "delivered"]))
-            .group_by(func.date(Order.order_date))
-            .order_by("sale_date")
-            .all()
-        )
+        trends = sales_trends(db, days, granularity)
         
-        return {
+        return json_response({
             "status": "success",
             "message": f"TiDB HTAP: 即時分析了最近 {days} 天的銷售趨勢",
             "data": [
@@ -148,7 +92,7 @@ def get_sales_trends(days: int = 7, db: Session = Depends(get_db)):
                 }
                 for trend in trends
             ]
-        }
+        })
         
     except Exception as e:
         return {
@@ -158,35 +102,18 @@ def get_sales_trends(days: int = 7, db: Session = Depends(get_db)):
         }
 
 @router.get("/analytics/product-performance")
-def get_product_performance(limit: int = 10, db: Session = Depends(get_db)):
+def get_product_performance(limit: int = 10, db: Session = Depends(get_analytics_db)):
     """
     🎯 TiDB HTAP 展示：產品效能即時分析
     多維度分析產品銷售表現，展現複雜 OLAP 查詢能力
+    （使用分析連線池，並以 hint 導向 TiFlash）
     """
-    from sqlalchemy import func, distinct
-    from models.order_item import OrderItem
-    from models.order import Order
+    from services.analytics_service import product_performance
     
     try:
-        performance = (
-            db.query(
-                Product.name,
-                Product.price,
-                func.sum(OrderItem.quantity).label("total_sold"),
-                func.sum(OrderItem.quantity * OrderItem.price).label("total_revenue"),
-                func.count(distinct(Order.user_id)).label("unique_customers"),
-                func.count(distinct(Order.id)).label("order_count")
-            )
-            .join(OrderItem, Product.id == OrderItem.product_id)
-            .join(Order, Order.id == OrderItem.order_id)
-            .filter(Order.status.in_(["paid", "shipped", "delivered"]))
-            .group_by(Product.id, Product.name, Product.price)
-            .order_by(func.sum(OrderItem.quantity * OrderItem.price).desc())
-            .limit(limit)
-            .all()
-        )
+        performance = product_performance(db, limit)
         
-        return {
+        return json_response({
             "status": "success", 
             "message": f"TiDB HTAP: 即時分析了 {len(performance)} 個產品的多維度效能",
             "data": [
@@ -201,7 +128,7 @@ def get_product_performance(limit: int = 10, db: Session = Depends(get_db)):
                 }
                 for perf in performance
             ]
-        }
+        })
         
     except Exception as e:
         return {
@@ -215,24 +142,14 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     """
     Fetch product details, including description, from the database.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # 返回產品詳細資訊，包括 description
-    return ProductDetailOut(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price=product.price,
-        image_url=product.image_url,
-        sold=product.sold,
-        stock=product.stock,
-        category_name=product.category_name
+    # 找不到商品時會拋出 404，不會寫入快取
+    return catalog_cache.product_details.get_or_load(
+        product_id,
+        lambda: product_service.load_product_detail(db, product_id)
     )
 
 @router.get("/debug/htap-verification")
-def verify_htap_functionality(db: Session = Depends(get_db)):
+def verify_htap_functionality(db: Session = Depends(get_analytics_db)):
     """
     🔍 HTAP 驗證端點：檢查訂單數據與產品銷量的一致性
     用於驗證 HTAP 查詢是否正確工作
@@ -240,6 +157,7 @@ def verify_htap_functionality(db: Session = Depends(get_db)):
     from sqlalchemy import func
     from models.order_item import OrderItem
     from models.order import Order
+    from services.leaderboard_service import sales_aggregate_query
     
     try:
         # 1. 檢查訂單總數
@@ -248,18 +166,8 @@ def verify_htap_functionality(db: Session = Depends(get_db)):
         # 2. 檢查訂單項目總數
         total_order_items = db.query(func.count(OrderItem.id)).scalar()
         
-        # 3. 檢查各產品的實際銷量
-        product_sales = (
-            db.query(
-                Product.name,
-                Product.sold,
-                func.coalesce(func.sum(OrderItem.quantity), 0).label("actual_sales")
-            )
-            .outerjoin(OrderItem, Product.id == OrderItem.product_id)
-            .outerjoin(Order, Order.id == OrderItem.order_id)
-            .group_by(Product.id, Product.name, Product.sold)
-            .all()
-        )
+        # 3. 檢查各產品的實際銷量（與排行榜對帳共用同一個聚合查詢）
+        product_sales = sales_aggregate_query(db).all()
         
         # 4. 檢查訂單狀態分布
         order_status_count = (
@@ -268,7 +176,7 @@ def verify_htap_functionality(db: Session = Depends(get_db)):
             .all()
         )
         
-        return {
+        return json_response({
             "status": "success",
             "message": "TiDB HTAP 驗證完成",
             "data": {
@@ -288,7 +196,7 @@ def verify_htap_functionality(db: Session = Depends(get_db)):
                     for status in order_status_count
                 ]
             }
-        }
+        })
         
     except Exception as e:
         return {
@@ -299,14 +207,17 @@ def verify_htap_functionality(db: Session = Depends(get_db)):
 
 # 新增管理端庫存維護 API
 @router.get("/admin/products", response_model=List[ProductOut])
-def get_all_products_admin(db: Session = Depends(get_db)):
+def get_all_products_admin(db: Session = Depends(get_admin_db)):
     """
     🔧 管理端：獲取所有商品列表（包括庫存信息）
     用於庫存維護管理
     """
     try:
-        products = db.query(Product).all()
-        return products
+        return json_response(catalog_cache.product_lists.get_or_load(
+            ("admin",),
+            lambda: product_service.load_all_products_json(db),
+            tags=catalog_cache.admin_list_tags
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"獲取商品列表失敗: {str(e)}")
 
@@ -314,12 +225,14 @@ def get_all_products_admin(db: Session = Depends(get_db)):
 def update_product_stock(
     product_id: int,
     new_stock: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_db)
 ):
     """
     🔄 管理端：更新商品庫存
     允許管理員直接修改商品庫存數量
     """
+    from services.stock_service import set_product_stock
+
     try:
         product = db.query(Product).filter(Product.id == product_id).first()
         if not product:
@@ -328,9 +241,9 @@ def update_product_stock(
         if new_stock < 0:
             raise HTTPException(status_code=400, detail="庫存數量不能為負數")
         
-        old_stock = product.stock
-        product.stock = new_stock
+        old_stock = set_product_stock(db, product, new_stock)
         db.commit()
+        catalog_cache.invalidate_products([product_id], lists=False)
         db.refresh(product)
         
         return {
@@ -352,122 +265,121 @@ def update_product_stock(
 
 @router.post("/admin/products/bulk-update-stock")
 def bulk_update_stock(
-    updates: List[dict],  # [{"product_id": 1, "stock": 100}, ...]
-    db: Session = Depends(get_db)
+    updates: List[StockUpdateItem],  # [{"product_id": 1, "stock": 100}, ...]
+    db: Session = Depends(get_admin_db)
 ):
     """
     📦 管理端：批量更新多個商品的庫存
+    每 BULK_STOCK_CHUNK_SIZE 筆一個交易、一句 CASE UPDATE，回傳每一列的處理結果；
+    中途某一批失敗時，回應的 detail 含已寫入的批數與已寫入各列的結果
     """
+    stock_import = inventory_service.StockImport(db)
     try:
-        updated_products = []
-        
-        for update in updates:
-            product_id = update.get("product_id")
-            new_stock = update.get("stock")
-            
-            if product_id is None or new_stock is None:
-                continue
-                
-            if new_stock < 0:
-                continue
-                
-            product = db.query(Product).filter(Product.id == product_id).first()
-            if product:
-                old_stock = product.stock
-                product.stock = new_stock
-                updated_products.append({
-                    "product_id": product_id,
-                    "product_name": product.name,
-                    "old_stock": old_stock,
-                    "new_stock": new_stock
-                })
-        
-        db.commit()
-        
-        return {
-            "status": "success",
-            "message": f"成功更新 {len(updated_products)} 個商品的庫存",
-            "updated_products": updated_products
-        }
+        inventory_service.import_items(stock_import, updates)
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"批量更新庫存失敗: {str(e)}")
+        # 先前的批次已經 commit：回報已寫入的批數與這些列的結果，呼叫端只需重送其餘的列
+        raise HTTPException(status_code=500, detail={
+            "message": f"批量更新庫存失敗: {str(e)}（已寫入 {stock_import.chunks} 批）",
+            "summary": stock_import.summary(),
+            "results": [r.model_dump(exclude_none=True) for r in stock_import.results]
+        })
+
+    updated_products = [
+        {
+            "product_id": r.product_id,
+            "product_name": r.product_name,
+            "old_stock": r.old_stock,
+            "new_stock": r.new_stock
+        }
+        for r in stock_import.results if r.status == "updated"
+    ]
+    return {
+        "status": "success",
+        "message": f"成功更新 {len(updated_products)} 個商品的庫存",
+        "updated_products": updated_products,
+        "summary": stock_import.summary(),
+        "results": [r.model_dump(exclude_none=True) for r in stock_import.results]
+    }
+
+@router.post("/admin/products/bulk-update-stock/csv")
+async def bulk_update_stock_csv(request: Request, db: Session = Depends(get_admin_db)):
+    """
+    📦 管理端：以 CSV 串流上傳批量更新庫存（倉儲同步）
+    request body 直接放 CSV（標題列需含 product_id,stock），邊接收邊解析，
+    每滿一批就在 threadpool 寫入，不必等整個檔案上傳完；回傳摘要與無效 / 找不到的列
+    """
+    stock_import = inventory_service.StockImport(db, keep_all_results=False)
+    try:
+        await inventory_service.import_csv(stock_import, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=500, detail=f"CSV 匯入失敗: {str(e)}（已寫入 {stock_import.chunks} 批）")
+
+    return {
+        "status": "success",
+        "message": f"成功更新 {stock_import.counts['updated']} 個商品的庫存",
+        "summary": stock_import.summary(),
+        "errors": [r.model_dump(exclude_none=True) for r in stock_import.results]
+    }
 
 @router.post("/admin/sync-sold-fields")
-def sync_sold_fields(db: Session = Depends(get_db)):
+def sync_sold_fields(
+    mode: Literal["full", "incremental"] = Query("full", description="full: 全部商品；incremental: 只處理上次成功同步後有銷量變動的商品"),
+    db: Session = Depends(get_admin_db)
+):
     """
-    🔄 管理端：手動同步所有產品的 sold 欄位
-    重新計算所有商品的實際銷量並更新 sold 欄位
+    🔄 管理端：手動同步產品的 sold 欄位
+    以集合式 UPDATE 依實際銷量修正 sold，回傳本次執行的耗時與變更列數
     """
-    from sqlalchemy import func, case
-    from models.order_item import OrderItem
-    from models.order import Order
-    
     try:
-        # 計算所有商品的實際銷量
-        sales_data = (
-            db.query(
-                Product.id,
-                func.coalesce(func.sum(
-                    case(
-                        (Order.status.in_(["PENDING", "paid", "shipped", "delivered"]), OrderItem.quantity),
-                        else_=0
-                    )
-                ), 0).label("actual_sales")
-            )
-            .outerjoin(OrderItem, Product.id == OrderItem.product_id)
-            .outerjoin(Order, Order.id == OrderItem.order_id)
-            .group_by(Product.id)
-            .all()
-        )
-        
-        updated_products = []
-        for product_id, actual_sales in sales_data:
-            product = db.query(Product).filter(Product.id == product_id).first()
-            if product:
-                old_sold = product.sold
-                product.sold = int(actual_sales)
-                updated_products.append({
-                    "product_id": product_id,
-                    "product_name": product.name,
-                    "old_sold": old_sold,
-                    "new_sold": int(actual_sales)
-                })
-        
-        db.commit()
-        
-        return {
-            "status": "success",
-            "message": f"成功同步 {len(updated_products)} 個商品的銷量數據",
-            "updated_products": updated_products
-        }
+        run = sold_sync_service.sync_sold(db, incremental=mode == "incremental")
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"同步銷量數據失敗: {str(e)}")
 
+    return {
+        "status": "success",
+        "message": f"成功同步 {run.rows_changed} 個商品的銷量數據",
+        "run": sold_sync_service.run_to_dict(run)
+    }
+
+
+@router.get("/admin/sync-sold-fields/runs")
+def list_sold_sync_runs(
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_admin_db)
+):
+    """
+    📜 管理端：最近的 sold 同步執行紀錄
+    """
+    return [sold_sync_service.run_to_dict(run) for run in sold_sync_service.recent_runs(db, limit)]
+
 @router.get("/admin/stock-alerts")
 def get_stock_alerts(
     low_stock_threshold: int = 10,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_db)
 ):
     """
     ⚠️ 管理端：獲取庫存預警信息
     顯示庫存不足或缺貨的商品
     """
+    from services.stock_service import effective_stock
+
     try:
-        # 庫存不足的商品
-        low_stock_products = (
-            db.query(Product)
-            .filter(Product.stock <= low_stock_threshold, Product.stock > 0)
-            .all()
-        )
-        
-        # 缺貨商品
-        out_of_stock_products = (
-            db.query(Product)
-            .filter(Product.stock <= 0)
+        # 分片庫存的商品以各分片總和計算
+        shard_totals, stock = effective_stock()
+
+        # 只選需要的欄位、一次查出庫存不足與缺貨的商品，再依庫存分組
+        alerts = (
+            db.query(Product.id, Product.name, Product.price, stock.label("stock"))
+            .outerjoin(shard_totals, shard_totals.c.product_id == Product.id)
+            .filter(stock <= max(low_stock_threshold, 0))
             .all()
         )
+        low_stock_products = [p for p in alerts if 0 < p.stock <= low_stock_threshold]
+        out_of_stock_products = [p for p in alerts if p.stock <= 0]
         
         return {
             "status": "success",
@@ -498,4 +410,99 @@ def get_stock_alerts(
             }
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"獲取庫存預警失敗: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"獲取庫存預警失敗: {str(e)}")
+
+@router.get("/admin/stock-reservation/stats")
+def get_stock_reservation_stats():
+    """
+    📈 管理端：庫存預留衝突統計
+    顯示每個商品的預留次數、寫入衝突次數、重試耗盡次數與衝突率
+    只保留最近有結帳的 STOCK_STATS_MAX_PRODUCTS 個商品
+    """
+    from services.stock_service import stats
+
+    return {
+        "status": "success",
+        "data": stats.snapshot()
+    }
+
+@router.put("/admin/products/{product_id}/stock-shards")
+def configure_stock_shards(
+    product_id: int,
+    shard_count: int = 8,
+    db: Session = Depends(get_admin_db)
+):
+    """
+    🧩 管理端：設定熱銷商品的分片庫存
+    把商品庫存拆成 shard_count 個子計數器，分散結帳時對同一列的寫入；shard_count <= 1 代表關閉分片
+    """
+    from services.stock_service import configure_sharding
+
+    if shard_count > 256:
+        raise HTTPException(status_code=400, detail="分片數量不能超過 256")
+    try:
+        product = db.query(Product).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="商品不存在")
+
+        total_stock = configure_sharding(db, product, shard_count)
+        db.commit()
+        catalog_cache.invalidate_products([product_id], lists=False)
+
+        return {
+            "status": "success",
+            "message": f"商品 '{product.name}' 分片庫存已設定",
+            "data": {
+                "product_id": product_id,
+                "shard_count": shard_count if shard_count > 1 else 0,
+                "total_stock": total_stock
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"設定分片庫存失敗: {str(e)}")
+
+@router.get("/admin/cache/stats")
+def get_cache_stats():
+    """
+    🗃️ 管理端：商品目錄快取統計
+    顯示商品詳細資料與列表快取的命中 / 未命中 / 淘汰次數
+    """
+    return {
+        "status": "success",
+        "data": catalog_cache.stats()
+    }
+
+@router.post("/admin/leaderboard/reconcile")
+def reconcile_leaderboard(repair: bool = False, db: Session = Depends(get_admin_db)):
+    """
+    🧮 管理端：熱銷排行榜對帳
+    以完整重算核對增量維護的銷量；repair=true 時覆寫不一致的資料（首次部署可用來回填歷史訂單）
+    """
+    from services.leaderboard_service import reconcile
+
+    try:
+        result = reconcile(db, repair=repair)
+        return {
+            "status": "success",
+            "message": f"檢查 {result['checked_products']} 個商品，{result['mismatch_count']} 個不一致",
+            "data": result
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"排行榜對帳失敗: {str(e)}")
+
+@router.get("/admin/db-pools")
+def get_db_pool_status():
+    """
+    🔌 管理端：資料庫連線池監控
+    顯示 oltp / analytics / admin 各連線池的使用中連線數、overflow 與取得連線的等待時間
+    """
+    from database import pool_status
+
+    return {
+        "status": "success",
+        "data": pool_status()
+    }
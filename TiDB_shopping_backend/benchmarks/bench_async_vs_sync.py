@@ -0,0 +1,126 @@
+"""
+同步 / 非同步 DB 模式比較：500 個並行客戶端打商品列表與結帳
+
+用法（在 TiDB_shopping_backend 目錄下執行，資料庫需已有商品）：
+    python -m benchmarks.bench_async_vs_sync --clients 500 --duration 20
+
+流程：對 DB_MODE=sync 與 DB_MODE=async 各自啟動一個 uvicorn（單一 worker），
+註冊壓測使用者後，以 --clients 個並行客戶端在 --duration 秒內持續送出請求，
+其中 --checkout-ratio 比例為 POST /api/orders，其餘為 GET /api/products，
+最後列出兩種模式的 req/s 與 p50 / p95 / p99 延遲。
+
+注意：SQL 記錄預設關閉；以 SQL_ECHO=1 啟動時，記錄輸出對兩種模式的吞吐量都有影響（見 benchmarks.bench_logging）。
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_pool_isolation import percentile, register
+
+
+async def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"伺服器未在 {timeout} 秒內啟動：{base_url}")
+
+
+async def drive(base_url, clients, duration, checkout_ratio):
+    limits = httpx.Limits(max_connections=clients + 10, max_keepalive_connections=clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        token = await register(client)
+        product_ids = [p["id"] for p in (await client.get("/api/products", params={"limit": 50})).json()]
+        if not product_ids:
+            raise SystemExit("資料庫沒有商品，請先建立測試資料")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        results = {"list": [], "checkout": []}
+        errors = {"list": 0, "checkout": 0}
+        deadline = time.perf_counter() + duration
+
+        async def worker(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                kind = "checkout" if rng.random() < checkout_ratio else "list"
+                started = time.perf_counter()
+                try:
+                    if kind == "checkout":
+                        resp = await client.post(
+                            "/api/orders",
+                            json={"items": [{"product_id": rng.choice(product_ids), "quantity": 1}]},
+                            headers=headers,
+                        )
+                        ok = resp.status_code in (201, 400)  # 400 = 庫存不足，仍屬正常業務回應
+                    else:
+                        resp = await client.get(
+                            "/api/products",
+                            params={"skip": rng.randrange(0, 40), "limit": 10, "sort_by": "price_asc"},
+                        )
+                        ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                results[kind].append(time.perf_counter() - started)
+                if not ok:
+                    errors[kind] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+        return results, errors, elapsed
+
+
+def report(mode, results, errors, elapsed):
+    total = sum(len(v) for v in results.values())
+    print(f"[{mode}] {total / elapsed:8.1f} req/s over {elapsed:.1f}s")
+    for kind, latencies in results.items():
+        ms = [v * 1000 for v in latencies]
+        print(
+            f"  {kind:<9} n={len(ms):<6} errors={errors[kind]:<5} req/s={len(ms) / elapsed:8.1f} "
+            f"p50={percentile(ms, 50):8.1f}ms p95={percentile(ms, 95):8.1f}ms p99={percentile(ms, 99):8.1f}ms"
+        )
+
+
+def run_mode(mode, args):
+    env = dict(os.environ, DB_MODE=mode)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        report(mode, *asyncio.run(drive(base_url, args.clients, args.duration, args.checkout_ratio)))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20.0, help="每種模式量測秒數")
+    parser.add_argument("--checkout-ratio", type=float, default=0.2, help="結帳請求佔比")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--verbose", action="store_true", help="顯示伺服器 stderr")
+    args = parser.parse_args()
+    for mode in args.modes.split(","):
+        run_mode(mode.strip(), args)
+
+
+if __name__ == "__main__":
+    main()
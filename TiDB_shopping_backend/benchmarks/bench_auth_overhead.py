@@ -0,0 +1,69 @@
+"""
+每個請求的驗證開銷微基準：JWT 驗證與 /api/auth/me 使用者資料查詢，快取前 / 後比較
+
+用法（在 TiDB_shopping_backend 目錄下執行，使用暫存 SQLite，不需連線 TiDB）：
+    python -m benchmarks.bench_auth_overhead --iterations 20000
+
+量測項目：
+- jose decode（原本做法：每次以 secret 字串重新建立 key 並驗證 HMAC）
+- decode_token（預先建立的 key，不讀快取）
+- verify_authorization（快取命中）
+- 使用者資料：每次查 DB vs. user_service.get_profile 快取命中
+"""
+import argparse
+import os
+import tempfile
+import time
+import timeit
+import uuid
+
+
+def per_call_us(func, iterations):
+    func()  # 預熱
+    return timeit.timeit(func, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench_auth.db')}"
+
+    from jose import jwt
+    from sqlalchemy.orm import sessionmaker
+
+    from database import Base, create_db_engine
+    from dependencies.auth import ALGORITHM, SECRET_KEY, decode_token, token_cache, verify_authorization
+    from models import User
+    from services import user_service
+
+    user_id = str(uuid.uuid4())
+    token = jwt.encode({"sub": user_id, "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+    header = f"Bearer {token}"
+
+    results = [
+        ("jose decode (baseline)", per_call_us(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), args.iterations)),
+        ("decode_token (no cache)", per_call_us(lambda: decode_token(token), args.iterations)),
+    ]
+    token_cache.clear()
+    results.append(("verify_authorization (hit)", per_call_us(lambda: verify_authorization(header), args.iterations)))
+
+    bench_engine = create_db_engine(os.environ["DATABASE_URL"], echo=False)
+    Base.metadata.create_all(bind=bench_engine)
+    db = sessionmaker(bind=bench_engine)()
+    db.add(User(id=user_id, name="bench", email="bench@example.com", password="x"))
+    db.commit()
+
+    db_iterations = max(args.iterations // 10, 1)
+    results.append(("profile query (no cache)", per_call_us(lambda: user_service.load_profile(db, user_id), db_iterations)))
+    results.append(("get_profile (hit)", per_call_us(lambda: user_service.get_profile(db, user_id), args.iterations)))
+    db.close()
+
+    for label, us in results:
+        print(f"{label:<30} {us:10.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+日誌等級對吞吐量的影響：同一份資料與請求組合，分別以不同的日誌設定啟動伺服器並量測
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m benchmarks.bench_logging                                   # INFO / DEBUG / DEBUG 不取樣 / SQL_ECHO
+    python -m benchmarks.bench_logging --configs info,debug --clients 100 --duration 30
+    python -m benchmarks.bench_logging --database-url mysql+pymysql://root@127.0.0.1:4000/shop_bench
+
+各設定：
+- info：LOG_LEVEL=INFO（正式環境預設，每個請求不產生日誌）
+- debug：LOG_LEVEL=DEBUG，每個請求一筆 JSON 紀錄，量大時取樣
+- debug-unsampled：同上但關閉取樣（LOG_SAMPLE_THEREAFTER=0）
+- sql-echo：LOG_LEVEL=INFO、SQL_ECHO=1，每一句 SQL 都記錄（等同原本 engine 的 echo=True）
+伺服器日誌寫到暫存檔（而非丟棄），量測包含實際的寫檔成本；結果列出 req/s、延遲與日誌大小。
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from benchmarks.bench_async_vs_sync import wait_until_ready
+from benchmarks.load_suite import drive, parse_mix, seed_database, start_server
+
+CONFIGS = {
+    "info": {"LOG_LEVEL": "INFO"},
+    "debug": {"LOG_LEVEL": "DEBUG"},
+    "debug-unsampled": {"LOG_LEVEL": "DEBUG", "LOG_SAMPLE_THEREAFTER": "0"},
+    "sql-echo": {"LOG_LEVEL": "INFO", "SQL_ECHO": "1"},
+}
+DEFAULT_MIX = "browse=50,detail=35,checkout=10,history=5"
+
+
+def run_config(name: str, args, database_url: str, seeded: dict, log_dir: str) -> dict:
+    log_path = os.path.join(log_dir, f"{name}.log")
+    with open(log_path, "wb") as log_file:
+        server = start_server(args, database_url, env=CONFIGS[name], stderr=log_file)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            result = asyncio.run(drive(base_url, args, seeded))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+    return {**result["totals"], "log_bytes": os.path.getsize(log_path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", default=",".join(CONFIGS), help=f"要比較的設定：{', '.join(CONFIGS)}")
+    parser.add_argument("--database-url", help="預設為新的暫存 SQLite 檔案")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="每個設定的量測秒數")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"預設 {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--output", help="另存 JSON 結果")
+    args = parser.parse_args()
+    args.db_mode, args.verbose = "sync", False
+
+    names = [name.strip() for name in args.configs.split(",")]
+    unknown = set(names) - set(CONFIGS)
+    if unknown:
+        parser.error(f"未知的設定：{', '.join(sorted(unknown))}")
+
+    log_dir = tempfile.mkdtemp(prefix="bench_logging_")
+    database_url = args.database_url or f"sqlite:///{log_dir}/bench.db"
+    seeded = seed_database(database_url, args.products, args.users, args.orders, args.seed)
+
+    results = {}
+    for name in names:
+        results[name] = run_config(name, args, database_url, seeded, log_dir)
+        r = results[name]
+        print(
+            f"{name:<16} {r['throughput_rps']:8.1f} req/s  p50={r['p50_ms']:7.1f}ms p95={r['p95_ms']:7.1f}ms "
+            f"p99={r['p99_ms']:7.1f}ms errors={r['errors']:<4} log={r['log_bytes'] / 1024:9.1f} KiB"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"configs": CONFIGS, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
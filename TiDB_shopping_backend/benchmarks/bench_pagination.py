@@ -0,0 +1,86 @@
+"""
+OFFSET 與 keyset（cursor）分頁的深頁延遲比較
+
+用法（在 TiDB_shopping_backend 目錄下執行；預設使用暫存 SQLite，可用 --database-url 指向 TiDB 測試庫）：
+    python -m benchmarks.bench_pagination --products 1000000 --page 1000 --limit 10
+
+流程：建立 --products 筆商品（已存在足夠資料時略過），對每種 sort_by 量測
+第 1 頁、第 --page 頁以 OFFSET 讀取，以及第 --page 頁以 cursor 讀取的延遲（取 --repeat 次中位數）。
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pagination.db')}"
+    os.environ.setdefault("DATABASE_URL", url)
+
+    from sqlalchemy import func, insert
+    from sqlalchemy.orm import sessionmaker
+
+    from database import Base, create_db_engine
+    from models import Category, Product
+    from pagination import encode_cursor
+    from services.product_service import DEFAULT_PRODUCT_SORT, PRODUCT_SORTS, load_product_list
+
+    bench_engine = create_db_engine(url, echo=False)
+    Base.metadata.create_all(bind=bench_engine)
+    db = sessionmaker(bind=bench_engine)()
+
+    existing = db.query(func.count(Product.id)).scalar()
+    if existing < args.products:
+        if db.get(Category, "bench") is None:
+            db.add(Category(name="bench"))
+            db.commit()
+        start_id = (db.query(func.max(Product.id)).scalar() or 0) + 1
+        chunk = 10_000
+        for offset in range(0, args.products - existing, chunk):
+            rows = [
+                {"id": start_id + offset + i, "name": f"product-{(start_id + offset + i) * 7919 % 1_000_003:07d}",
+                 "price": float((start_id + offset + i) * 37 % 5000), "stock": 100, "sold": 0,
+                 "category_name": "bench"}
+                for i in range(min(chunk, args.products - existing - offset))
+            ]
+            db.execute(insert(Product), rows)
+            db.commit()
+        print(f"已建立 {args.products - existing} 筆商品")
+
+    skip = (args.page - 1) * args.limit
+    print(f"{'sort_by':<12}{'page 1':>12}{f'offset p{args.page}':>16}{f'cursor p{args.page}':>16}")
+    for sort_by in [None, "price_asc", "price_desc", "name_asc"]:
+        columns, descending = PRODUCT_SORTS.get(sort_by, DEFAULT_PRODUCT_SORT)
+        # 直接取得第 page 頁前一筆的排序鍵，模擬客戶端一路翻頁帶回來的 cursor
+        ordering = [c.desc() if descending else c.asc() for c in columns]
+        anchor = db.query(*columns).order_by(*ordering).offset(skip - 1).limit(1).one()
+        mode = f"products:{sort_by or 'id'}:"
+        cursor = encode_cursor(mode, list(anchor))
+
+        first = median_ms(lambda: load_product_list(db, None, sort_by, 0, args.limit), args.repeat)
+        offset_ms = median_ms(lambda: load_product_list(db, None, sort_by, skip, args.limit), args.repeat)
+        cursor_ms = median_ms(lambda: load_product_list(db, None, sort_by, 0, args.limit, cursor), args.repeat)
+        print(f"{sort_by or 'id':<12}{first:>10.2f}ms{offset_ms:>14.2f}ms{cursor_ms:>14.2f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+商品列表查詢：完整 ORM 實體 vs. 只選需要的欄位
+
+用法（在 TiDB_shopping_backend 目錄下執行；預設使用暫存 SQLite，可用 --database-url 指向 TiDB 測試庫）：
+    python -m benchmarks.bench_product_listing --products 100000
+    python -m benchmarks.bench_product_listing --database-url mysql+pymysql://root@127.0.0.1:4000/shop_bench
+
+流程：建立 --products 筆商品（description 長 --description-length 字，已存在足夠資料時略過），
+對管理端完整列表（GET /api/admin/products）與一頁 --limit 筆的商品列表（GET /api/products）
+比較以下讀取方式到輸出 JSON bytes 為止的耗時（--repeat 次中位數）與 tracemalloc 記錄的記憶體峰值：
+- entities + model_validate：讀出完整 Product 實體再 model_validate 成 ProductOut（改版前）
+- entities：讀出完整 Product 實體後投影成 dict
+- load_only：ORM 實體但只載入 ProductOut 欄位（仍經過 identity map）
+- columns：目前的做法，只 SELECT ProductOut 欄位，結果為 Row，不建立實體
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    # 記憶體另外量一次：tracemalloc 會拖慢執行，不與計時混在一起
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--description-length", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100, help="商品列表一頁的筆數")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_product_listing.db')}"
+    os.environ.setdefault("DATABASE_URL", url)
+
+    from typing import List
+
+    from pydantic import TypeAdapter
+    from sqlalchemy import func, insert
+    from sqlalchemy.orm import load_only, sessionmaker
+
+    from database import Base, create_db_engine
+    from models import Category, Product
+    from schemas.product import ProductOut
+    from serialization import dumps, product_dicts
+    from services import product_service
+
+    bench_engine = create_db_engine(url, echo=False)
+    Base.metadata.create_all(bind=bench_engine)
+    Session = sessionmaker(bind=bench_engine)
+
+    with Session() as db:
+        existing = db.query(func.count(Product.id)).scalar()
+        if existing < args.products:
+            if db.get(Category, "bench") is None:
+                db.add(Category(name="bench"))
+                db.commit()
+            start_id = (db.query(func.max(Product.id)).scalar() or 0) + 1
+            chunk = 10_000
+            for offset in range(0, args.products - existing, chunk):
+                rows = [
+                    {"id": pid, "name": f"product-{pid:07d}", "price": float(pid * 37 % 5000) + 0.99,
+                     "image_url": f"https://img.example.com/{pid}.jpg", "stock": pid % 200, "sold": pid % 1000,
+                     "description": (f"product {pid} " * args.description_length)[:args.description_length],
+                     "category_name": "bench"}
+                    for pid in range(start_id + offset, start_id + min(offset + chunk, args.products - existing))
+                ]
+                db.execute(insert(Product), rows)
+                db.commit()
+            print(f"已建立 {args.products - existing} 筆商品")
+        total = db.query(func.count(Product.id)).scalar()
+
+    adapter = TypeAdapter(List[ProductOut])
+    columns = product_service.PRODUCT_LIST_COLUMNS
+
+    def in_session(load):
+        # 每次都用新的 Session，identity map 從空的開始（與每個請求一個 Session 相同）
+        def run():
+            with Session() as db:
+                return load(db)
+        return run
+
+    def page_query(db):
+        return db.query(Product).order_by(Product.id).limit(args.limit)
+
+    cases = {
+        f"admin ({total} rows)": {
+            "entities + model_validate": lambda db: adapter.dump_json([ProductOut.model_validate(p) for p in db.query(Product).all()]),
+            "entities": lambda db: dumps(product_dicts(db.query(Product).all())),
+            "load_only": lambda db: dumps(product_dicts(db.query(Product).options(load_only(*columns)).all())),
+            "columns": product_service.load_all_products_json,
+        },
+        f"page ({args.limit} rows)": {
+            "entities + model_validate": lambda db: adapter.dump_json([ProductOut.model_validate(p) for p in page_query(db).all()]),
+            "entities": lambda db: dumps(product_dicts(page_query(db).all())),
+            "load_only": lambda db: dumps(product_dicts(page_query(db).options(load_only(*columns)).all())),
+            "columns": lambda db: product_service.load_product_list_json(db, None, None, 0, args.limit),
+        },
+    }
+
+    print(f"{'case':<22}{'strategy':<28}{'median ms':>12}{'peak MiB':>12}{'speedup':>10}")
+    for case, strategies in cases.items():
+        baseline = None
+        for name, load in strategies.items():
+            ms, peak = measure(in_session(load), args.repeat)
+            baseline = baseline or ms
+            print(f"{case:<22}{name:<28}{ms:>12.1f}{peak:>12.1f}{baseline / ms:>9.1f}x")
+    bench_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
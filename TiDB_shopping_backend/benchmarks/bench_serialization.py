@@ -0,0 +1,133 @@
+"""
+回應序列化成本：每 1,000 列的耗時（不含查詢）
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --rows 1000 --items 3 --repeat 50
+
+以記憶體中的 ORM 物件（Product；Order 各帶 --items 筆明細）比較各種輸出方式，取 --repeat 次中位數：
+- model_validate + response_model：先在服務層 model_validate，FastAPI 再以 response_model 驗證並輸出（改版前的列表端點）
+- response_model：只由 FastAPI 驗證一次並以 Pydantic 輸出 JSON bytes
+- jsonable_encoder + json：沒有 response_model 時 FastAPI 預設的 JSONResponse 路徑（分析端點）
+- projection + orjson / projection + json：serialization.product_dicts / order_dict 投影後輸出（目前的路徑）
+商品列表另有目錄快取，命中時直接送出快取的 bytes，序列化成本為 0。
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+
+def median_us(func, repeat):
+    func()  # 預熱（Pydantic schema、orjson 初始化）
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return statistics.median(samples)
+
+
+def make_products(rows):
+    from models import Product
+
+    return [
+        Product(id=n, name=f"product-{n:07d}", price=float(n % 5000) + 0.99, image_url=f"https://img.example.com/{n}.jpg",
+                sold=n * 7 % 1000, stock=100, description="d" * 1000, category_name=f"category-{n % 20}")
+        for n in range(1, rows + 1)
+    ]
+
+
+def make_orders(rows, items):
+    from models import Order
+    from models.order_item import OrderItem
+
+    start = datetime(2024, 1, 1)
+    orders = []
+    for n in range(rows):
+        order = Order(id=f"order-{n:09d}", order_number=f"ORD-{n:09d}", order_date=start + timedelta(seconds=n * 37),
+                      total_amount=float(items) * 19.9, status="paid", user_id="gen-user-000000001")
+        order.items = [
+            OrderItem(id=f"item-{n:09d}-{i}", order_id=order.id, product_id=i + 1, product_name=f"product-{i + 1:07d}",
+                      quantity=1, price=19.9)
+            for i in range(items)
+        ]
+        orders.append(order)
+    return orders
+
+
+def strategies(model, objects, project):
+    import serialization
+
+    adapter = TypeAdapter(List[model])
+
+    def validated_twice():
+        models = [model.model_validate(o) for o in objects]
+        return adapter.dump_json(adapter.validate_python(models, from_attributes=True))
+
+    def validated_once():
+        return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+    def encoder_json():
+        return json.dumps(jsonable_encoder([model.model_validate(o) for o in objects])).encode()
+
+    def projected_orjson():
+        return serialization.dumps(project(objects))
+
+    def projected_json():
+        orjson, serialization.orjson = serialization.orjson, None
+        try:
+            return serialization.dumps(project(objects))
+        finally:
+            serialization.orjson = orjson
+
+    result = {
+        "model_validate + response_model": validated_twice,
+        "response_model": validated_once,
+        "jsonable_encoder + json": encoder_json,
+        "projection + json": projected_json,
+    }
+    if serialization.orjson is not None:
+        result["projection + orjson"] = projected_orjson
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="每次序列化的列數")
+    parser.add_argument("--items", type=int, default=3, help="每張訂單的明細數")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    # 只需要 ORM 類別，不會連線；models 匯入時 database 需要 DATABASE_URL
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    import serialization
+    from schemas.order import OrderOut
+    from schemas.product import ProductOut
+
+    cases = {
+        "products": strategies(ProductOut, make_products(args.rows), serialization.product_dicts),
+        "orders": strategies(OrderOut, make_orders(args.rows, args.items),
+                             lambda orders: [serialization.order_dict(o) for o in orders]),
+    }
+    if serialization.orjson is None:
+        print("未安裝 orjson，略過 projection + orjson")
+
+    scale = 1000 / args.rows
+    print(f"{'case':<10}{'strategy':<34}{'ms / 1k rows':>14}{'speedup':>10}")
+    for case, funcs in cases.items():
+        baseline = None
+        for name, func in funcs.items():
+            ms = median_us(func, args.repeat) * scale / 1000
+            baseline = baseline or ms
+            print(f"{case:<10}{name:<34}{ms:>14.3f}{baseline / ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+分片庫存壓測：同一個熱銷商品在不同分片數下的結帳吞吐量
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m benchmarks.bench_sharded_inventory --shards 1,2,4,8,16 --workers 64 --seconds 10
+
+預設連線到 .env 的 DATABASE_URL；可用 --url 指定其他 MySQL / TiDB。
+注意：SQLite 整個資料庫只有一把寫入鎖，分片不會帶來任何提升，只適合確認腳本可以執行。
+壓測會建立一個 id 為 --product-id 的測試商品並寫入訂單資料，請勿對正式資料庫執行。
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_shards.db")
+
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine
+from models import Category, Product, User
+from services import order_service
+from services.stock_service import configure_sharding, stats
+
+BENCH_USER_ID = "bench-shard-user"
+BENCH_CATEGORY = "bench"
+
+
+def prepare(Session, product_id: int, stock: int, shard_count: int):
+    with Session() as db:
+        if not db.get(Category, BENCH_CATEGORY):
+            db.add(Category(name=BENCH_CATEGORY))
+        if not db.get(User, BENCH_USER_ID):
+            db.add(User(id=BENCH_USER_ID, name="bench", email="bench-shard@example.com", password="x"))
+        product = db.get(Product, product_id)
+        if not product:
+            product = Product(id=product_id, name="分片壓測商品", price=1.0, sold=0, category_name=BENCH_CATEGORY)
+            db.add(product)
+        db.flush()
+        # 先收回分片再重新設定，確保每一輪從相同庫存開始
+        configure_sharding(db, product, 1)
+        product.stock = stock
+        configure_sharding(db, product, shard_count)
+        db.commit()
+
+
+def run_round(Session, product_id: int, workers: int, seconds: float):
+    deadline = time.perf_counter() + seconds
+    counts = {"ok": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with Session() as db:
+                try:
+                    order_service.create_order(db, BENCH_USER_ID, [{"product_id": product_id, "quantity": 1}])
+                    key = "ok"
+                except HTTPException:
+                    key = "rejected"
+                except Exception:
+                    key = "errors"
+            with lock:
+                counts[key] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(workers):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+    return counts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--shards", default="1,2,4,8,16", help="逗號分隔的分片數，1 代表不分片")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--product-id", type=int, default=990001)
+    parser.add_argument("--stock", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.url, echo=False, pool_size=args.workers, max_overflow=0, pool_timeout=30)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    print(f"{'shards':>6} {'orders/s':>10} {'ok':>8} {'rejected':>9} {'errors':>7} {'conflict_rate':>14}")
+    for shard_count in [int(n) for n in args.shards.split(",")]:
+        prepare(Session, args.product_id, args.stock, shard_count)
+        stats.reset()
+        counts, elapsed = run_round(Session, args.product_id, args.workers, args.seconds)
+        conflict = next((row["conflict_rate"] for row in stats.snapshot() if row["product_id"] == args.product_id), 0.0)
+        print(
+            f"{shard_count:>6} {counts['ok'] / elapsed:>10.1f} {counts['ok']:>8} "
+            f"{counts['rejected']:>9} {counts['errors']:>7} {conflict:>14.4f}"
+        )
+
+    with Session() as db:
+        configure_sharding(db, db.get(Product, args.product_id), 1)
+        db.commit()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
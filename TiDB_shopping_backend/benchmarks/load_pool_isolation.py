@@ -0,0 +1,128 @@
+"""
+連線池隔離負載測試：分析查詢塞滿 analytics 連線池時，結帳延遲是否維持不變
+
+用法（先在另一個終端機啟動後端：uvicorn main:app --port 8000）：
+    python -m benchmarks.load_pool_isolation --base-url http://localhost:8000 \
+        --orders 200 --order-concurrency 10 --analytics-concurrency 50
+
+流程：
+1. 註冊一個壓測使用者並取得 token
+2. 基準：只送結帳請求，記錄 POST /api/orders 延遲
+3. 同時以高併發持續打 /api/analytics/product-performance 與 /api/analytics/sales-trends，
+   再送同樣數量的結帳請求
+4. 比較兩階段結帳延遲的 p50 / p95 / p99，並列出 /api/admin/db-pools 的等待時間統計
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, latencies, errors):
+    ms = [v * 1000 for v in latencies]
+    print(
+        f"{label:<22} n={len(ms):<5} errors={errors:<4} "
+        f"p50={percentile(ms, 50):8.1f}ms p95={percentile(ms, 95):8.1f}ms "
+        f"p99={percentile(ms, 99):8.1f}ms mean={statistics.mean(ms) if ms else 0:8.1f}ms"
+    )
+
+
+async def register(client):
+    email = f"pool-load-{uuid.uuid4().hex[:8]}@example.com"
+    resp = await client.post("/api/auth/register", json={"name": "pool-load", "email": email, "password": "password123"})
+    resp.raise_for_status()
+    return resp.json()["token"]
+
+
+async def run_orders(client, token, product_ids, total, concurrency):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(product_ids[i % len(product_ids)])
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            product_id = queue.get_nowait()
+            started = time.perf_counter()
+            resp = await client.post(
+                "/api/orders",
+                json={"items": [{"product_id": product_id, "quantity": 1}]},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code != 201:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def run_analytics(client, stop: asyncio.Event, concurrency):
+    counts = {"ok": 0, "errors": 0}
+    paths = ["/api/analytics/product-performance?limit=50", "/api/analytics/sales-trends?days=365"]
+
+    async def worker(n):
+        while not stop.is_set():
+            try:
+                resp = await client.get(paths[n % len(paths)])
+                counts["ok" if resp.status_code == 200 and resp.json().get("status") == "success" else "errors"] += 1
+            except httpx.HTTPError:
+                counts["errors"] += 1
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return counts
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.order_concurrency + args.analytics_concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        token = await register(client)
+        products = (await client.get("/api/products", params={"limit": 20})).json()
+        product_ids = [p["id"] for p in products]
+        if not product_ids:
+            raise SystemExit("資料庫沒有商品，請先建立測試資料")
+
+        latencies, errors = await run_orders(client, token, product_ids, args.orders, args.order_concurrency)
+        summarize("checkout (baseline)", latencies, errors)
+
+        stop = asyncio.Event()
+        analytics = asyncio.create_task(run_analytics(client, stop, args.analytics_concurrency))
+        await asyncio.sleep(args.warmup)
+        latencies, errors = await run_orders(client, token, product_ids, args.orders, args.order_concurrency)
+        stop.set()
+        counts = await analytics
+        summarize("checkout (analytics)", latencies, errors)
+        print(f"analytics requests: ok={counts['ok']} errors={counts['errors']}")
+
+        pools = (await client.get("/api/admin/db-pools")).json()["data"]
+        for name, stats in pools.items():
+            print(
+                f"pool {name:<10} checkouts={stats['checkouts']:<6} timeouts={stats['timeouts']:<4} "
+                f"wait_avg={stats['wait_seconds_avg'] * 1000:.2f}ms wait_max={stats['wait_seconds_max'] * 1000:.2f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--order-concurrency", type=int, default=10)
+    parser.add_argument("--analytics-concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=float, default=2.0, help="分析負載開始後等待幾秒再量測結帳")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+端對端負載測試：以 asyncio 客戶端對 main.app 打真實的請求組合，輸出可跨 commit 比較的 JSON 報告
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m benchmarks.load_suite                                  # 暫存 SQLite、預設資料量與請求組合
+    python -m benchmarks.load_suite --clients 100 --duration 60 --output reports/load-$(git rev-parse --short HEAD).json
+    python -m benchmarks.load_suite --database-url mysql+pymysql://root@127.0.0.1:4000/shop_bench
+    python -m benchmarks.load_suite --mix browse=60,detail=30,checkout=10
+    python -m benchmarks.load_suite --baseline reports/load-main.json   # 與前一次報告比較 p95 / 吞吐量
+
+流程：
+1. 建立資料表並以 scripts.generate_data 寫入 --products / --users / --orders 筆測試資料
+   （最近 90 天、固定大庫存；資料庫已有商品時沿用，不重複寫入），並回填銷售趨勢彙總、排行榜與 sold 欄位
+2. 以 uvicorn 子行程啟動 main:app（單一 worker，指定 --base-url 時改打已啟動的伺服器）
+3. --clients 個客戶端各自登入一個測試使用者，依 --mix 權重隨機選擇動作：
+   browse（商品列表）、detail（商品詳情）、register、login、checkout（下單）、cancel（取消自己的待付款訂單）、
+   history（訂單歷史）、analytics（銷售趨勢 / 商品表現）
+4. --warmup 秒之後的 --duration 秒內計入結果；依路由樣板列出請求數、錯誤數、req/s 與 p50 / p95 / p99，
+   並從 GET /metrics 讀取伺服器端每個請求的平均 SQL 句數與 DB 時間
+
+未指定 --database-url 時每次使用新的暫存 SQLite 檔案（寫入會互相鎖住，數字僅供同環境前後比較）；
+要接近正式環境請指向本機 TiDB / MySQL。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+
+from benchmarks.bench_async_vs_sync import wait_until_ready
+from benchmarks.load_pool_isolation import percentile
+
+DEFAULT_MIX = "browse=40,detail=25,checkout=10,cancel=3,history=7,login=5,register=2,analytics=8"
+SORTS = (None, "price_asc", "price_desc", "name_asc")
+SEED_DAYS = 90
+
+
+# ------------------------------
+# 測試資料
+# ------------------------------
+
+def seed_database(url: str, products: int, users: int, orders: int, seed: int) -> dict:
+    """以 scripts.generate_data 寫入測試資料；資料庫已有商品時直接回傳現有筆數"""
+    # database 模組在匯入時依 DATABASE_URL 建立 engine，需在設定好環境變數之後才匯入
+    os.environ["DATABASE_URL"] = url
+    from sqlalchemy import func
+    from database import AdminSessionLocal, Base, engine
+    from models import Order, Product, User
+    from scripts.generate_data import DatasetConfig, backfill_derived, generate
+
+    Base.metadata.create_all(bind=engine)
+    with AdminSessionLocal() as db:
+        existing = db.query(func.count(Product.id)).scalar()
+        if existing:
+            return {
+                "reused": True,
+                "products": existing,
+                "users": db.query(func.count(User.id)).scalar(),
+                "orders": db.query(func.count(Order.id)).scalar(),
+            }
+
+    # 庫存設為很大的固定值，下單不會因庫存不足而失敗
+    generate(engine, DatasetConfig(
+        products=products, users=users, orders=orders, days=SEED_DAYS, seed=seed, stock=1_000_000
+    ))
+    backfill_derived(AdminSessionLocal, SEED_DAYS)
+    return {"reused": False, "products": products, "users": users, "orders": orders}
+
+
+# ------------------------------
+# 請求組合
+# ------------------------------
+
+class Client:
+    """一個虛擬使用者：自己的 token 與尚未取消的待付款訂單"""
+
+    def __init__(self, http: httpx.AsyncClient, rng: random.Random, products: int, credentials: dict):
+        self.http = http
+        self.rng = rng
+        self.products = products
+        self.credentials = credentials
+        self.headers = {}
+        self.pending_orders = []
+
+    async def login(self):
+        # 重新登入同一個使用者，待付款訂單仍可取消
+        resp = await self.http.post("/api/auth/login", json=self.credentials)
+        if resp.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {resp.json()['token']}"}
+        return "POST /api/auth/login", resp
+
+    async def setup(self, attempts: int = 20):
+        """量測前的登入：bcrypt worker pool 滿載時回 429，稍後重試"""
+        for attempt in range(attempts):
+            _, resp = await self.login()
+            if resp.status_code == 200:
+                return
+            await asyncio.sleep(0.2 * (attempt + 1))
+        raise SystemExit(f"測試使用者 {self.credentials['email']} 無法登入：{resp.status_code} {resp.text}")
+
+    async def browse(self):
+        params = {"skip": self.rng.randrange(0, min(self.products, 200)), "limit": 20}
+        sort_by = self.rng.choice(SORTS)
+        if sort_by:
+            params["sort_by"] = sort_by
+        return "GET /api/products", await self.http.get("/api/products", params=params)
+
+    async def detail(self):
+        product_id = self.rng.randint(1, self.products)
+        return "GET /api/products/{product_id}", await self.http.get(f"/api/products/{product_id}")
+
+    async def register(self):
+        email = f"load-new-{uuid.uuid4().hex[:12]}@example.com"
+        resp = await self.http.post("/api/auth/register", json={**self.credentials, "name": "load", "email": email})
+        return "POST /api/auth/register", resp
+
+    async def checkout(self):
+        items = [
+            {"product_id": self.rng.randint(1, self.products), "quantity": self.rng.randint(1, 2)}
+            for _ in range(self.rng.randint(1, 3))
+        ]
+        resp = await self.http.post("/api/orders", json={"items": items}, headers=self.headers)
+        if resp.status_code == 201:
+            self.pending_orders.append(resp.json()["id"])
+        return "POST /api/orders", resp
+
+    async def cancel(self):
+        if not self.pending_orders:
+            return await self.checkout()
+        order_id = self.pending_orders.pop(self.rng.randrange(len(self.pending_orders)))
+        resp = await self.http.post(f"/api/orders/{order_id}/cancel", headers=self.headers)
+        return "POST /api/orders/{order_id}/cancel", resp
+
+    async def history(self):
+        return "GET /api/orders", await self.http.get("/api/orders", params={"limit": 20}, headers=self.headers)
+
+    async def analytics(self):
+        if self.rng.random() < 0.5:
+            return "GET /api/analytics/sales-trends", await self.http.get(
+                "/api/analytics/sales-trends", params={"days": 30}
+            )
+        return "GET /api/analytics/product-performance", await self.http.get(
+            "/api/analytics/product-performance", params={"limit": 20}
+        )
+
+
+ACTIONS = {
+    "browse": Client.browse,
+    "detail": Client.detail,
+    "register": Client.register,
+    "login": Client.login,
+    "checkout": Client.checkout,
+    "cancel": Client.cancel,
+    "history": Client.history,
+    "analytics": Client.analytics,
+}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"未知的動作 {name!r}，可用：{', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def drive(base_url: str, args, seeded: dict) -> dict:
+    from scripts.generate_data import PASSWORD, user_email  # seed_database 之後才可匯入（見上方）
+
+    limits = httpx.Limits(max_connections=args.clients + 10, max_keepalive_connections=args.clients + 10)
+    names, weights = zip(*args.mix.items())
+    results = {}  # 路由 -> {"latencies": [...], "errors": n, "status_codes": {...}}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as http:
+        clients = [
+            Client(
+                http, random.Random(args.seed + n), seeded["products"],
+                {"email": user_email(n % seeded["users"]), "password": PASSWORD},
+            )
+            for n in range(args.clients)
+        ]
+        # 登入不計入結果
+        await asyncio.gather(*(client.setup() for client in clients))
+
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+
+        async def run(client: Client):
+            while time.perf_counter() < deadline:
+                name = client.rng.choices(names, weights)[0]
+                began = time.perf_counter()
+                try:
+                    route, resp = await ACTIONS[name](client)
+                    status = resp.status_code
+                except httpx.HTTPError as e:
+                    route, status = name, type(e).__name__  # 連線錯誤以動作名稱記錄
+                if began < measure_from:
+                    continue
+                stats = results.setdefault(route, {"latencies": [], "errors": 0, "status_codes": {}})
+                stats["latencies"].append(time.perf_counter() - began)
+                stats["status_codes"][str(status)] = stats["status_codes"].get(str(status), 0) + 1
+                if not isinstance(status, int) or status >= 400:
+                    stats["errors"] += 1
+
+        await asyncio.gather(*(run(client) for client in clients))
+        server = scrape_server_metrics((await http.get("/metrics")).text)
+
+    # 只計入在量測區間內送出的請求，吞吐量以區間長度計算（不含最後等待回應的時間）
+    return summarize(results, args.duration, server)
+
+
+# ------------------------------
+# 報告
+# ------------------------------
+
+_METRIC_LINE = re.compile(r'^(http_request_db_(?:statements|seconds))_(sum|count)\{method="([^"]+)",route="([^"]+)"\} (\S+)$')
+
+
+def scrape_server_metrics(text: str) -> dict:
+    """從 /metrics 取出每個路由的平均 SQL 句數與 DB 時間（包含 warmup 與登入階段的請求）"""
+    raw = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            name, kind, method, route, value = match.groups()
+            raw.setdefault(f"{method} {route}", {})[(name, kind)] = float(value)
+    server = {}
+    for route, values in raw.items():
+        count = values.get(("http_request_db_statements", "count"), 0)
+        if count:
+            server[route] = {
+                "requests": int(count),
+                "db_statements_avg": round(values.get(("http_request_db_statements", "sum"), 0) / count, 2),
+                "db_ms_avg": round(values.get(("http_request_db_seconds", "sum"), 0) / count * 1000, 3),
+            }
+    return server
+
+
+def summarize(results: dict, elapsed: float, server: dict) -> dict:
+    routes = {}
+    for route, stats in sorted(results.items()):
+        ms = [v * 1000 for v in stats["latencies"]]
+        routes[route] = {
+            "requests": len(ms),
+            "errors": stats["errors"],
+            "throughput_rps": round(len(ms) / elapsed, 2),
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+            "max_ms": round(max(ms), 2) if ms else 0.0,
+            "status_codes": stats["status_codes"],
+            "server": server.get(route),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    all_ms = [v * 1000 for stats in results.values() for v in stats["latencies"]]
+    return {
+        "totals": {
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "duration_seconds": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2),
+            "p50_ms": round(percentile(all_ms, 50), 2),
+            "p95_ms": round(percentile(all_ms, 95), 2),
+            "p99_ms": round(percentile(all_ms, 99), 2),
+        },
+        "routes": routes,
+    }
+
+
+def git_revision() -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def print_report(report: dict, baseline: dict = None):
+    totals = report["totals"]
+    print(f"{totals['throughput_rps']:.1f} req/s, {totals['requests']} requests, {totals['errors']} errors "
+          f"over {totals['duration_seconds']:.1f}s")
+    for route, r in report["routes"].items():
+        line = (
+            f"  {route:<42} n={r['requests']:<6} err={r['errors']:<4} req/s={r['throughput_rps']:8.1f} "
+            f"p50={r['p50_ms']:8.1f}ms p95={r['p95_ms']:8.1f}ms p99={r['p99_ms']:8.1f}ms"
+        )
+        if r["server"]:
+            line += f" sql={r['server']['db_statements_avg']:.1f}"
+        old = (baseline or {}).get("routes", {}).get(route)
+        if old and old["p95_ms"] and old["throughput_rps"]:
+            line += (
+                f"  | p95 {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+6.1f}%"
+                f" req/s {(r['throughput_rps'] / old['throughput_rps'] - 1) * 100:+6.1f}%"
+            )
+        print(line)
+
+
+def start_server(args, database_url: str, env: dict = None, stderr=None):
+    """env 為額外的環境變數；stderr 預設丟棄（--verbose 時顯示），可傳入檔案以保留伺服器日誌"""
+    env = dict(os.environ, DATABASE_URL=database_url, DB_MODE=args.db_mode, **(env or {}))
+    if stderr is None:
+        stderr = None if args.verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="預設為新的暫存 SQLite 檔案")
+    parser.add_argument("--base-url", help="改打已啟動的伺服器（資料庫需與 --database-url 相同）")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=20000, help="預先寫入的歷史訂單數")
+    parser.add_argument("--clients", type=int, default=50, help="並行客戶端數")
+    parser.add_argument("--duration", type=float, default=30.0, help="量測秒數")
+    parser.add_argument("--warmup", type=float, default=5.0, help="開始量測前的暖機秒數")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"動作權重，預設 {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=42, help="測試資料與請求組合的亂數種子")
+    parser.add_argument("--db-mode", choices=("sync", "async"), default="sync")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", default="load_report.json", help="JSON 報告路徑")
+    parser.add_argument("--baseline", help="前一次的 JSON 報告，列出 p95 與吞吐量的變化")
+    parser.add_argument("--verbose", action="store_true", help="顯示伺服器 stderr")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='load_suite_')}/load.db"
+    seeded = seed_database(database_url, args.products, args.users, args.orders, args.seed)
+    print(f"seed: {seeded}")
+
+    server = None if args.base_url else start_server(args, database_url)
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        result = asyncio.run(drive(base_url, args, seeded))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "database": database_url.split(":", 1)[0],
+            "db_mode": args.db_mode,
+            "clients": args.clients,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "dataset": seeded,
+        **result,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"report: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
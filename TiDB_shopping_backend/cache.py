@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    執行緒安全的行程內 LRU + TTL 快取
+    超過 maxsize 時淘汰最久未使用的項目，每個項目在 ttl 秒後過期（可逐筆指定 ttl）
+    寫入時可附帶 tags（例如列表頁包含的商品 id），invalidate_tags() 只讓帶有這些 tag 的項目失效
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        # key -> (到期時間, 值, tags)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        # 每次失效都遞增；get_or_load 讀取期間若有失效，讀到的值可能已過時，不寫入快取
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            tags: Iterable[Hashable] = (), generation: Optional[int] = None) -> bool:
+        """
+        寫入快取；指定 generation（讀取前由 generation() 取得）時，
+        若之後發生過失效就不寫入並回傳 False，避免把失效前讀到的舊資料寫回快取
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+            return True
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None,
+                    tags: Optional[Callable[[Any], Iterable[Hashable]]] = None) -> Any:
+        """
+        命中時直接回傳；未命中時呼叫 loader() 讀取並寫入快取（loader 拋出例外時不寫入）
+        tags(value) 回傳該項目的 tags；讀取期間若有其他執行緒讓快取失效，這次讀到的值只回傳、不寫入
+        """
+        generation = self.generation()
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl, tags(value) if tags else (), generation)
+        return value
+
+    def _remove(self, key: Hashable) -> None:
+        # 呼叫端需持有 self._lock
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tags(self, tags: Iterable[Hashable]) -> int:
+        """讓帶有任一 tag 的項目失效，回傳失效的項目數"""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+from dotenv import load_dotenv
+
+# 沒有設定 .env 時，讓 database 模組可以用本地 SQLite 替身匯入
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite:///./local_test.db")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import models  # noqa: F401  註冊所有資料表
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """每個測試使用獨立的 SQLite 檔案資料庫（以檔案形式才能跨執行緒併發）"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
@@ -1,34 +1,193 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+import metrics
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-# 確保使用 SSL 憑證（TLS）連線 TiDB Cloud
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={
+def _connect_args(url: str) -> dict:
+    # 本地 SQLite 替身（測試 / 壓測用）不需要 TLS，並允許跨執行緒使用連線
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False}
+    # 確保使用 SSL 憑證（TLS）連線 TiDB Cloud
+    return {
         "ssl": {
             "ca": os.path.join(os.path.dirname(__file__), "isrgrootx1.pem")
         },
         "connect_timeout": 3  # connection timeout in seconds
-    },
-    echo=True,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_timeout=5  # wait max 5s for pool before error
-)
+    }
 
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+class PoolMetrics:
+    """記錄向連線池取得連線時的等待時間與逾時次數（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / attempts, 6) if attempts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool 加上取得連線的等待時間統計"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        waited = time.perf_counter() - started
+        self.metrics.record(waited)
+        metrics.record_pool_wait(waited)
+        return connection
+
+
+def create_db_engine(url: str, **overrides):
+    """依連線字串建立 engine，overrides 可覆寫預設的連線池設定"""
+    options = dict(
+        connect_args=_connect_args(url),
+        echo=False,  # SQL 記錄改由 logging 設定（SQL_ECHO=1 / LOG_LEVELS），見 logging_config.py
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_timeout=5  # wait max 5s for pool before error
+    )
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+# ------------------------------
+# 具名連線池
+# oltp：結帳 / 商品頁等線上交易；analytics：HTAP 報表；admin：管理端維護作業
+# 各自獨立，慢的分析查詢不會佔滿結帳用的連線。可用環境變數調整：
+#   DB_POOL_<NAME>_URL / _SIZE / _MAX_OVERFLOW / _TIMEOUT（例如 DB_POOL_ANALYTICS_SIZE=8）
+# ------------------------------
+POOL_DEFAULTS = {
+    "oltp": {"size": 10, "max_overflow": 10, "timeout": 5},
+    "analytics": {"size": 5, "max_overflow": 5, "timeout": 5},
+    "admin": {"size": 3, "max_overflow": 2, "timeout": 10},
+}
+
+# TiDB 分析連線允許讀取的儲存引擎：預設保留 tikv，沒有 TiFlash replica 的資料表（例如 product_sales）
+# 與走索引的 top-N 查詢（熱銷排行榜）照常可用；整表聚合由各查詢的 READ_FROM_STORAGE(TIFLASH[...]) hint 導向 TiFlash。
+# 所有分析用到的資料表都已建立 TiFlash replica 時，可設為 "tidb,tiflash" 強制只讀 TiFlash
+TIDB_ANALYTICS_READ_ENGINES = os.getenv("TIDB_ANALYTICS_READ_ENGINES", "tidb,tiflash,tikv")
+
 
-def get_db():
-    db = SessionLocal()
+def _pool_setting(name: str, key: str, default):
+    return type(default)(os.getenv(f"DB_POOL_{name.upper()}_{key.upper()}", default))
+
+
+def _build_engine(name: str):
+    defaults = POOL_DEFAULTS[name]
+    return create_db_engine(
+        os.getenv(f"DB_POOL_{name.upper()}_URL", SQLALCHEMY_DATABASE_URL),
+        pool_size=_pool_setting(name, "size", defaults["size"]),
+        max_overflow=_pool_setting(name, "max_overflow", defaults["max_overflow"]),
+        pool_timeout=_pool_setting(name, "timeout", defaults["timeout"]),
+    )
+
+
+engines = {name: _build_engine(name) for name in POOL_DEFAULTS}
+engine = engines["oltp"]
+analytics_engine = engines["analytics"]
+admin_engine = engines["admin"]
+
+@event.listens_for(analytics_engine, "connect")
+def _configure_analytics_session(dbapi_connection, connection_record):
+    # 只有 TiDB 支援 tidb_isolation_read_engines；MySQL / SQLite 直接略過
+    if analytics_engine.dialect.name != "mysql":
+        return
+    cursor = dbapi_connection.cursor()
     try:
-        yield db
+        cursor.execute("SELECT VERSION()")
+        if "TiDB" in str(cursor.fetchone()[0]):
+            cursor.execute("SET SESSION tidb_isolation_read_engines = %s", (TIDB_ANALYTICS_READ_ENGINES,))
     finally:
-        db.close()
\ No newline at end of file
+        cursor.close()
+
+
+session_factories = {
+    name: sessionmaker(autocommit=False, autoflush=False, bind=bound)
+    for name, bound in engines.items()
+}
+SessionLocal = session_factories["oltp"]
+AnalyticsSessionLocal = session_factories["analytics"]
+AdminSessionLocal = session_factories["admin"]
+Base = declarative_base()
+
+
+def pool_dependency(name: str):
+    """產生使用指定連線池的 FastAPI dependency"""
+    factory = session_factories[name]
+
+    def dependency():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    dependency.__name__ = f"get_{name}_db"
+    return dependency
+
+get_db = pool_dependency("oltp")
+get_analytics_db = pool_dependency("analytics")
+get_admin_db = pool_dependency("admin")
+
+
+def pool_status() -> dict:
+    """各連線池目前的使用狀況與等待時間統計"""
+    status = {}
+    for name, bound in engines.items():
+        pool = bound.pool
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),  # QueuePool 在連線數未滿 pool_size 前為負值
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+            **pool.metrics.snapshot(),
+        }
+    return status
@@ -0,0 +1,60 @@
+"""
+非同步資料庫存取（DB_MODE=async 時由 main.py 載入）
+
+以 SQLAlchemy AsyncSession 搭配 aiomysql（TiDB / MySQL）或 aiosqlite（本地 SQLite 替身），
+連線等待期間不會佔用 Starlette threadpool 的 worker。
+"""
+import os
+import ssl
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database import POOL_DEFAULTS, SQLALCHEMY_DATABASE_URL, _pool_setting
+
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def to_async_url(url: str):
+    """把同步連線字串（mysql+pymysql / sqlite）換成對應的 async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"DB_MODE=async 不支援的資料庫: {backend}")
+    # TLS 設定改由 connect_args 的 SSLContext 提供
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).difference_update_query(
+        ["ssl_ca", "ssl_verify_cert", "ssl_verify_identity"]
+    )
+
+
+def _async_connect_args(url) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {}
+    # 確保使用 SSL 憑證（TLS）連線 TiDB Cloud
+    context = ssl.create_default_context(cafile=os.path.join(os.path.dirname(__file__), "isrgrootx1.pem"))
+    return {"ssl": context, "connect_timeout": 3}
+
+
+def create_async_db_engine(url: str, **overrides):
+    async_url = to_async_url(url)
+    defaults = POOL_DEFAULTS["oltp"]
+    options = dict(
+        connect_args=_async_connect_args(async_url),
+        echo=False,  # SQL 記錄改由 logging 設定（SQL_ECHO=1 / LOG_LEVELS），見 logging_config.py
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=_pool_setting("oltp", "size", defaults["size"]),
+        max_overflow=_pool_setting("oltp", "max_overflow", defaults["max_overflow"]),
+        pool_timeout=_pool_setting("oltp", "timeout", defaults["timeout"]),
+    )
+    options.update(overrides)
+    return create_async_engine(async_url, **options)
+
+
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,50 +1,76 @@
+import os
+import time
 from fastapi import Header, HTTPException, status
 from typing import Optional
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
 from datetime import datetime
 
+from cache import TTLCache
+
 # JWT settings (should match main.py)
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
 
-# --- JWT Authentication ---
-async def get_current_user_id(authorization: Optional[str] = Header(None)) -> str:
-    if not authorization:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated (missing token)",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    parts = authorization.split()
-    if parts[0].lower() != "bearer" or len(parts) != 2:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token format",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    token = parts[1]
-    
-    # JWT token validation
+# 預先建立 HMAC key 物件，省去每次 decode 時重新 construct
+VERIFY_KEY = jwk.construct(SECRET_KEY, ALGORITHM)
+
+# 已驗證 token → user_id 的快取；每筆最多保留 AUTH_TOKEN_CACHE_TTL 秒，且不超過 token 的 exp
+# AUTH_TOKEN_CACHE_TTL=0 可停用
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+token_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")),
+    ttl=AUTH_TOKEN_CACHE_TTL,
+    name="auth_tokens",
+)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_token(token: str) -> str:
+    """驗證 JWT 簽章與 exp，回傳 sub（user_id）；有 exp 的 token 會寫入快取直到過期"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, VERIFY_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise JWTError("Token payload missing 'sub' field")
-        
+    except JWTError:
+        raise _unauthorized("Could not validate credentials")
+    except Exception:
+        raise _unauthorized("Invalid token")
+
+    if AUTH_TOKEN_CACHE_TTL > 0:
+        exp = payload.get("exp")
+        # 沒有 exp 的 token 不快取，避免撤銷前無限期有效
+        if isinstance(exp, (int, float)):
+            ttl = min(AUTH_TOKEN_CACHE_TTL, exp - time.time())
+            if ttl > 0:
+                token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+
+def verify_authorization(authorization: Optional[str]) -> str:
+    if not authorization:
+        raise _unauthorized("Not authenticated (missing token)")
+
+    parts = authorization.split()
+    if parts[0].lower() != "bearer" or len(parts) != 2:
+        raise _unauthorized("Invalid token format")
+
+    token = parts[1]
+    user_id = token_cache.get(token)
+    if user_id is not None:
         return user_id
-    except JWTError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-# --- Mock API Endpoints ---
\ No newline at end of file
+    return decode_token(token)
+
+
+# --- JWT Authentication ---
+async def get_current_user_id(authorization: Optional[str] = Header(None)) -> str:
+    return verify_authorization(authorization)
+
+# --- Mock API Endpoints ---
@@ -0,0 +1,177 @@
+"""
+結構化日誌設定（main.py 啟動時呼叫 configure_logging()）
+
+- 格式：LOG_FORMAT=json（預設，一行一筆 JSON，extra= 傳入的欄位會一併輸出）或 text
+- 等級：LOG_LEVEL 為全域等級（預設 INFO）；LOG_LEVELS 逐模組覆寫，例如
+    LOG_LEVELS="services.outbox_service=DEBUG,sqlalchemy.engine=INFO"
+  SQLAlchemy 預設為 WARNING；SQL_ECHO=1 等同 sqlalchemy.engine=INFO（取代原本 engine 的 echo=True）
+- 不阻塞：呼叫端只把紀錄放進有上限的佇列（LOG_QUEUE_SIZE），由背景執行緒格式化並寫到 stderr；
+  佇列滿時直接丟棄並計數，請求執行緒不會等待 I/O
+- 取樣：同一個 logger + 訊息樣板在每個 LOG_SAMPLE_PERIOD 秒內，前 LOG_SAMPLE_INITIAL 筆照常輸出，
+  之後每 LOG_SAMPLE_THEREAFTER 筆輸出一筆（0 表示不取樣）；WARNING 以上一律輸出
+stats() 回傳丟棄與取樣略過的筆數。
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_PERIOD = float(os.getenv("LOG_SAMPLE_PERIOD", "1"))
+LOG_SAMPLE_INITIAL = int(os.getenv("LOG_SAMPLE_INITIAL", "100"))
+LOG_SAMPLE_THEREAFTER = int(os.getenv("LOG_SAMPLE_THEREAFTER", "100"))
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+# LogRecord 本身的屬性，其餘（extra=）視為結構化欄位
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """依 (logger, 訊息樣板) 計數的取樣，執行在呼叫端執行緒，只做字典查詢與加法"""
+
+    def __init__(self, period: float, initial: int, thereafter: int):
+        super().__init__()
+        self.period = period
+        self.initial = initial
+        self.thereafter = thereafter
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, list] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.thereafter <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.period:
+                if len(self._counters) > 10000:
+                    self._counters.clear()
+                counter = self._counters[key] = [now, 0]
+            counter[1] += 1
+            count = counter[1]
+            if count <= self.initial or (count - self.initial) % self.thereafter == 0:
+                return True
+            self.dropped += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """佇列滿時丟棄紀錄（不等待、不印 traceback）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 呼叫端只組好訊息（args 之後可能被修改）並把例外轉成文字，JSON 格式化交給背景執行緒
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_exception_formatter = logging.Formatter()
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_sampler: Optional[SamplingFilter] = None
+
+
+def parse_levels(text: str) -> Dict[str, str]:
+    levels = {}
+    for part in text.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = None, levels: str = None, fmt: str = None, stream=None) -> None:
+    """設定 root logger（可重複呼叫，後一次的設定取代前一次）"""
+    global _handler, _listener, _sampler
+    shutdown()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if (fmt or LOG_FORMAT) == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _sampler = SamplingFilter(LOG_SAMPLE_PERIOD, LOG_SAMPLE_INITIAL, LOG_SAMPLE_THEREAFTER)
+    _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(_sampler)
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(level or LOG_LEVEL)
+
+    # SQLAlchemy 預設只記錄警告；SQL_ECHO=1 或 LOG_LEVELS 指定時才記錄每一句 SQL
+    # （連線池的 logger 以 pool 類別命名，database.InstrumentedQueuePool 不在 sqlalchemy 之下）
+    module_levels = {"sqlalchemy": "WARNING", "database.InstrumentedQueuePool": "WARNING"}
+    if SQL_ECHO:
+        module_levels["sqlalchemy.engine"] = "INFO"
+    module_levels.update(parse_levels(LOG_LEVELS if levels is None else levels))
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def shutdown() -> None:
+    """停止背景執行緒並寫出佇列內剩餘的紀錄"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats() -> dict:
+    return {
+        "queue_size": _handler.queue.qsize() if _handler else 0,
+        "dropped_queue_full": _handler.dropped if _handler else 0,
+        "dropped_sampled": _sampler.dropped if _sampler else 0,
+    }
+
+
+atexit.register(shutdown)
@@ -6,22 +6,50 @@ from typing import List, Optional, Dict
 import uuid # For generating a mock user ID
 import time # For generating a mock token (very basic)
 from datetime import datetime # For order date
-from database import engine, SessionLocal, get_db
+from contextlib import asynccontextmanager
+import logging
+import logging_config
+from database import engine, SessionLocal, get_db, get_admin_db, pool_status
 from database import Base
-from api import orders, payments, product
+from api import orders, payments, product, exports
 from models import order_item, order, User, Product, Category
 from api import items
-from dependencies.auth import get_current_user_id
+from dependencies.auth import get_current_user_id, token_cache
+from services import outbox_service, user_service
 from sqlalchemy.orm import Session
-from utils import hash_password, verify_password
+from utils import password_pool
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import metrics
+from metrics import MetricsMiddleware, ProfiledRoute
 from typing import Optional
+import os
+
+logging_config.configure_logging()
+logger = logging.getLogger(__name__)
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(redirect_slashes=False)
+# DB_MODE=async：商品列表 / 詳情與下單改走 AsyncSession（aiomysql / aiosqlite），其餘路由維持同步
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 訂單副作用（sold / 排行榜 / 銷售趨勢）由 outbox worker 在背景批次處理
+    if outbox_service.OUTBOX_WORKER_ENABLED:
+        outbox_service.worker.start()
+    yield
+    await outbox_service.worker.stop()
+
+
+app = FastAPI(redirect_slashes=False, lifespan=lifespan)
+# 直接定義在 app 上的路由也可以被取樣 profiler 量測（需在下方 @app.get 等裝飾器之前設定）
+app.router.route_class = ProfiledRoute
+# 每個請求的延遲 / SQL 句數 / DB 時間 / 連線池等待，由 GET /metrics 輸出
+app.add_middleware(MetricsMiddleware)
 # ------------------------------
 # 🔧 CORS 中介層設定
 # 這段設定允許前端從不同的網域（如 http://localhost:3000）存取後端 API。
@@ -34,11 +62,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],  # keyset 分頁的下一頁 cursor、重送請求的回應標記
 )
+if DB_MODE == "async":
+    from api import async_api
+    # 需在同步版之前註冊，才會優先匹配相同路徑
+    app.include_router(async_api.router)
 app.include_router(orders.router)
 #app.include_router(users.router)
 app.include_router(product.router)
 app.include_router(payments.router)
+app.include_router(exports.router)
 app.include_router(items.router)
 # --- Pydantic Models ---
 
@@ -184,9 +218,11 @@ def register_user(
     existing_user = db.query(User).filter(User.email == registration_data.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email 已註冊")
+    # 先結束唯讀交易、歸還連線，等待 bcrypt 期間不佔用 OLTP 連線池（寫入時再重新取得連線）
+    db.rollback()
 
-    # 雜湊密碼
-    hashed_pw = hash_password(registration_data.password)
+    # 雜湊密碼（交由 bcrypt worker pool，佇列滿時回 429）
+    hashed_pw = password_pool.hash(registration_data.password)
 
     # 建立新 User
     user_id = str(uuid.uuid4())
@@ -217,12 +253,18 @@ def register_user(
 
 @app.post("/api/auth/login", response_model=AuthSuccessResponse, status_code=status.HTTP_200_OK)
 def login_user(login_data: UserLoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
+    # 只取需要的欄位（Row 不會在 rollback 後過期），查完即歸還連線，等待 bcrypt 期間不佔用 OLTP 連線池
+    user = (
+        db.query(User.id, User.name, User.email, User.password)
+        .filter(User.email == login_data.email)
+        .first()
+    )
+    db.rollback()
 
     if not user:
         raise HTTPException(status_code=401, detail="帳號不存在")
 
-    if not verify_password(login_data.password, user.password):
+    if not password_pool.verify(login_data.password, user.password):
         raise HTTPException(status_code=401, detail="密碼錯誤")
 
     token = create_access_token(user.id)
@@ -238,6 +280,94 @@ def login_user(login_data: UserLoginRequest, db: Session = Depends(get_db)):
     )
 
 
+@app.get("/api/admin/auth/password-pool")
+def get_password_pool_stats():
+    """
+    🔐 密碼雜湊 worker pool 統計：排隊 / 計算時間、429 拒絕次數
+    """
+    return {"status": "success", "data": password_pool.stats()}
+
+
+@app.get("/api/admin/auth/cache-stats")
+def get_auth_cache_stats():
+    """
+    🔑 JWT 驗證快取與使用者資料快取的命中率統計
+    """
+    return {
+        "status": "success",
+        "data": {
+            "auth_tokens": token_cache.stats(),
+            "user_profiles": user_service.user_profiles.stats(),
+        },
+    }
+
+
+@app.get("/api/admin/outbox/stats")
+def get_outbox_stats(db: Session = Depends(get_admin_db)):
+    """
+    📦 訂單事件 outbox：未處理事件數、worker 延遲與批次大小
+    """
+    return {
+        "status": "success",
+        "data": {
+            "worker": outbox_service.worker.stats(),
+            "backlog": outbox_service.backlog(db),
+        },
+    }
+
+
+def _pool_metrics():
+    status = pool_status()
+    lines = []
+    for name, key, kind in (
+        ("db_pool_checked_out", "checked_out", "gauge"),
+        ("db_pool_overflow", "overflow", "gauge"),
+        ("db_pool_size", "size", "gauge"),
+        ("db_pool_checkouts_total", "checkouts", "counter"),
+        ("db_pool_timeouts_total", "timeouts", "counter"),
+        ("db_pool_wait_seconds_total", "wait_seconds_total", "counter"),
+    ):
+        lines += metrics.gauge_lines(
+            name, f"Connection pool {key.replace('_', ' ')}",
+            {(pool,): values[key] for pool, values in status.items()}, ("pool",), kind,
+        )
+    return lines
+
+
+def _outbox_metrics():
+    snapshot = outbox_service.worker.stats()
+    lines = []
+    for name, key, kind in (
+        ("outbox_events_total", "events", "counter"),
+        ("outbox_failures_total", "failures", "counter"),
+        ("outbox_last_lag_seconds", "last_lag_seconds", "gauge"),
+    ):
+        lines += metrics.gauge_lines(name, f"Outbox worker {key.replace('_', ' ')}", {(): snapshot[key]}, kind=kind)
+    return lines
+
+
+def _logging_metrics():
+    snapshot = logging_config.stats()
+    return metrics.gauge_lines(
+        "log_records_dropped_total", "Log records dropped by sampling or a full queue",
+        {("sampled",): snapshot["dropped_sampled"], ("queue_full",): snapshot["dropped_queue_full"]},
+        ("reason",), "counter",
+    )
+
+
+metrics.register_collector(_pool_metrics)
+metrics.register_collector(_outbox_metrics)
+metrics.register_collector(_logging_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    📈 Prometheus 格式的請求延遲、每請求 SQL 句數 / DB 時間 / 列數、連線池與 outbox 狀態
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/auth/logout")
 def logout():
     """
@@ -252,17 +382,13 @@ def get_current_user(
     current_user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
-    print(f"後端查詢：使用者 {current_user_id} 請求當前登入資訊...")
+    logger.debug("查詢目前登入使用者", extra={"user_id": current_user_id})
 
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
+    profile = user_service.get_profile(db, current_user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="使用者不存在")
 
-    return UserResponse(
-        id=user.id,
-        name=user.name,
-        email=user.email
-    )
+    return UserResponse(**profile)
 
 # --------- GET /me/profile ----------
 @app.get("/me/profile", response_model=UserProfile)
@@ -288,6 +414,7 @@ def update_user_profile(
         user.name = update.username
 
     db.commit()
+    user_service.invalidate_profile(current_user_id)
     db.refresh(user)
     return UserProfile(username=user.name)
 
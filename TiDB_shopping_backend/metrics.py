@@ -0,0 +1,369 @@
+"""
+請求層級的效能量測，以 Prometheus 文字格式由 GET /metrics 輸出
+
+- MetricsMiddleware：每個請求記錄路由（路徑樣板）延遲，以及該請求內的 DB 時間、SQL 句數、列數與連線池等待時間
+- SQLAlchemy engine 事件：所有 engine（含 async engine 底層的 sync engine）的每一句 SQL 都計入目前請求，
+  背景工作（outbox worker 等）只計入 db_statements_total
+- 取樣 profiler：設定 PROFILING_ENABLED=1 後，帶 X-Profile: 1 標頭的請求（或依 PROFILE_SAMPLE_RATE 隨機取樣）
+  以 cProfile 量測端點函式，結果寫到 PROFILE_DIR/*.prof，檔名由回應標頭 X-Profile-File 回傳，
+  可用 `python -m pstats` 或 snakeviz 查看
+
+列數：SELECT 取自 DBAPI 的 cursor.rowcount（PyMySQL / aiomysql 的 buffered cursor 為回傳列數，
+SQLite 不提供），INSERT / UPDATE / DELETE 為影響列數。
+"""
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_HEADER = b"x-profile"
+PROFILE_FILE_HEADER = b"x-profile-file"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float],
+                 labelnames: Tuple[str, ...] = ("method", "route")):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        # labels -> [各 bucket 的（非累積）次數..., 總和, 次數]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, labels: Tuple) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return series[-1] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:len(self.buckets)] + [None]):
+                    cumulative = series[-1] if count is None else cumulative + count
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} {cumulative}"
+                    )
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent executing SQL per request", LATENCY_BUCKETS)
+REQUEST_STATEMENTS = Histogram("http_request_db_statements", "SQL statements executed per request", COUNT_BUCKETS)
+REQUEST_ROWS = Histogram("http_request_db_rows", "Rows fetched or affected per request", ROWS_BUCKETS)
+REQUEST_POOL_WAIT = Histogram(
+    "http_request_db_pool_wait_seconds", "Time spent waiting for a pooled connection per request", LATENCY_BUCKETS
+)
+STATEMENTS = Counter("db_statements_total", "SQL statements executed (including background work)", ("operation",))
+STATEMENT_SECONDS = Counter("db_statement_seconds_total", "Time spent executing SQL", ("operation",))
+
+REGISTRY = [
+    REQUESTS, REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_STATEMENTS, REQUEST_ROWS, REQUEST_POOL_WAIT,
+    STATEMENTS, STATEMENT_SECONDS,
+]
+# 其他模組的即時狀態（連線池、outbox 等），輸出時呼叫，回傳 Prometheus 文字行
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    _collectors.append(collector)
+
+
+def gauge_lines(name: str, documentation: str, samples: Dict[Tuple, float], labelnames: Tuple[str, ...] = (),
+                kind: str = "gauge") -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(samples.items()):
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------
+# 單一請求的量測
+# ------------------------------
+
+class RequestMetrics:
+    __slots__ = ("statements", "db_seconds", "rows", "pool_wait_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+
+
+# 同步端點在 threadpool 執行時 contextvars 會被複製過去，物件本身是共用的
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def record_pool_wait(seconds: float) -> None:
+    """由 database.InstrumentedQueuePool 在取得連線後呼叫"""
+    request = _current.get()
+    if request is not None:
+        request.pool_wait_seconds += seconds
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement and statement.strip() else ""
+    return word if word in ("select", "insert", "update", "delete", "with") else "other"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    operation = _operation(statement)
+    STATEMENTS.inc((operation,))
+    STATEMENT_SECONDS.inc((operation,), elapsed)
+    request = _current.get()
+    if request is not None:
+        request.statements += 1
+        request.db_seconds += elapsed
+        rowcount = getattr(cursor, "rowcount", -1)
+        if rowcount and rowcount > 0:
+            request.rows += rowcount
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # 執行失敗時不會觸發 after_cursor_execute，把開始時間丟掉
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+# ------------------------------
+# Profiler
+# ------------------------------
+
+class RequestProfile:
+    """一個請求的 cProfile 結果（端點可能在 event loop 或 threadpool 的執行緒執行）"""
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+
+    @contextmanager
+    def capture(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.profiles.append(profile)
+
+    def dump(self, method: str, route: str) -> Optional[str]:
+        if not self.profiles:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{method}-{slug}.prof")
+        stats = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        return path
+
+
+_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _profiled(endpoint: Callable) -> Callable:
+    """
+    在端點函式所在的執行緒啟用 cProfile：同步端點在 threadpool 執行，middleware 所在的 event loop 執行緒量不到。
+    async 端點量測期間若有其他請求在同一個 event loop 交錯執行，也會一併計入。
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = _profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            with profile.capture():
+                return await endpoint(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.capture():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRouter(route_class=ProfiledRoute)：讓路由的端點函式可以被取樣 profiler 量測"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _should_profile(scope) -> bool:
+    if not PROFILING_ENABLED:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return value not in (b"", b"0")
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+
+def _route_of(scope) -> str:
+    # Starlette 比對到路由後會把 route 放進 scope；以路徑樣板作為標籤，避免 /orders/{id} 產生無限多組時間序列
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """純 ASGI middleware（不經過 BaseHTTPMiddleware 的額外 task），串流回應量到最後一個 chunk 送出為止"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        profile = RequestProfile() if _should_profile(scope) else None
+        metrics_token = _current.set(request)
+        profile_token = _profile.set(profile)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile is not None:
+                    path = profile.dump(scope["method"], _route_of(scope))
+                    if path:
+                        message = dict(message)
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (PROFILE_FILE_HEADER, path.encode())
+                        ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(metrics_token)
+            _profile.reset(profile_token)
+            labels = (scope["method"], _route_of(scope))
+            REQUESTS.inc(labels + (str(status_code),))
+            REQUEST_SECONDS.observe(labels, elapsed)
+            REQUEST_DB_SECONDS.observe(labels, request.db_seconds)
+            REQUEST_STATEMENTS.observe(labels, request.statements)
+            REQUEST_ROWS.observe(labels, request.rows)
+            REQUEST_POOL_WAIT.observe(labels, request.pool_wait_seconds)
+            # 每個請求一筆，量大時由 logging_config 的取樣過濾
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("request", extra={
+                    "method": labels[0], "route": labels[1], "status": status_code,
+                    "duration_ms": round(elapsed * 1000, 3), "db_statements": request.statements,
+                    "db_ms": round(request.db_seconds * 1000, 3),
+                })
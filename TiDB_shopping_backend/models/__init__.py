@@ -1,4 +1,10 @@
 from .user import User
 from .order import Order, Product, Category
 from .order_item import OrderItem
-from .item import Item
\ No newline at end of file
+from .item import Item
+from .stock_shard import ProductStockShard
+from .product_sales import ProductSales
+from .sync_run import SyncRun
+from .sales_rollup import SalesDaily, SalesHourly
+from .outbox import OutboxEvent
+from .idempotency_key import IdempotencyKey
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from database import Base
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key 紀錄：同一個 key 的重送請求直接回傳第一次的回應，不再重跑扣庫存 / 付款交易
+    status 為 in_progress 時代表第一次請求仍在處理（lock_token 標示持有者），completed 時保存回應內容
+    """
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(128), primary_key=True)  # 端點 + 使用者，例如 orders:<user_id>
+    key = Column("idempotency_key", String(128), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False)
+    lock_token = Column(String(32), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -16,6 +16,15 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # 訂單歷史 keyset 分頁：WHERE user_id = ? ORDER BY order_date DESC, id DESC
+        Index("ix_orders_user_date_id", "user_id", "order_date", "id"),
+        # 銷售趨勢 / 依狀態篩選：WHERE status IN (...) AND order_date >= ?
+        Index("ix_orders_status_date", "status", "order_date"),
+        # 訂單匯出：WHERE order_date >= ? ORDER BY order_date, id，依索引順序串流、不必先排序
+        Index("ix_orders_date_id", "order_date", "id"),
+    )
+
 class Category(Base):
     __tablename__ = "categories"
 
@@ -36,6 +45,15 @@ class Product(Base):
 
     category = relationship("Category", back_populates="products")
 
+    __table_args__ = (
+        # 商品列表 keyset 分頁，每種 sort_by 各一組（有 / 無分類篩選）
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_category_id", "category_name", "id"),
+        Index("ix_products_category_price_id", "category_name", "price", "id"),
+        Index("ix_products_category_name_id", "category_name", "name", "id"),
+    )
+
 class PriceAdjustHistory(Base):
     __tablename__ = "price_adjust_history"
     product_id = Column(Integer, primary_key=True)
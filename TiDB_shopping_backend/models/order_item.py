@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -14,3 +14,10 @@ class OrderItem(Base):
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
+
+    __table_args__ = (
+        # 訂單明細載入（selectinload / lazy load）：WHERE order_id IN (...)
+        Index("ix_order_items_order_id", "order_id"),
+        # 商品銷量彙總 / 對帳：依 product_id JOIN，含 order_id 可直接回表到 orders
+        Index("ix_order_items_product_order", "product_id", "order_id"),
+    )
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from database import Base
+
+class OutboxEvent(Base):
+    """
+    交易式 outbox：與訂單寫在同一個交易內的事件，由背景 worker 批次處理
+    （sold、熱銷排行榜、銷售趨勢彙總），處理完成後填入 processed_at
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(64), nullable=False)
+    aggregate_id = Column(String(64), nullable=False)  # 例如訂單 id
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(1000), nullable=True)
+
+    __table_args__ = (
+        # worker 輪詢：WHERE processed_at IS NULL ORDER BY created_at, id
+        Index("ix_outbox_pending", "processed_at", "created_at", "id"),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from datetime import datetime
+from database import Base
+
+class ProductSales(Base):
+    """
+    熱銷排行榜彙總表：每個商品一列，由訂單建立 / 取消 / 狀態變更以增量方式維護，
+    排行榜只需依 units_sold 索引取前 N 名，不必掃描所有歷史訂單
+    """
+    __tablename__ = "product_sales"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    units_sold = Column(Integer, nullable=False, default=0)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    last_sold_date = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_product_sales_units_sold", "units_sold"),
+        # 增量同步 products.sold：找出上次執行後有變動的商品
+        Index("ix_product_sales_updated_at", "updated_at"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime
+from datetime import datetime
+from database import Base
+
+class SalesDaily(Base):
+    """
+    每日銷售彙總：已付款（paid / shipped / delivered）訂單的筆數與營收，
+    由訂單付款 / 取消 / 狀態變更以增量方式維護；平均客單價 = revenue / orders_count
+    日期以 order_date（UTC）為準
+    """
+    __tablename__ = "sales_daily"
+
+    bucket_date = Column(Date, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SalesHourly(Base):
+    """每小時銷售彙總（欄位與 SalesDaily 相同），bucket_start 為該小時的起點"""
+    __tablename__ = "sales_hourly"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
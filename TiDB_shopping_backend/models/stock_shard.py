@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from database import Base
+
+class ProductStockShard(Base):
+    """
+    熱銷商品的分片庫存：一個商品的庫存拆成 N 列子計數器，
+    結帳時隨機扣減其中一列，避免所有交易都寫同一列 products 造成 TiDB 熱點。
+    """
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard_no = Column(Integer, primary_key=True)
+    stock = Column(Integer, nullable=False, default=0)
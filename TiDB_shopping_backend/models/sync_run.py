@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from database import Base
+
+class SyncRun(Base):
+    """
+    背景同步作業的執行紀錄（例如 products.sold 重新同步）：
+    記錄模式、耗時與變更列數；增量模式以上一次成功執行的 started_at 作為起點
+    """
+    __tablename__ = "sync_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job = Column(String(64), nullable=False)
+    mode = Column(String(16), nullable=False)  # full / incremental
+    status = Column(String(16), nullable=False)  # running / success / failed
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    since = Column(DateTime, nullable=True)  # 增量模式涵蓋的起始時間
+    duration_ms = Column(Integer, nullable=True)
+    products_checked = Column(Integer, nullable=True)
+    rows_changed = Column(Integer, nullable=True)
+    chunks = Column(Integer, nullable=True)
+    error = Column(String(1000), nullable=True)
+
+    __table_args__ = (
+        Index("ix_sync_runs_job_started", "job", "started_at"),
+    )
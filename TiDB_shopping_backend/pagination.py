@@ -0,0 +1,84 @@
+"""
+Keyset（cursor）分頁
+
+以「上一頁最後一筆的排序鍵」作為下一頁起點（WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n），
+配合 (a, b) 複合索引，第 1000 頁與第 1 頁一樣只讀 n 筆，不必像 OFFSET 先掃描再丟棄前面的資料。
+
+cursor 對客戶端而言是不透明字串（base64url JSON），內含排序模式，換排序時舊 cursor 會被拒絕。
+下一頁的 cursor 放在回應標頭 X-Next-Cursor，最後一頁不回傳該標頭。
+"""
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, false, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(mode: str, values: Sequence[Any]) -> str:
+    raw = json.dumps({"m": mode, "v": list(values)}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, mode: str, arity: int) -> List[Any]:
+    """
+    解析 cursor 並確認與目前排序模式相同、恰好有 arity 個排序鍵且每個都是純量（字串 / 數字 / null）；
+    客戶端可以任意竄改 cursor，格式錯誤一律回 400
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data["v"]
+        if data["m"] != mode or not isinstance(values, list) or len(values) != arity:
+            raise ValueError("cursor mode mismatch")
+        if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+            raise ValueError("cursor values must be scalars")
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_order(columns: Sequence[Any], descending: bool = False) -> list:
+    """排序鍵全部同方向，才能用單一的 (a, b) > (x, y) 比較取下一頁"""
+    return [column.desc() if descending else column.asc() for column in columns]
+
+
+def keyset_filter(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """
+    (a, b) > (x, y) 展開為 a >= x AND (a > x OR b > y)（遞減時改為 <= / <）
+    開頭的 a >= x 讓 TiDB / MySQL / SQLite 都能直接在複合索引上定位起點，不必依賴 row value 比較的最佳化
+    排序鍵可以是 NULL：TiDB / MySQL / SQLite 都把 NULL 視為最小值（遞增時排最前、遞減時排最後），
+    因此遞減時要另外納入 IS NULL 的列，上一頁最後一筆為 NULL 時以 IS NULL 比較
+    """
+    if len(values) != len(columns):
+        raise ValueError(f"keyset 需要 {len(columns)} 個值，收到 {len(values)} 個")
+    column, value = columns[0], values[0]
+    rest = len(columns) > 1
+    if value is None:
+        # 遞增：之後是所有非 NULL 的列；遞減：NULL 已排在最後，只剩同為 NULL 且後續鍵較後的列
+        same = column.is_(None)
+        tail = keyset_filter(columns[1:], values[1:], descending) if rest else false()
+        if descending:
+            return and_(same, tail)
+        return or_(column.is_not(None), and_(same, tail))
+    if descending:
+        after = or_(column < value, column.is_(None))
+        from_here = or_(column <= value, column.is_(None))
+    else:
+        after = column > value
+        from_here = column >= value
+    if not rest:
+        return after
+    return and_(from_here, or_(after, keyset_filter(columns[1:], values[1:], descending)))
+
+
+def split_page(rows: list, limit: int) -> Tuple[list, bool]:
+    """查詢時多取一筆（limit + 1）判斷是否還有下一頁"""
+    return rows[:limit], len(rows) > limit
+
+
+def set_next_cursor(response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 
 class ProductBase(BaseModel):
     id: int
@@ -32,3 +32,16 @@ class ProductDetailOut(ProductOut):
 
 class ErrorDetail(BaseModel):
     detail: str
+
+class StockUpdateItem(BaseModel):
+    product_id: int
+    stock: int = Field(ge=0)
+
+class StockUpdateResult(BaseModel):
+    product_id: Optional[int] = None
+    status: Literal["updated", "unchanged", "not_found", "superseded", "invalid"]
+    product_name: Optional[str] = None
+    old_stock: Optional[int] = None
+    new_stock: Optional[int] = None
+    line: Optional[int] = None  # CSV 匯入時的行號
+    error: Optional[str] = None
@@ -0,0 +1,35 @@
+"""
+銷售趨勢彙總表（sales_daily / sales_hourly）回填作業
+
+首次部署或發現彙總與訂單不一致時，以 orders 完整重算指定區間並覆寫。
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m scripts.backfill_sales_rollup                       # 重算最近 365 天（含今天）
+    python -m scripts.backfill_sales_rollup --days 30
+    python -m scripts.backfill_sales_rollup --since 2024-01-01 --until 2024-07-01
+"""
+import argparse
+import json
+from datetime import date, datetime, timedelta
+
+from database import Base, SessionLocal, engine
+import models  # noqa: F401  註冊所有資料表
+from services.sales_rollup_service import rebuild
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="未指定 --since 時，重算最近幾天")
+    parser.add_argument("--since", type=date.fromisoformat, help="起始日期（含），YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="結束日期（不含），預設為明天")
+    args = parser.parse_args()
+
+    since = args.since or datetime.utcnow().date() - timedelta(days=args.days)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        result = rebuild(db, since, args.until)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+大量測試資料產生器：類別、商品、使用者、訂單與訂單項目
+
+用法（在 TiDB_shopping_backend 目錄下執行，寫入 DATABASE_URL 指向的資料庫）：
+    python -m scripts.generate_data                                          # 1 萬商品 / 1 萬使用者 / 10 萬訂單
+    python -m scripts.generate_data --products 200000 --users 1000000 --orders 5000000   # 約 1000 萬筆訂單項目
+    DATABASE_URL=sqlite:///./bench.db python -m scripts.generate_data --orders 1000000 --seed 7
+    python -m scripts.generate_data --reset ...                              # 先刪除並重建所有資料表（僅限本機資料庫！）
+
+分布：
+- 商品熱門程度為 Zipf（--product-skew），熱門商品隨機分散在各個 id 之間，不會集中在前幾個 id
+- 每位使用者的訂單數為 Zipf（--user-skew），少數重度使用者佔大部分訂單
+- 每張訂單 1～5 項（多數 1～2 項），每項數量 1～3
+- order_date 分布在今天之前的 --days 天內：逐日成長、週末較多、晚間尖峰
+- 狀態涵蓋 PENDING / paid / shipped / delivered / CANCELLED，越新的訂單越可能仍是 PENDING / paid
+同一個 --seed 產生完全相同的資料（id、狀態與時間皆相同；時間以執行當天為基準）。
+
+寫入不經過 ORM：每 --chunk-size 筆一個交易，以 DBAPI executemany 送出
+（PyMySQL 會改寫為多列 INSERT ... VALUES；SQLite 在同一個交易內逐列寫入），
+orders / order_items 的次要索引在匯入後才建立。本機 SQLite 約 5 分鐘可寫入 1000 萬筆訂單項目。
+訂單與項目的 id 為亂數 32 位十六進位字串，TiDB 寫入不會集中在同一個 region。
+寫完後回填 products.sold、排行榜與銷售趨勢彙總（--skip-derived 略過）。
+"""
+import argparse
+import json
+import random
+import time
+from bisect import bisect
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, List, Optional
+
+from database import AdminSessionLocal, Base, engine
+import models  # noqa: F401  註冊所有資料表
+from models import Category, Order, Product, User
+from models.order_item import OrderItem
+from services import leaderboard_service, sales_rollup_service, sold_sync_service
+from utils import hash_password
+
+PASSWORD = "password123"
+
+ITEM_COUNTS = (1, 2, 3, 4, 5)
+ITEM_COUNT_WEIGHTS = (45, 25, 15, 10, 5)
+QUANTITIES = (1, 2, 3)
+QUANTITY_WEIGHTS = (75, 18, 7)
+# 0～23 時（UTC）的相對下單量：凌晨最少、晚間尖峰
+HOUR_WEIGHTS = (3, 2, 1, 1, 1, 2, 3, 5, 6, 7, 7, 8, 9, 8, 7, 7, 8, 9, 10, 12, 14, 13, 9, 5)
+STATUSES = ("PENDING", "paid", "shipped", "delivered", "CANCELLED")
+# 依訂單天數（小於 max_age 天）決定狀態權重
+STATUS_WEIGHTS_BY_AGE = (
+    (2, (30, 50, 10, 0, 10)),
+    (7, (5, 15, 40, 30, 10)),
+    (None, (2, 3, 5, 80, 10)),
+)
+
+
+def user_id(n: int) -> str:
+    return f"gen-user-{n:09d}"
+
+
+def user_email(n: int) -> str:
+    return f"user{n}@example.com"
+
+
+@dataclass
+class DatasetConfig:
+    products: int = 10_000
+    users: int = 10_000
+    orders: int = 100_000
+    categories: int = 50
+    days: int = 365
+    product_skew: float = 1.1
+    user_skew: float = 0.9
+    seed: int = 42
+    chunk_size: int = 20_000
+    # 固定每個商品的庫存（壓測時避免庫存不足）；None 為隨機庫存
+    stock: Optional[int] = None
+
+
+def zipf_cum_weights(n: int, skew: float) -> List[float]:
+    """排名 1..n 的 Zipf 累積權重（random.choices 的 cum_weights，抽樣為二分搜尋）"""
+    return list(accumulate(rank ** -skew for rank in range(1, n + 1)))
+
+
+def _format_time(moment: datetime) -> str:
+    # 與 SQLAlchemy 寫入 SQLite 的格式相同（含 6 位小數），字串比較才會與 ORM 的參數一致；MySQL / TiDB 也接受
+    return moment.isoformat(" ", "microseconds")
+
+
+class BulkWriter:
+    """以 DBAPI executemany 分批寫入，每批 commit 一次"""
+
+    # sqlite3 為 qmark，PyMySQL / mysqlclient 為 format / pyformat
+    PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+    def __init__(self, bind, chunk_size: int):
+        self.bind = bind
+        self.chunk_size = chunk_size
+        self.connection = bind.raw_connection()
+        if bind.dialect.name == "sqlite":
+            # 只影響這條連線：匯入期間不 fsync、rollback journal 放記憶體、加大 page cache（亂數主鍵的 B-tree 插入）
+            cursor = self.connection.cursor()
+            for pragma in ("synchronous = OFF", "journal_mode = MEMORY", "cache_size = -262144"):
+                cursor.execute(f"PRAGMA {pragma}")
+            cursor.close()
+        self.counts = {}
+
+    def statement(self, table, columns) -> str:
+        quote = self.bind.dialect.identifier_preparer.quote
+        placeholders = ", ".join([self.PLACEHOLDERS[self.bind.dialect.paramstyle]] * len(columns))
+        return (
+            f"INSERT INTO {quote(table.name)} ({', '.join(quote(c) for c in columns)}) "
+            f"VALUES ({placeholders})"
+        )
+
+    def write(self, table, columns, rows: list) -> None:
+        if not rows:
+            return
+        sql = self.statement(table, columns)
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(rows), self.chunk_size):
+                cursor.executemany(sql, rows[start:start + self.chunk_size])
+                self.connection.commit()
+        finally:
+            cursor.close()
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def close(self):
+        self.connection.close()
+
+
+def generate(bind, config: DatasetConfig, log: Callable[[str], None] = print) -> dict:
+    """依 config 產生並寫入資料，回傳各資料表的筆數與耗時（資料表需已存在且為空）"""
+    rng = random.Random(config.seed)
+    writer = BulkWriter(bind, config.chunk_size)
+    timings = {}
+    try:
+        started = time.perf_counter()
+        categories = [f"Category {n:03d}" for n in range(1, config.categories + 1)]
+        writer.write(Category.__table__, ("name",), [(name,) for name in categories])
+
+        category_cum = zipf_cum_weights(len(categories), 0.8)
+        product_categories = rng.choices(categories, cum_weights=category_cum, k=config.products)
+        prices = [0.0] * (config.products + 1)
+        product_rows = []
+        for pid in range(1, config.products + 1):
+            prices[pid] = round(min(max(rng.lognormvariate(3.5, 0.9), 1.0), 5000.0), 2)
+            if config.stock is not None:
+                stock = config.stock
+            else:
+                stock = rng.randint(0, 20) if rng.random() < 0.05 else rng.randint(20, 5000)
+            product_rows.append((
+                pid, f"Product {pid:07d}", prices[pid], None, 0, stock,
+                f"Generated product {pid}", product_categories[pid - 1],
+            ))
+        writer.write(
+            Product.__table__,
+            ("id", "name", "price", "image_url", "sold", "stock", "description", "category_name"),
+            product_rows,
+        )
+        del product_rows
+        timings["products"] = time.perf_counter() - started
+        log(f"products: {config.products} rows in {timings['products']:.1f}s")
+
+        started = time.perf_counter()
+        # bcrypt 只算一次，所有產生的使用者共用同一組密碼
+        hashed = hash_password(PASSWORD)
+        user_rows = [(user_id(n), f"user{n}", user_email(n), hashed) for n in range(config.users)]
+        writer.write(User.__table__, ("id", "name", "email", "password"), user_rows)
+        del user_rows
+        timings["users"] = time.perf_counter() - started
+        log(f"users: {config.users} rows in {timings['users']:.1f}s")
+
+        started = time.perf_counter()
+        # 匯入期間先拿掉訂單 / 項目的次要索引，寫完再一次建立（比逐列維護亂數順序的索引快得多）
+        indexes = [index for table in (Order.__table__, OrderItem.__table__) for index in table.indexes]
+        for index in indexes:
+            index.drop(bind)
+        try:
+            items = _write_orders(writer, rng, config, prices)
+            timings["orders"] = time.perf_counter() - started
+        finally:
+            started = time.perf_counter()
+            for index in indexes:
+                index.create(bind)
+            timings["indexes"] = time.perf_counter() - started
+        log(f"orders: {config.orders} orders / {items} items in {timings['orders']:.1f}s "
+            f"({items / timings['orders']:.0f} items/s), indexes rebuilt in {timings['indexes']:.1f}s")
+    finally:
+        writer.close()
+    return {"rows": writer.counts, "seconds": {k: round(v, 2) for k, v in timings.items()}}
+
+
+def _write_orders(writer: BulkWriter, rng: random.Random, config: DatasetConfig, prices: list) -> int:
+    # 熱門排名與 id 無關：把 id 打亂後依排名套用 Zipf 權重
+    product_ids = list(range(1, config.products + 1))
+    rng.shuffle(product_ids)
+    product_cum = zipf_cum_weights(config.products, config.product_skew)
+    user_indexes = list(range(config.users))
+    rng.shuffle(user_indexes)
+    user_cum = zipf_cum_weights(config.users, config.user_skew)
+
+    item_count_cum = list(accumulate(ITEM_COUNT_WEIGHTS))
+    quantity_cum = list(accumulate(QUANTITY_WEIGHTS))
+    hour_cum = list(accumulate(HOUR_WEIGHTS))
+    first_day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=config.days)
+    # 逐日成長（最後一天約為第一天的兩倍），週末多 20%
+    day_cum = list(accumulate(
+        (1 + day / config.days) * (1.2 if (first_day + timedelta(days=day)).weekday() >= 5 else 1.0)
+        for day in range(config.days)
+    ))
+    status_cum = [(max_age, list(accumulate(weights))) for max_age, weights in STATUS_WEIGHTS_BY_AGE]
+
+    order_columns = ("id", "order_number", "order_date", "total_amount", "status", "user_id")
+    item_columns = ("id", "order_id", "product_id", "product_name", "quantity", "price")
+    items_written = 0
+    for chunk_start in range(0, config.orders, config.chunk_size):
+        n = min(config.chunk_size, config.orders - chunk_start)
+        buyers = rng.choices(user_indexes, cum_weights=user_cum, k=n)
+        sizes = rng.choices(ITEM_COUNTS, cum_weights=item_count_cum, k=n)
+        picks = rng.choices(product_ids, cum_weights=product_cum, k=sum(sizes))
+        quantities = rng.choices(QUANTITIES, cum_weights=quantity_cum, k=len(picks))
+        days = rng.choices(range(config.days), cum_weights=day_cum, k=n)
+        hours = rng.choices(range(24), cum_weights=hour_cum, k=n)
+
+        order_rows, item_rows = [], []
+        offset = 0
+        for i in range(n):
+            order_id = f"{rng.getrandbits(128):032x}"
+            age = config.days - 1 - days[i]
+            cum = next(c for max_age, c in status_cum if max_age is None or age < max_age)
+            order_date = first_day + timedelta(days=days[i], hours=hours[i], seconds=rng.randrange(3600))
+            total = 0.0
+            seen = set()
+            for j in range(offset, offset + sizes[i]):
+                pid = picks[j]
+                if pid in seen:  # 同一張訂單內重複抽到的商品只保留一項
+                    continue
+                seen.add(pid)
+                total += prices[pid] * quantities[j]
+                item_rows.append((
+                    f"{rng.getrandbits(128):032x}", order_id, pid, f"Product {pid:07d}", quantities[j], prices[pid],
+                ))
+            offset += sizes[i]
+            order_rows.append((
+                order_id, f"GEN-{chunk_start + i:010d}", _format_time(order_date), round(total, 2),
+                STATUSES[bisect(cum, rng.random() * cum[-1])], user_id(buyers[i]),
+            ))
+        # 依主鍵排序後寫入：同一批的 B-tree 插入集中在相鄰的頁面
+        order_rows.sort()
+        item_rows.sort()
+        writer.write(Order.__table__, order_columns, order_rows)
+        writer.write(OrderItem.__table__, item_columns, item_rows)
+        items_written += len(item_rows)
+    return items_written
+
+
+def backfill_derived(session_factory, days: int, log: Callable[[str], None] = print) -> None:
+    """以產生的訂單回填 products.sold、排行榜與銷售趨勢彙總"""
+    with session_factory() as db:
+        started = time.perf_counter()
+        sold_sync_service.sync_sold(db)
+        leaderboard_service.reconcile(db, repair=True)
+        sales_rollup_service.rebuild(db, datetime.utcnow().date() - timedelta(days=days + 1))
+        log(f"derived data (sold / leaderboard / sales rollup) in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = DatasetConfig()
+    parser.add_argument("--products", type=int, default=defaults.products)
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--orders", type=int, default=defaults.orders)
+    parser.add_argument("--categories", type=int, default=defaults.categories)
+    parser.add_argument("--days", type=int, default=defaults.days, help="訂單分布在今天之前的幾天內")
+    parser.add_argument("--product-skew", type=float, default=defaults.product_skew, help="商品熱門程度的 Zipf 指數")
+    parser.add_argument("--user-skew", type=float, default=defaults.user_skew, help="使用者訂單數的 Zipf 指數")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size, help="每個交易寫入的列數")
+    parser.add_argument("--stock", type=int, help="固定每個商品的庫存（預設隨機）")
+    parser.add_argument("--reset", action="store_true", help="先刪除並重建所有資料表")
+    parser.add_argument("--skip-derived", action="store_true", help="不回填 sold / 排行榜 / 銷售趨勢彙總")
+    args = parser.parse_args()
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with AdminSessionLocal() as db:
+        if db.query(Product.id).first() is not None:
+            raise SystemExit("資料庫已有商品資料；請改用空的資料庫，或加上 --reset 重建所有資料表")
+
+    config = DatasetConfig(
+        products=args.products, users=args.users, orders=args.orders, categories=args.categories,
+        days=args.days, product_skew=args.product_skew, user_skew=args.user_skew, seed=args.seed,
+        chunk_size=args.chunk_size, stock=args.stock,
+    )
+    result = generate(engine, config)
+    if not args.skip_derived:
+        backfill_derived(AdminSessionLocal, config.days)
+    print(json.dumps({"config": asdict(config), **result}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+索引檢查工具：對每條熱門路由實際會送出的 SQL 執行 EXPLAIN，找出全表掃描
+
+用法（在 TiDB_shopping_backend 目錄下執行，預設使用 DATABASE_URL）：
+    python -m scripts.index_advisor                        # 檢查，有非預期的全表掃描時以非 0 結束（可放進 CI）
+    python -m scripts.index_advisor --database-url sqlite:///./ci.db
+    python -m scripts.index_advisor --analyze              # TiDB 改用 EXPLAIN ANALYZE（會實際執行查詢）
+    python -m scripts.index_advisor --create-missing       # 先補建模型已宣告、但資料庫尚未建立的索引
+
+運作方式：
+1. 在一個最後一定 rollback 的交易內建立測試用的使用者 / 商品 / 訂單（不影響既有資料）
+2. 依序呼叫 HOT_QUERIES 登記的 service 函式（與路由相同的程式碼路徑），攔截送出的 SELECT / UPDATE / DELETE
+3. 逐句 EXPLAIN：SQLite 找 "SCAN <table>"，MySQL 找 type=ALL，TiDB 找 TiKV 上的 TableFullScan
+   （TiFlash 上的全表掃描是分析查詢的預期行為，不列為問題）
+4. allow_scans 列出的資料表視為預期行為（例如依主鍵順序讀取再 LIMIT、管理端全表列表）
+
+create_all 不會替已存在的資料表補建索引，--create-missing 可用於既有資料庫。
+"""
+import argparse
+import json
+import re
+import sys
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from database import Base, create_db_engine, SQLALCHEMY_DATABASE_URL
+import models  # noqa: F401  註冊所有資料表
+from models import Category, Order, OrderItem, Product, User
+from pagination import encode_cursor
+from services import (
+    analytics_service,
+    export_service,
+    leaderboard_service,
+    order_service,
+    product_service,
+    sales_rollup_service,
+    stock_service,
+)
+
+
+@dataclass
+class Sample:
+    """檢查用的測試資料（在 rollback 的交易內建立）"""
+    user_id: str
+    category: str
+    product_id: int
+    order_id: str
+
+
+@dataclass
+class HotQuery:
+    name: str
+    run: Callable[[Session, Sample], object]
+    # 預期會全表掃描的資料表 → 原因
+    allow_scans: Dict[str, str] = field(default_factory=dict)
+
+
+ORDERED_LIMIT = "依主鍵順序讀取，LIMIT 後即停止"
+ANALYTICS_SCAN = "整表聚合，TiDB 上由 TiFlash 列存掃描"
+
+
+def _checkout(db: Session, sample: Sample):
+    order_id, order_number, now = order_service.new_order_identity()
+    items = [{"product_id": sample.product_id, "quantity": 1}]
+    return order_service.write_order(
+        db, sample.user_id, items, order_id, order_number, now, order_service.merge_quantities(items)
+    )
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("GET /api/products", lambda db, s: product_service.load_product_list(db),
+             {"products": ORDERED_LIMIT}),
+    HotQuery("GET /api/products?category=", lambda db, s: product_service.load_product_list(db, s.category)),
+    HotQuery("GET /api/products?sort_by=price_asc", lambda db, s: product_service.load_product_list(db, None, "price_asc")),
+    HotQuery("GET /api/products?sort_by=price_desc", lambda db, s: product_service.load_product_list(db, None, "price_desc")),
+    HotQuery("GET /api/products?sort_by=name_asc", lambda db, s: product_service.load_product_list(db, None, "name_asc")),
+    HotQuery("GET /api/products?category=&sort_by=price_asc",
+             lambda db, s: product_service.load_product_list(db, s.category, "price_asc")),
+    HotQuery("GET /api/products?sort_by=price_asc&cursor=",
+             lambda db, s: product_service.load_product_list(db, None, "price_asc", 0, 10, encode_cursor("products:price_asc:", [0.0, 0]))),
+    HotQuery("GET /api/products/{id}", lambda db, s: product_service.load_product_detail(db, s.product_id)),
+    HotQuery("GET /api/products/bestsellers", lambda db, s: leaderboard_service.top_products(db, 5),
+             {"products": ORDERED_LIMIT}),
+    HotQuery("GET /api/orders", lambda db, s: order_service.list_orders(db, s.user_id)),
+    HotQuery("GET /api/orders?limit=&cursor=",
+             lambda db, s: order_service.list_orders(db, s.user_id, 10, encode_cursor("orders", [datetime.utcnow().isoformat(), "~"]))),
+    HotQuery("GET /api/orders/{id}", lambda db, s: db.query(Order).filter(Order.id == s.order_id).first().items),
+    HotQuery("POST /api/orders", _checkout),
+    HotQuery("POST /api/orders/{id}/cancel", lambda db, s: order_service.cancel_order(db, s.user_id, s.order_id)),
+    HotQuery("GET /api/auth/me", lambda db, s: db.query(User).filter(User.id == s.user_id).first()),
+    HotQuery("GET /api/analytics/sales-trends", lambda db, s: sales_rollup_service.sales_trends(db, 7)),
+    HotQuery("GET /api/analytics/product-performance", lambda db, s: analytics_service.product_performance(db, 10),
+             {"products": ANALYTICS_SCAN, "order_items": ANALYTICS_SCAN, "orders": ANALYTICS_SCAN}),
+    HotQuery("GET /api/analytics/htap-verification", lambda db, s: leaderboard_service.sales_aggregate_query(db).all(),
+             {"products": ANALYTICS_SCAN, "order_items": ANALYTICS_SCAN, "orders": ANALYTICS_SCAN}),
+    HotQuery("GET /api/admin/export/orders?since=",
+             lambda db, s: db.execute(export_service.EXPORTS["orders"](datetime(2024, 1, 1))).all()),
+    HotQuery("GET /api/admin/products", lambda db, s: db.query(Product).all(),
+             {"products": "管理端列出全部商品"}),
+    HotQuery("GET /api/admin/stock-alerts", lambda db, s: _stock_alerts(db),
+             {"products": "管理端掃描全部商品庫存", "product_stock_shards": "依商品彙總分片庫存"}),
+]
+
+
+def _stock_alerts(db: Session):
+    shard_totals, stock = stock_service.effective_stock()
+    return db.query(Product.id, stock).outerjoin(shard_totals, shard_totals.c.product_id == Product.id).filter(stock < 10).all()
+
+
+def seed_sample(db: Session) -> Sample:
+    suffix = uuid.uuid4().hex[:8]
+    user_id = f"advisor-{suffix}"
+    category = f"advisor-{suffix}"
+    product_id = (db.query(func.max(Product.id)).scalar() or 0) + 1
+    db.add(User(id=user_id, name="advisor", email=f"{user_id}@example.com", password="x"))
+    db.add(Category(name=category))
+    db.add(Product(id=product_id, name="advisor", price=1.0, stock=100, sold=0, category_name=category))
+    db.flush()
+    order_id, order_number, now = order_service.new_order_identity()
+    db.add(Order(id=order_id, order_number=order_number, order_date=now, total_amount=1.0, status="PENDING", user_id=user_id))
+    db.add(OrderItem(id=str(uuid.uuid4()), order_id=order_id, product_id=product_id, product_name="advisor", quantity=1, price=1.0))
+    db.flush()
+    return Sample(user_id=user_id, category=category, product_id=product_id, order_id=order_id)
+
+
+# ------------------------------
+# EXPLAIN 解析
+# ------------------------------
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+
+
+def detect_flavor(connection) -> str:
+    if connection.dialect.name == "sqlite":
+        return "sqlite"
+    if connection.dialect.name == "mysql":
+        version = connection.exec_driver_sql("SELECT VERSION()").scalar()
+        return "tidb" if "TiDB" in str(version) else "mysql"
+    raise SystemExit(f"不支援的資料庫: {connection.dialect.name}")
+
+
+def explain(connection, flavor: str, statement: str, parameters, analyze: bool = False) -> List[dict]:
+    """回傳 [{"table", "detail", "full_scan"}]"""
+    table_names = set(Base.metadata.tables)
+    if flavor == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        plan = []
+        for row in rows:
+            detail = row[-1]
+            match = _SQLITE_SCAN.match(detail)
+            table = _resolve_table(match.group(1)) if match else None
+            plan.append({"table": table, "detail": detail, "full_scan": table in table_names})
+        return plan
+
+    prefix = "EXPLAIN ANALYZE" if analyze and flavor == "tidb" else "EXPLAIN"
+    result = connection.exec_driver_sql(f"{prefix} {statement}", parameters)
+    columns = list(result.keys())
+    plan = []
+    for row in result.fetchall():
+        row = dict(zip(columns, row))
+        if flavor == "tidb":
+            access = str(row.get("access object") or "")
+            table = access.split("table:", 1)[1].split(",")[0].strip() if "table:" in access else None
+            full_scan = (
+                "TableFullScan" in str(row.get("id"))
+                and "tiflash" not in str(row.get("task"))
+                # 依主鍵順序讀取並下推 LIMIT，不是真的讀完整張表
+                and "keep order:true" not in str(row.get("operator info"))
+            )
+            plan.append({"table": table, "detail": " | ".join(str(v) for v in row.values()), "full_scan": full_scan})
+        else:
+            table = row.get("table")
+            plan.append({"table": table, "detail": json.dumps(row, default=str), "full_scan": row.get("type") == "ALL"})
+    return plan
+
+
+def _resolve_table(name: Optional[str]) -> Optional[str]:
+    # SQLAlchemy 自動產生的別名（products_1）對應回實際資料表
+    if name and name not in Base.metadata.tables:
+        base = re.sub(r"_\d+$", "", name)
+        if base in Base.metadata.tables:
+            return base
+    return name
+
+
+def run_advisor(engine, analyze: bool = False, queries: Optional[List[HotQuery]] = None) -> dict:
+    """執行所有登記的熱門查詢並回傳報告；violations 為非預期的全表掃描"""
+    queries = HOT_QUERIES if queries is None else queries
+    report = {"flavor": None, "queries": [], "violations": []}
+
+    with engine.connect() as connection:
+        report["flavor"] = flavor = detect_flavor(connection)
+        outer = connection.begin()
+        # rollback_only：service 內的 db.commit() 不會提交外層交易，測試資料最後一併 rollback
+        db = Session(bind=connection, join_transaction_mode="rollback_only", autoflush=False)
+        try:
+            sample = seed_sample(db)
+            for hot in queries:
+                captured = []
+
+                def record(conn, cursor, statement, parameters, context, executemany):
+                    if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH"):
+                        captured.append((statement, parameters[0] if executemany else parameters))
+
+                # 各查詢對資料的修改（例如下單扣庫存）留在外層交易內，最後一併 rollback
+                event.listen(connection, "before_cursor_execute", record)
+                try:
+                    hot.run(db, sample)
+                    db.flush()
+                finally:
+                    event.remove(connection, "before_cursor_execute", record)
+
+                entry = {"name": hot.name, "statements": []}
+                for statement, parameters in captured:
+                    plan = explain(connection, flavor, statement, parameters, analyze)
+                    scans = sorted({_resolve_table(step["table"]) for step in plan if step["full_scan"]})
+                    unexpected = [table for table in scans if table not in hot.allow_scans]
+                    entry["statements"].append({
+                        "sql": " ".join(statement.split()),
+                        "plan": [step["detail"] for step in plan],
+                        "full_scans": scans,
+                    })
+                    for table in unexpected:
+                        report["violations"].append({"query": hot.name, "table": table, "sql": " ".join(statement.split())})
+                report["queries"].append(entry)
+        finally:
+            db.close()
+            outer.rollback()
+    return report
+
+
+def create_missing_indexes(engine) -> List[str]:
+    """補建模型已宣告、但資料庫中還不存在的索引"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(f"{table.name}.{index.name}")
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--analyze", action="store_true", help="TiDB 使用 EXPLAIN ANALYZE")
+    parser.add_argument("--create-missing", action="store_true", help="補建尚未建立的索引")
+    parser.add_argument("--verbose", action="store_true", help="列出每句 SQL 與執行計畫")
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.database_url, echo=False)
+    Base.metadata.create_all(bind=engine)
+    if args.create_missing:
+        for name in create_missing_indexes(engine):
+            print(f"已建立索引 {name}")
+
+    report = run_advisor(engine, analyze=args.analyze)
+    for entry in report["queries"]:
+        scans = sorted({table for stmt in entry["statements"] for table in stmt["full_scans"]})
+        print(f"{entry['name']:<50} {len(entry['statements']):>2} 句  全表掃描: {', '.join(scans) or '-'}")
+        if args.verbose:
+            for stmt in entry["statements"]:
+                print(f"    {stmt['sql'][:160]}")
+                for step in stmt["plan"]:
+                    print(f"        {step}")
+
+    if report["violations"]:
+        print(f"\n⚠️ {len(report['violations'])} 個非預期的全表掃描：")
+        for violation in report["violations"]:
+            print(f"  [{violation['query']}] {violation['table']}: {violation['sql'][:160]}")
+        sys.exit(1)
+    print(f"\n✅ {report['flavor']}: 所有熱門查詢皆使用索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+清除過期的 Idempotency-Key 紀錄（可由 cron 定期執行）
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m scripts.purge_idempotency_keys
+"""
+import argparse
+import json
+
+from database import Base, SessionLocal, engine
+import models  # noqa: F401  註冊所有資料表
+from services.idempotency_service import purge_expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        deleted = purge_expired(db)
+
+    print(json.dumps({"deleted": deleted}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+熱銷排行榜對帳作業（可由 cron 定期執行）
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m scripts.reconcile_leaderboard           # 只檢查，不一致時以非 0 結束
+    python -m scripts.reconcile_leaderboard --repair  # 以完整重算覆寫不一致的資料
+"""
+import argparse
+import json
+import sys
+
+from database import Base, SessionLocal, engine
+import models  # noqa: F401  註冊所有資料表
+from services.leaderboard_service import reconcile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="覆寫不一致的排行榜資料")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        result = reconcile(db, repair=args.repair)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    if result["mismatch_count"] and not args.repair:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
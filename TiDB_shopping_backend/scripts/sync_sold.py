@@ -0,0 +1,31 @@
+"""
+products.sold 重新同步作業（可由 cron 每分鐘執行）
+
+用法（在 TiDB_shopping_backend 目錄下執行）：
+    python -m scripts.sync_sold                # 全量：依 id 範圍分塊修正所有商品
+    python -m scripts.sync_sold --incremental  # 只處理上次成功同步後有銷量變動的商品
+"""
+import argparse
+import json
+
+from database import Base, SessionLocal, engine
+import models  # noqa: F401  註冊所有資料表
+from services.sold_sync_service import run_to_dict, sync_sold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incremental", action="store_true", help="只同步上次成功執行後有變動的商品")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每個交易處理的商品數（預設 SOLD_SYNC_CHUNK_SIZE）")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        run = sync_sold(db, incremental=args.incremental, chunk_size=args.chunk_size)
+        result = run_to_dict(run)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
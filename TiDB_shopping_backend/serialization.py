@@ -0,0 +1,91 @@
+"""
+回應序列化的快速路徑
+
+FastAPI 對宣告 response_model 的路由會把端點回傳值再以 Pydantic 驗證一次才輸出 JSON；
+列表端點原本先 model_validate 成 ProductOut / OrderOut，等於每一列驗證兩次。
+熱門列表與分析端點改為：
+- 只把 response_model 需要的欄位從 ORM 物件 / 查詢列投影成 dict（product_dict / order_dict）；
+  列表查詢直接 SELECT 這些欄位（PRODUCT_FIELDS 順序）時用 row_dicts，不必建立 ORM 實體
+- 以 orjson 直接輸出 bytes（未安裝 orjson 時退回標準庫 json，輸出內容相同）
+- 回傳 JSONBytesResponse，FastAPI 遇到 Response 會原樣送出，不再驗證與 jsonable_encoder
+response_model 仍保留在路由上，OpenAPI 文件不變；新增欄位時請同步修改 schemas，
+投影欄位直接取自 schema 定義（見 test_serialization 的一致性檢查）。
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from operator import attrgetter
+from typing import Any, Iterable, List, Mapping, Optional, Sequence
+
+from fastapi import Response
+
+from schemas.order import OrderOut
+from schemas.order_item import OrderItemOut
+from schemas.product import ProductOut
+
+try:
+    import orjson
+except ImportError:  # 選用套件：未安裝時使用標準庫 json
+    orjson = None
+
+PRODUCT_FIELDS = tuple(ProductOut.model_fields)
+ORDER_FIELDS = tuple(name for name in OrderOut.model_fields if name != "items")
+ORDER_ITEM_FIELDS = tuple(OrderItemOut.model_fields)
+
+_product_values = attrgetter(*PRODUCT_FIELDS)
+_order_values = attrgetter(*ORDER_FIELDS)
+_order_item_values = attrgetter(*ORDER_ITEM_FIELDS)
+
+
+def _default(value: Any) -> Any:
+    # MySQL 的 SUM / AVG 會回傳 Decimal；與 jsonable_encoder 相同，整數值輸出為 int，其餘為 float
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class JSONBytesResponse(Response):
+    """content 可以是已序列化的 bytes（例如快取的列表頁），或交給 dumps() 的資料"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> JSONBytesResponse:
+    return JSONBytesResponse(content, status_code=status_code, headers=headers)
+
+
+def product_dict(product: Any) -> dict:
+    """ProductOut 的欄位；product 可以是 Product 實體或含同名欄位的查詢列"""
+    return dict(zip(PRODUCT_FIELDS, _product_values(product)))
+
+
+def product_dicts(products: Iterable[Any]) -> List[dict]:
+    return [dict(zip(PRODUCT_FIELDS, _product_values(p))) for p in products]
+
+
+def row_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """rows 為依 fields 順序選取欄位的查詢列（SQLAlchemy Row / tuple），以位置對應，比逐欄 getattr 快"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def order_dict(order: Any, items: Optional[Sequence[Any]] = None) -> dict:
+    """OrderOut 的欄位（含明細）；items 未指定時讀取 order.items"""
+    data = dict(zip(ORDER_FIELDS, _order_values(order)))
+    data["items"] = [
+        dict(zip(ORDER_ITEM_FIELDS, _order_item_values(item)))
+        for item in (order.items if items is None else items)
+    ]
+    return data
@@ -0,0 +1,46 @@
+"""
+HTAP 分析查詢
+
+這裡的查詢都是整表聚合，應該在 TiFlash（列存）上執行
+（銷售趨勢改讀預先彙總的 sales_daily / sales_hourly，見 sales_rollup_service）：
+- 以 READ_FROM_STORAGE(TIFLASH[...]) optimizer hint 標記查詢，只在 MySQL 方言（TiDB）下輸出，
+  SQLite 等其他後端會得到一般 SQL；一般 MySQL 會把不認得的 hint 當成註解忽略
+- 由 database.get_analytics_db 提供獨立的連線池，TiDB 連線另外設定 tidb_isolation_read_engines
+"""
+from sqlalchemy import distinct, func
+from sqlalchemy.orm import Session
+
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+
+PAID_STATUSES = ("paid", "shipped", "delivered")
+
+
+def tiflash_hint(*tables: str) -> str:
+    return f"/*+ READ_FROM_STORAGE(TIFLASH[{', '.join(tables)}]) */"
+
+
+def with_tiflash(query, *tables: str):
+    """為查詢加上 TiFlash hint（只在 MySQL / TiDB 方言下生效）"""
+    return query.prefix_with(tiflash_hint(*tables), dialect="mysql")
+
+
+def product_performance(db: Session, limit: int = 10):
+    query = (
+        db.query(
+            Product.name,
+            Product.price,
+            func.sum(OrderItem.quantity).label("total_sold"),
+            func.sum(OrderItem.quantity * OrderItem.price).label("total_revenue"),
+            func.count(distinct(Order.user_id)).label("unique_customers"),
+            func.count(distinct(Order.id)).label("order_count")
+        )
+        .join(OrderItem, Product.id == OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(Order.status.in_(PAID_STATUSES))
+        .group_by(Product.id, Product.name, Product.price)
+        .order_by(func.sum(OrderItem.quantity * OrderItem.price).desc())
+        .limit(limit)
+    )
+    return with_tiflash(query, "products", "order_items", "orders").all()
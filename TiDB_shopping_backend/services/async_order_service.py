@@ -0,0 +1,45 @@
+"""
+訂單服務的 AsyncSession 版本（DB_MODE=async）
+
+交易內容與同步版共用 order_service 的實作，透過 AsyncSession.run_sync 在 async driver 上執行，
+重試退避使用 asyncio.sleep。
+"""
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schemas.order import OrderOut
+from services import idempotency_service, order_service
+from services.stock_service import InsufficientStock, run_with_retry_async
+
+
+async def place_order(db: AsyncSession, user_id: str, items: list,
+                      idempotency: Optional[idempotency_service.Claim] = None) -> OrderOut:
+    order_id, order_number, now = order_service.new_order_identity()
+    quantities = order_service.merge_quantities(items)
+
+    # TiDB 寫入衝突時重跑整個交易
+    try:
+        total_amount, order_items, price_bumped = await run_with_retry_async(
+            db,
+            lambda session: order_service.write_order(
+                session, user_id, items, order_id, order_number, now, quantities, idempotency
+            ),
+            quantities
+        )
+    except InsufficientStock as e:
+        raise HTTPException(status_code=400, detail=f"Not enough stock for product {e.product_id}")
+
+    return order_service.order_placed(
+        order_id, order_number, now, user_id, quantities, total_amount, order_items, price_bumped
+    )
+
+
+async def list_orders(
+    db: AsyncSession,
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    return await db.run_sync(order_service.list_orders, user_id, limit, cursor)
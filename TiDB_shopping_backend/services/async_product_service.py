@@ -0,0 +1,44 @@
+"""
+商品服務的 AsyncSession 版本（DB_MODE=async）
+
+先讀商品目錄快取；未命中時以 AsyncSession.run_sync 執行與同步版相同的查詢
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schemas.product import ProductDetailOut
+from services import catalog_cache, product_service
+
+_MISSING = object()
+
+
+async def list_products(
+    db: AsyncSession,
+    category: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> Tuple[bytes, Optional[str]]:
+    """回傳 (該頁商品的 JSON bytes, 下一頁 cursor)"""
+    key = (category, sort_by, skip, limit, cursor)
+    # 與 TTLCache.get_or_load 相同：讀取期間快取若有失效，讀到的頁面不寫入
+    generation = catalog_cache.product_lists.generation()
+    page = catalog_cache.product_lists.get(key, _MISSING)
+    if page is _MISSING:
+        page = await db.run_sync(product_service.load_product_list_json, category, sort_by, skip, limit, cursor)
+        catalog_cache.product_lists.set(
+            key, page, tags=catalog_cache.list_page_tags(sort_by)(page), generation=generation
+        )
+    return page[:2]
+
+
+async def get_product(db: AsyncSession, product_id: int) -> ProductDetailOut:
+    generation = catalog_cache.product_details.generation()
+    product = catalog_cache.product_details.get(product_id, _MISSING)
+    if product is _MISSING:
+        # 找不到商品時會拋出 404，不會寫入快取
+        product = await db.run_sync(product_service.load_product_detail, product_id)
+        catalog_cache.product_details.set(product_id, product, generation=generation)
+    return product
@@ -0,0 +1,63 @@
+"""
+商品目錄的讀取快取
+
+商品資料只會在訂單（扣庫存 / sold / 調價）與管理端庫存維護時變動，
+因此 GET /api/products、/api/products/{id}、/api/admin/products 先讀行程內快取，
+寫入路徑在 commit 之後呼叫 invalidate_products() 讓受影響的項目失效。
+列表頁只顯示 ProductOut 欄位（不含庫存），因此只有頁內商品的 sold / 價格變動才讓該頁失效：
+每一頁以頁內商品 id 與排序方式作為 tags，只扣庫存的訂單不會清掉列表快取。
+快取只存在單一行程內；多個 worker 之間靠 TTL 收斂。
+"""
+import os
+from typing import Callable, Hashable, Iterable, List, Optional
+
+from cache import TTLCache
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "10000"))
+
+# 單一商品詳細資料：key = product_id
+product_details = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL, name="product_details")
+# 商品列表頁：key = (category, sort_by, skip, limit, cursor)，
+# value = (已序列化的 JSON bytes, 下一頁 cursor, 頁內商品 id)；
+# 管理端列表使用 ("admin",)，value 為 JSON bytes
+product_lists = TTLCache(maxsize=1024, ttl=CATALOG_CACHE_TTL, name="product_lists")
+
+# 管理端完整列表包含所有商品，任何商品的 sold / 價格變動都要失效
+ALL_PRODUCTS = ("all",)
+# 價格變動時商品可能移入原本不含它的價格排序頁，這些頁整批失效
+PRICE_SORTED = (("sort", "price_asc"), ("sort", "price_desc"))
+
+
+def list_page_tags(sort_by: Optional[str]) -> Callable[[tuple], List[Hashable]]:
+    """get_or_load 的 tags：頁內商品 id 加上排序方式"""
+    return lambda page: [*page[2], ("sort", sort_by)]
+
+
+def admin_list_tags(_) -> List[Hashable]:
+    return [ALL_PRODUCTS]
+
+
+def invalidate_products(product_ids: Optional[Iterable[int]] = None, lists: bool = True,
+                        reorder: bool = False) -> None:
+    """
+    商品被修改後呼叫：讓指定商品的詳細資料失效（None 代表全部，同時清空列表）
+    lists：列表顯示的欄位（sold / 價格）有變動，讓包含這些商品的列表頁失效；只改庫存時傳 False
+    reorder：價格有變動，另外讓所有價格排序頁失效
+    """
+    if product_ids is None:
+        product_details.clear()
+        product_lists.clear()
+        return
+    product_ids = list(product_ids)
+    for pid in product_ids:
+        product_details.invalidate(pid)
+    if lists or reorder:
+        product_lists.invalidate_tags([*product_ids, ALL_PRODUCTS, *(PRICE_SORTED if reorder else ())])
+
+
+def stats() -> dict:
+    return {
+        "product_details": product_details.stats(),
+        "product_lists": product_lists.stats(),
+    }
@@ -0,0 +1,241 @@
+"""
+Idempotency-Key（POST /api/orders、POST /api/payments/simulate/{order_id}）
+
+用戶端逾時重送時帶同一個 Idempotency-Key，第二次之後直接回傳第一次的回應，不再重跑扣庫存 / 付款交易：
+1. begin()：先查行程內快取；未命中時 INSERT 一筆 in_progress 紀錄（主鍵衝突代表 key 已存在），
+   已完成 → 回傳保存的回應；處理中 → 409；鎖逾時（持有者當機）→ 接手
+2. 業務交易 commit 前呼叫 complete()，把回應寫入同一筆紀錄：訂單與回應在同一個交易內成立，
+   若 key 已被接手則整個交易 rollback，不會產生重複訂單
+3. 業務失敗（例如庫存不足）時 release() 刪除紀錄，讓用戶端可以重試；錯誤回應不保存
+紀錄在 IDEMPOTENCY_TTL_SECONDS 後過期，過期的 key 視為不存在；purge_expired() 分批清除
+（scripts/purge_idempotency_keys.py，可由 cron 執行）。
+"""
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, TypeVar, Union
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models.idempotency_key import IdempotencyKey
+
+T = TypeVar("T")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 128
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# in_progress 紀錄超過這個時間仍未完成，視為持有者已中斷，允許重送的請求接手
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+PURGE_CHUNK_SIZE = 1000
+
+# 已完成的回應：key = (scope, idempotency key)；多個 worker 之間以資料表為準
+responses = TTLCache(
+    maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=min(IDEMPOTENCY_TTL_SECONDS, 600), name="idempotency_responses"
+)
+
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: Any
+
+
+@dataclass
+class Claim:
+    """目前請求持有的 key；complete() 之後帶著要保存的回應"""
+    scope: str
+    key: str
+    request_hash: str
+    lock_token: str
+    response: Optional[StoredResponse] = field(default=None)
+
+
+def request_hash(*parts) -> str:
+    """請求內容的指紋：同一個 key 搭配不同內容視為用戶端錯誤"""
+    return hashlib.sha256(json.dumps(jsonable_encoder(parts), sort_keys=True).encode()).hexdigest()
+
+
+def _check_hash(stored_hash: str, current_hash: str) -> None:
+    if stored_hash != current_hash:
+        raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} 已用於內容不同的請求")
+
+
+def _in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="相同 Idempotency-Key 的請求仍在處理中",
+        headers={"Retry-After": "1"},
+    )
+
+
+def begin(db: Session, scope: str, key: str, fingerprint: str) -> Union[StoredResponse, Claim]:
+    """取得 key：已完成時回傳 StoredResponse，否則回傳本次請求的 Claim（已 commit）"""
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} 長度不可超過 {MAX_KEY_LENGTH}")
+    cached = responses.get((scope, key))
+    if cached is not None:
+        _check_hash(cached.request_hash, fingerprint)
+        return cached
+
+    for _ in range(3):
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        try:
+            db.execute(insert(IdempotencyKey).values(
+                scope=scope, key=key, request_hash=fingerprint, status="in_progress",
+                lock_token=token, locked_at=now, created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            ))
+            db.commit()
+            return Claim(scope, key, fingerprint, token)
+        except IntegrityError:
+            db.rollback()
+
+        record = db.get(IdempotencyKey, (scope, key), populate_existing=True)
+        if record is None:
+            continue
+        if record.expires_at <= now:
+            db.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+            ))
+            db.commit()
+            continue
+        _check_hash(record.request_hash, fingerprint)
+        if record.status == "completed":
+            stored = StoredResponse(record.request_hash, record.response_status, json.loads(record.response_body))
+            db.rollback()
+            responses.set((scope, key), stored)
+            return stored
+        if record.locked_at > now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+            db.rollback()
+            raise _in_progress()
+
+        # 持有者逾時未完成（訂單交易未 commit），以新的 token 接手
+        result = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress",
+                IdempotencyKey.lock_token == record.lock_token,
+            )
+            .values(lock_token=token, locked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return Claim(scope, key, fingerprint, token)
+    raise _in_progress()
+
+
+def complete(db: Session, claim: Claim, status_code: int, body: Any) -> None:
+    """在業務交易內（commit 前）保存回應；key 已被其他請求接手時拋出 409，呼叫端的交易會 rollback"""
+    body = jsonable_encoder(body)
+    now = datetime.utcnow()
+    result = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.scope == claim.scope,
+            IdempotencyKey.key == claim.key,
+            IdempotencyKey.status == "in_progress",
+            IdempotencyKey.lock_token == claim.lock_token,
+        )
+        .values(
+            status="completed",
+            response_status=status_code,
+            response_body=json.dumps(body),
+            lock_token=None,
+            expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise _in_progress()
+    claim.response = StoredResponse(claim.request_hash, status_code, body)
+
+
+def remember(claim: Claim) -> None:
+    """業務交易 commit 之後，把保存的回應放進行程內快取"""
+    if claim.response is not None:
+        responses.set((claim.scope, claim.key), claim.response)
+
+
+def release(db: Session, claim: Claim) -> None:
+    """業務失敗時刪除 in_progress 紀錄，讓用戶端可以用同一個 key 重試"""
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.scope == claim.scope,
+        IdempotencyKey.key == claim.key,
+        IdempotencyKey.status == "in_progress",
+        IdempotencyKey.lock_token == claim.lock_token,
+    ))
+    db.commit()
+
+
+def replay(stored: StoredResponse) -> JSONResponse:
+    return JSONResponse(status_code=stored.status_code, content=stored.body, headers={REPLAYED_HEADER: "true"})
+
+
+def run_idempotent(db: Session, scope: str, key: Optional[str], fingerprint: str,
+                   handler: Callable[[Optional[Claim]], T]) -> Union[T, JSONResponse]:
+    """
+    沒有 key 時直接執行 handler(None)；
+    有 key 時 handler(claim) 必須在自己的交易 commit 前呼叫 complete(db, claim, ...)
+    """
+    if not key:
+        return handler(None)
+    claim = begin(db, scope, key, fingerprint)
+    if isinstance(claim, StoredResponse):
+        return replay(claim)
+    try:
+        result = handler(claim)
+    except BaseException:
+        release(db, claim)
+        raise
+    remember(claim)
+    return result
+
+
+async def run_idempotent_async(db, scope: str, key: Optional[str], fingerprint: str,
+                               handler: Callable[[Optional[Claim]], Awaitable[T]]) -> Union[T, JSONResponse]:
+    """run_idempotent 的 AsyncSession 版本，key 的讀寫透過 run_sync 執行"""
+    if not key:
+        return await handler(None)
+    claim = await db.run_sync(begin, scope, key, fingerprint)
+    if isinstance(claim, StoredResponse):
+        return replay(claim)
+    try:
+        result = await handler(claim)
+    except BaseException:
+        await db.run_sync(release, claim)
+        raise
+    remember(claim)
+    return result
+
+
+def purge_expired(db: Session) -> int:
+    """分批刪除過期的紀錄（MySQL / TiDB 以 DELETE ... LIMIT 控制每個交易的大小），回傳刪除的列數"""
+    deleted = 0
+    while True:
+        result = db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .with_dialect_options(mysql_limit=PURGE_CHUNK_SIZE)
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < PURGE_CHUNK_SIZE:
+            return deleted
@@ -0,0 +1,172 @@
+"""
+管理端批次庫存匯入（倉儲同步）
+
+資料列累積到 BULK_STOCK_CHUNK_SIZE 筆就以一個交易寫入：一次查詢載入目標商品、單一 CASE UPDATE 寫回，
+每個交易的大小固定，不會碰到 TiDB 的交易大小 / 語句數上限；寫入衝突時以 run_with_retry 重試該批。
+JSON 匯入回傳每一列的結果；CSV 串流上傳只回傳摘要與有問題的列，避免 10 萬列的回應本身過大。
+"""
+import codecs
+import csv
+import os
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from schemas.product import StockUpdateItem, StockUpdateResult
+from services import catalog_cache
+from services.stock_service import run_with_retry, set_stock_levels
+
+BULK_STOCK_CHUNK_SIZE = int(os.getenv("BULK_STOCK_CHUNK_SIZE", "2000"))
+CSV_COLUMNS = ("product_id", "stock")
+
+
+class StockImport:
+    """累積待寫入的資料列，每滿一批就寫入並記錄結果"""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None, keep_all_results: bool = True):
+        self.db = db
+        self.chunk_size = chunk_size or BULK_STOCK_CHUNK_SIZE
+        self.keep_all_results = keep_all_results
+        self.pending: List[Tuple[Optional[int], StockUpdateItem]] = []
+        self.results: List[StockUpdateResult] = []
+        self.counts: Dict[str, int] = {
+            "updated": 0, "unchanged": 0, "not_found": 0, "superseded": 0, "invalid": 0
+        }
+        self.chunks = 0
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.pending) >= self.chunk_size
+
+    def add(self, item: StockUpdateItem, line: Optional[int] = None) -> None:
+        self.pending.append((line, item))
+
+    def add_invalid(self, line: int, error: str, product_id: Optional[int] = None) -> None:
+        self._record(StockUpdateResult(product_id=product_id, status="invalid", line=line, error=error))
+
+    def flush(self) -> None:
+        """把目前累積的資料列以一個交易寫入"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+
+        # 同一批內同一商品出現多次時以最後一筆為準
+        levels = {item.product_id: item.stock for _, item in pending}
+        last_index = {item.product_id: i for i, (_, item) in enumerate(pending)}
+        # 不傳 product_ids：匯入不計入結帳的逐商品衝突統計
+        found = run_with_retry(self.db, lambda: set_stock_levels(self.db, levels))
+        self.chunks += 1
+        catalog_cache.invalidate_products([pid for pid in found if found[pid][1] != levels[pid]], lists=False)
+
+        for i, (line, item) in enumerate(pending):
+            if last_index[item.product_id] != i:
+                status = "superseded"
+            elif item.product_id not in found:
+                status = "not_found"
+            else:
+                status = "unchanged" if found[item.product_id][1] == item.stock else "updated"
+            name, old_stock = found.get(item.product_id, (None, None))
+            self._record(StockUpdateResult(
+                product_id=item.product_id, status=status, product_name=name,
+                old_stock=old_stock, new_stock=item.stock if status in ("updated", "unchanged") else None,
+                line=line
+            ))
+
+    def _record(self, result: StockUpdateResult) -> None:
+        self.counts[result.status] += 1
+        if self.keep_all_results or result.status in ("not_found", "invalid"):
+            self.results.append(result)
+
+    def summary(self) -> dict:
+        return {"rows": sum(self.counts.values()), "chunks": self.chunks, **self.counts}
+
+
+def import_items(stock_import: StockImport, items: List[StockUpdateItem]) -> StockImport:
+    """
+    逐批寫入 items；某一批失敗時例外直接拋出，呼叫端可從 stock_import 取得已寫入的批數與各列結果
+    """
+    for item in items:
+        stock_import.add(item)
+        if stock_import.is_full:
+            stock_import.flush()
+    stock_import.flush()
+    return stock_import
+
+
+async def iter_csv_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """把上傳的位元組串流切成文字行（UTF-8，可含 BOM），不需要先讀完整個檔案"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    remainder = ""
+    async for chunk in chunks:
+        lines = (remainder + decoder.decode(chunk)).split("\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    remainder += decoder.decode(b"", final=True)
+    if remainder:
+        yield remainder
+
+
+def parse_csv_rows(lines: List[str], columns: Dict[str, int], first_line: int) -> Iterator[Tuple[int, object]]:
+    """
+    解析一批 CSV 行，逐列產生 (行號, StockUpdateItem 或錯誤訊息)
+    columns 為標題列中 product_id / stock 的欄位位置
+    """
+    for offset, row in enumerate(csv.reader(lines)):
+        line = first_line + offset
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        try:
+            yield line, StockUpdateItem(
+                product_id=row[columns["product_id"]].strip(),
+                stock=row[columns["stock"]].strip(),
+            )
+        except IndexError:
+            yield line, "缺少欄位"
+        except ValidationError as e:
+            yield line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+def parse_csv_header(line: str) -> Dict[str, int]:
+    header = [cell.strip().lower() for cell in next(csv.reader([line]), [])]
+    missing = [name for name in CSV_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"CSV 標題列缺少欄位: {', '.join(missing)}")
+    return {name: header.index(name) for name in CSV_COLUMNS}
+
+
+def _add_rows(stock_import: StockImport, rows: Iterator[Tuple[int, object]]) -> None:
+    for line, row in rows:
+        if isinstance(row, StockUpdateItem):
+            stock_import.add(row, line)
+        else:
+            stock_import.add_invalid(line, row)
+
+
+async def import_csv(stock_import: StockImport, chunks: AsyncIterator[bytes]) -> StockImport:
+    """
+    邊接收上傳內容邊解析，每累積 chunk_size 行就在 threadpool 寫入一批，
+    不必等整個檔案上傳完，也不會把整個檔案留在記憶體；標題列錯誤或內容為空時拋出 ValueError
+    """
+    columns = None
+    batch: List[str] = []
+    batch_start = line_no = 0
+    async for line in iter_csv_lines(chunks):
+        line_no += 1
+        if columns is None:
+            columns = parse_csv_header(line)
+            batch_start = line_no + 1
+            continue
+        batch.append(line)
+        if len(batch) >= stock_import.chunk_size:
+            _add_rows(stock_import, parse_csv_rows(batch, columns, batch_start))
+            batch, batch_start = [], line_no + 1
+            await run_in_threadpool(stock_import.flush)
+
+    if columns is None:
+        raise ValueError("CSV 內容為空")
+    _add_rows(stock_import, parse_csv_rows(batch, columns, batch_start))
+    await run_in_threadpool(stock_import.flush)
+    return stock_import
@@ -0,0 +1,231 @@
+"""
+熱銷排行榜（增量維護）
+
+訂單建立、取消與狀態變更時，把該訂單對各商品的銷量 / 營收差額套用到 product_sales
+（由 outbox worker 批次套用，見 outbox_service），
+/api/products/bestsellers 直接依 units_sold 取前 N 名。
+reconcile() 以完整重算（與 /api/debug/htap-verification 共用同一個聚合查詢）核對增量結果。
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence
+
+from sqlalchemy import case, distinct, func, insert, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+from models.product_sales import ProductSales
+from services.analytics_service import tiflash_hint
+
+# 計入銷量的訂單狀態（與原本即時 HTAP 查詢相同）
+COUNTED_STATUSES = ("PENDING", "paid", "shipped", "delivered")
+
+REVENUE_TOLERANCE = 0.01
+
+
+def is_counted(status: Optional[str]) -> bool:
+    return status in COUNTED_STATUSES
+
+
+def sales_aggregate_query(db: Session, statuses: Optional[Sequence[str]] = None):
+    """
+    每個商品的實際銷量、訂單數、營收與最後售出時間（從訂單明細完整重算）
+    statuses 為 None 時計入所有訂單明細；否則只計入指定狀態的訂單
+    """
+    def counted(expr):
+        if statuses is None:
+            return expr
+        return case((Order.status.in_(statuses), expr), else_=None)
+
+    return (
+        db.query(
+            Product.id.label("product_id"),
+            Product.name,
+            Product.sold,
+            func.coalesce(func.sum(counted(OrderItem.quantity)), 0).label("actual_sales"),
+            func.count(distinct(counted(Order.id))).label("order_count"),
+            func.coalesce(func.sum(counted(OrderItem.quantity * OrderItem.price)), 0).label("revenue"),
+            func.max(counted(Order.order_date)).label("last_sold_date"),
+        )
+        .outerjoin(OrderItem, Product.id == OrderItem.product_id)
+        .outerjoin(Order, Order.id == OrderItem.order_id)
+        .group_by(Product.id, Product.name, Product.sold)
+        .prefix_with(tiflash_hint("products", "order_items", "orders"), dialect="mysql")
+    )
+
+
+def add_order_deltas(deltas: Dict[int, list], items: Iterable, order_date: datetime, sign: int = 1) -> None:
+    """
+    把一張訂單的明細（OrderItem 或含 product_id / quantity / price 的 dict）以 sign（+1 / -1）累加到
+    deltas = {product_id: [units, orders, revenue, last_sold_date]}，多張訂單可累加後一次套用
+    """
+    touched = set()
+    for item in items:
+        get = item.get if isinstance(item, dict) else lambda k: getattr(item, k)
+        pid = get("product_id")
+        delta = deltas.setdefault(pid, [0, 0, 0.0, None])
+        delta[0] += sign * get("quantity")
+        delta[2] += sign * get("quantity") * get("price")
+        if pid not in touched:
+            touched.add(pid)
+            delta[1] += sign
+            if sign > 0 and (delta[3] is None or delta[3] < order_date):
+                delta[3] = order_date
+
+
+def apply_sales_deltas(db: Session, deltas: Dict[int, list]) -> None:
+    """
+    以一句 UPDATE 套用 add_order_deltas 累積的差額；第一次賣出的商品才會多一次查詢與 upsert
+    """
+    if not deltas:
+        return
+
+    now = datetime.utcnow()
+    values = {
+        "units_sold": ProductSales.units_sold + case(
+            {pid: d[0] for pid, d in deltas.items()}, value=ProductSales.product_id
+        ),
+        "order_count": ProductSales.order_count + case(
+            {pid: d[1] for pid, d in deltas.items()}, value=ProductSales.product_id
+        ),
+        "revenue": ProductSales.revenue + case(
+            {pid: d[2] for pid, d in deltas.items()}, value=ProductSales.product_id
+        ),
+        "updated_at": now,
+    }
+    sold_dates = {pid: d[3] for pid, d in deltas.items() if d[3] is not None}
+    if sold_dates:
+        sold_date = case(sold_dates, value=ProductSales.product_id, else_=None)
+        values["last_sold_date"] = case(
+            (or_(ProductSales.last_sold_date.is_(None), ProductSales.last_sold_date < sold_date), sold_date),
+            else_=ProductSales.last_sold_date,
+        )
+    result = db.execute(
+        update(ProductSales)
+        .where(ProductSales.product_id.in_(deltas))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == len(deltas):
+        return
+
+    # 扣回時若排行榜尚無該商品（例如尚未回填歷史資料），留給 reconcile() 修正
+    existing = set(db.scalars(select(ProductSales.product_id).where(ProductSales.product_id.in_(deltas))))
+    missing = [
+        {
+            "product_id": pid,
+            "units_sold": units,
+            "order_count": orders,
+            "revenue": revenue,
+            "last_sold_date": last_sold_date,
+            "updated_at": now,
+        }
+        for pid, (units, orders, revenue, last_sold_date) in deltas.items()
+        if pid not in existing and units > 0
+    ]
+    if missing:
+        _insert_missing(db, missing)
+
+
+def _insert_missing(db: Session, rows: list) -> None:
+    """
+    建立第一次賣出的商品列；另一個 worker 同時建立同一列時改為累加差額
+    （MySQL / TiDB 與 SQLite 都是一句 upsert，不必靠重試處理 duplicate key）
+    """
+    def increments(new):
+        return {
+            "units_sold": ProductSales.units_sold + new.units_sold,
+            "order_count": ProductSales.order_count + new.order_count,
+            "revenue": ProductSales.revenue + new.revenue,
+            "last_sold_date": case(
+                (or_(ProductSales.last_sold_date.is_(None), ProductSales.last_sold_date < new.last_sold_date),
+                 new.last_sold_date),
+                else_=ProductSales.last_sold_date,
+            ),
+            "updated_at": new.updated_at,
+        }
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(ProductSales).values(rows)
+        db.execute(stmt.on_duplicate_key_update(**increments(stmt.inserted)))
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(ProductSales).values(rows)
+        db.execute(stmt.on_conflict_do_update(index_elements=["product_id"], set_=increments(stmt.excluded)))
+    else:
+        db.execute(insert(ProductSales), rows)
+
+
+def top_products(db: Session, limit: int = 5):
+    """
+    依 units_sold 取前 N 名，回傳 (Product, units_sold)；
+    有銷量的商品不足 N 個時，以尚無銷量的商品補齊（銷量為 0）
+    """
+    results = (
+        db.query(Product, ProductSales.units_sold)
+        .join(ProductSales, ProductSales.product_id == Product.id)
+        .filter(ProductSales.units_sold > 0)
+        .order_by(ProductSales.units_sold.desc())
+        .limit(limit)
+        .all()
+    )
+    if len(results) < limit:
+        ranked = [p.id for p, _ in results]
+        fillers = db.query(Product)
+        if ranked:
+            fillers = fillers.filter(Product.id.notin_(ranked))
+        results += [(p, 0) for p in fillers.order_by(Product.id).limit(limit - len(results)).all()]
+    return results
+
+
+def reconcile(db: Session, repair: bool = False) -> dict:
+    """
+    以完整重算核對增量維護的排行榜；repair=True 時以重算結果覆寫不一致的列
+    （首次部署時執行 repair 即可回填既有訂單）
+    """
+    expected = {
+        row.product_id: row
+        for row in sales_aggregate_query(db, COUNTED_STATUSES).all()
+    }
+    stored = {row.product_id: row for row in db.query(ProductSales).all()}
+
+    mismatches = []
+    for pid, row in expected.items():
+        current = stored.get(pid)
+        units, orders, revenue = int(row.actual_sales), int(row.order_count), float(row.revenue)
+        stored_values = (
+            (current.units_sold, current.order_count, current.revenue) if current else (0, 0, 0.0)
+        )
+        if (
+            stored_values[0] != units
+            or stored_values[1] != orders
+            or abs(stored_values[2] - revenue) > REVENUE_TOLERANCE
+        ):
+            mismatches.append({
+                "product_id": pid,
+                "product": row.name,
+                "stored": {"units_sold": stored_values[0], "order_count": stored_values[1], "revenue": stored_values[2]},
+                "expected": {"units_sold": units, "order_count": orders, "revenue": revenue},
+            })
+            if repair:
+                if current is None:
+                    current = ProductSales(product_id=pid)
+                    db.add(current)
+                current.units_sold = units
+                current.order_count = orders
+                current.revenue = revenue
+                current.last_sold_date = row.last_sold_date
+                current.updated_at = datetime.utcnow()
+
+    if repair:
+        db.commit()
+
+    return {
+        "checked_products": len(expected),
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches,
+        "repaired": repair and bool(mismatches),
+    }
@@ -1,53 +1,251 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, load_only, selectinload
 from fastapi import HTTPException
 from models.product import Product
-from models.order import Order
+from models.order import Order, PriceAdjustHistory
 from models.order_item import OrderItem
+from schemas.order import OrderOut
+from schemas.order_item import OrderItemOut
+from serialization import order_dict
+from pagination import decode_cursor, encode_cursor, keyset_filter, keyset_order, split_page
+from services import catalog_cache, idempotency_service, outbox_service
+from services.stock_service import (
+    InsufficientStock,
+    load_shard_info,
+    release_stock,
+    reserve_stock,
+    run_with_retry,
+    stats as stock_stats,
+)
 import uuid
 from datetime import datetime
 
-def create_order(db: Session, user_id: str, items: list):
+def new_order_identity():
+    """產生訂單 id、訂單編號與建立時間"""
     order_id = str(uuid.uuid4())
     order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{order_id[:8]}"
-    
+    return order_id, order_number, datetime.utcnow()
+
+def merge_quantities(items: list) -> dict:
+    """合併同一商品的多筆明細，之後每個步驟都只需要一次查詢（不隨購物車大小增加）"""
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    return quantities
+
+def write_order(db: Session, user_id: str, items: list, order_id: str, order_number: str,
+                now: datetime, quantities: dict, idempotency: Optional[idempotency_service.Claim] = None):
+    """
+    在目前交易內寫入一張訂單（不 commit，可被 run_with_retry 重跑），回傳 (total_amount, order_items, price_bumped)
+    帶 Idempotency-Key 時，回應與訂單寫在同一個交易內
+    items 為含 product_id / quantity 的 dict
+    """
+    # 1. 一次 IN (...) 查詢載入購物車內所有商品（不加鎖，超賣由下方條件式扣減保護）
+    products = {
+        p.id: p
+        for p in db.query(Product).filter(Product.id.in_(quantities)).all()
+    }
+    # 分片庫存的商品以各分片總和作為實際庫存
+    shard_info = load_shard_info(db, quantities)
+    stock_levels = {
+        pid: shard_info[pid][1] if pid in shard_info else p.stock
+        for pid, p in products.items()
+    }
+
+    # 計算 total amount - 從數據庫獲取實際價格
     total_amount = 0
-    # 1. 檢查庫存和計算總價
     for item in items:
-        product = db.query(Product).filter(Product.id == item['product_id']).first()
+        product = products.get(item['product_id'])
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {item['product_id']} not found")
-        if product.stock < item['quantity']:
-            raise HTTPException(status_code=400, detail=f"Product {product.name} stock insufficient")
+        if stock_levels[product.id] < quantities[product.id]:
+            # 預先檢查擋下的訂單同樣計入庫存不足統計
+            stock_stats.record_insufficient([product.id])
+            raise HTTPException(status_code=400, detail=f"Not enough stock for product {product.name}")
         total_amount += product.price * item['quantity']
-    
-    # 2. 建立訂單
-    new_order = Order(
+
+    # 2. 一次查詢取得已調過價的商品；庫存低於門檻的第一次結帳在同一個交易內調價（每個商品只調一次）
+    already_adjusted = set(
+        db.scalars(
+            select(PriceAdjustHistory.product_id).where(PriceAdjustHistory.product_id.in_(quantities))
+        )
+    )
+    price_bumped = claim_price_bumps(db, [
+        pid for pid, qty in quantities.items()
+        if stock_levels[pid] - qty < 500 and pid not in already_adjusted
+    ], now)
+    prices = {pid: products[pid].price + (10 if pid in price_bumped else 0) for pid in quantities}
+
+    db.add(Order(
         id=order_id,
         order_number=order_number,
-        order_date=datetime.utcnow(),
+        order_date=now,
         total_amount=total_amount,
         status="PENDING",
         user_id=user_id
+    ))
+    db.flush()
+
+    # 3. 單一條件式 UPDATE 原子扣庫存（WHERE stock >= qty）
+    # sold、排行榜與銷售趨勢不在結帳交易內處理，改由 outbox worker 批次套用
+    reserve_stock(db, quantities, shard_info=shard_info)
+
+    # 4. 一次 bulk insert 建立所有訂單項目
+    order_items = [
+        {
+            "id": str(uuid.uuid4()),
+            "order_id": order_id,
+            "product_id": item['product_id'],
+            "product_name": products[item['product_id']].name,
+            "quantity": item['quantity'],
+            "price": prices[item['product_id']]  # 使用從數據庫獲取的價格
+        }
+        for item in items
+    ]
+    db.execute(insert(OrderItem), order_items)
+
+    # 5. 同一個交易內寫入 outbox 事件（sold / 排行榜 / 銷售趨勢）
+    outbox_service.enqueue_order_created(db, order_id, now, total_amount, "PENDING", order_items)
+    if idempotency is not None:
+        idempotency_service.complete(
+            db, idempotency, 201, order_response(order_id, order_number, now, user_id, total_amount, order_items)
+        )
+    return total_amount, order_items, price_bumped
+
+def claim_price_bumps(db: Session, product_ids: list, now: datetime) -> set:
+    """
+    在目前交易內為商品寫入調價紀錄並把價格 +10，回傳實際調價的商品
+    price_adjust_history 以 product_id 為主鍵：併發結帳同時判定要調價時，只有成功寫入紀錄的一方會調價，
+    另一方的 INSERT 被忽略（不會觸發重試），該筆訂單以原價計算
+    """
+    claimed = set()
+    dialect = db.get_bind().dialect.name
+    for pid in sorted(product_ids):
+        values = {"product_id": pid, "adjusted_at": now}
+        if dialect == "mysql":
+            result = db.execute(mysql_insert(PriceAdjustHistory).prefix_with("IGNORE").values(**values))
+        elif dialect == "sqlite":
+            result = db.execute(sqlite_insert(PriceAdjustHistory).values(**values).on_conflict_do_nothing())
+        else:
+            result = db.execute(insert(PriceAdjustHistory).values(**values))
+        if result.rowcount == 1:
+            claimed.add(pid)
+    if claimed:
+        db.execute(
+            update(Product)
+            .where(Product.id.in_(claimed))
+            .values(price=Product.price + 10)
+            .execution_options(synchronize_session=False)
+        )
+    return claimed
+
+def order_response(order_id: str, order_number: str, now: datetime, user_id: str,
+                   total_amount: float, order_items: list) -> OrderOut:
+    """回應直接由已知資料組成，不再 refresh / lazy load 訂單項目"""
+    return OrderOut(
+        id=order_id,
+        order_number=order_number,
+        order_date=now,
+        total_amount=total_amount,
+        status="PENDING",
+        user_id=user_id,
+        items=[OrderItemOut(**oi) for oi in order_items]
     )
-    db.add(new_order)
-    
-    # 3. 建立訂單明細與扣庫存
-    for item in items:
-        product = db.query(Product).filter(Product.id == item['product_id']).first()
-        product.stock -= item['quantity']
-
-        order_item = OrderItem(
-            id=str(uuid.uuid4()),
-            order_id=order_id,
-            product_id=product.id,
-            product_name=product.name,
-            quantity=item['quantity'],
-            price=product.price
+
+def order_placed(order_id: str, order_number: str, now: datetime, user_id: str,
+                 quantities: dict, total_amount: float, order_items: list, price_bumped: set = frozenset()) -> OrderOut:
+    """訂單 commit 之後的共同處理"""
+    # 庫存已變動，讓商品詳細資料快取失效；列表不含庫存，只有調價時才失效（sold 由 outbox worker 更新後再失效）
+    catalog_cache.invalidate_products(quantities, lists=False)
+    if price_bumped:
+        catalog_cache.invalidate_products(price_bumped, reorder=True)
+    return order_response(order_id, order_number, now, user_id, total_amount, order_items)
+
+def place_order(db: Session, user_id: str, items: list,
+                idempotency: Optional[idempotency_service.Claim] = None) -> OrderOut:
+    order_id, order_number, now = new_order_identity()
+    quantities = merge_quantities(items)
+
+    # TiDB 寫入衝突時重跑整個交易
+    try:
+        total_amount, order_items, price_bumped = run_with_retry(
+            db,
+            lambda: write_order(db, user_id, items, order_id, order_number, now, quantities, idempotency),
+            quantities
         )
-        db.add(order_item)
-    db.commit()
-    db.refresh(new_order)
-    return new_order
+    except InsufficientStock as e:
+        raise HTTPException(status_code=400, detail=f"Not enough stock for product {e.product_id}")
+
+    return order_placed(order_id, order_number, now, user_id, quantities, total_amount, order_items, price_bumped)
+
+def create_order(db: Session, user_id: str, items: list):
+    """與 place_order 相同，但回傳 Order ORM 物件"""
+    placed = place_order(db, user_id, items)
+    return db.get(Order, placed.id)
+
+def list_orders(
+    db: Session,
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    使用者的訂單歷史（新到舊），回傳 (訂單, 下一頁 cursor)，訂單為 OrderOut 欄位的 dict
+    訂單與明細各一次查詢（selectinload 以 IN 一次載入該頁所有訂單的 items），查詢次數不隨訂單數增加；
+    指定 limit 時以 (order_date, id) keyset 分頁，走 (user_id, order_date, id) 複合索引
+    """
+    columns = (Order.order_date, Order.id)
+    query = (
+        db.query(Order)
+        .options(
+            load_only(Order.id, Order.order_number, Order.order_date, Order.total_amount, Order.status, Order.user_id),
+            selectinload(Order.items).load_only(
+                OrderItem.id, OrderItem.order_id, OrderItem.product_id,
+                OrderItem.product_name, OrderItem.quantity, OrderItem.price
+            ),
+        )
+        .filter(Order.user_id == user_id)
+        .order_by(*keyset_order(columns, descending=True))
+    )
+    if cursor:
+        order_date, last_id = decode_cursor(cursor, "orders", len(columns))
+        if order_date is not None:
+            try:
+                order_date = datetime.fromisoformat(order_date)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(keyset_filter(columns, (order_date, last_id), descending=True))
+
+    if limit is None:
+        orders, has_more = query.all(), False
+    else:
+        orders, has_more = split_page(query.limit(limit + 1).all(), limit)
+
+    next_cursor = None
+    if has_more:
+        last = orders[-1]
+        next_cursor = encode_cursor("orders", [last.order_date.isoformat() if last.order_date else None, last.id])
+    return [order_dict(order) for order in orders], next_cursor
+
+def change_order_status(db: Session, order: Order, new_status: str) -> Optional[str]:
+    """
+    以條件式 UPDATE（WHERE status = 先前讀到的狀態）轉換訂單狀態，回傳舊狀態（不 commit）
+    併發的另一個請求已先改變狀態時 rollback 並回 409：每次轉換只會有一個交易成功，
+    庫存只恢復一次、outbox 也只會有一筆狀態變更事件
+    """
+    old_status = order.status
+    result = db.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.is_not_distinct_from(old_status))
+        .values(status=new_status)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Order status was changed by another request")
+    return old_status
 
 def cancel_order(db: Session, user_id: str, order_id: str):
     order = db.query(Order).filter(Order.id == order_id, Order.user_id == user_id).first()
@@ -55,20 +253,24 @@ def cancel_order(db: Session, user_id: str, order_id: str):
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status != "PENDING":
         raise HTTPException(status_code=400, detail="Cannot cancel a non-pending order")
+    old_status = change_order_status(db, order, "CANCELLED")
 
-    # 恢復庫存
+    # 恢復庫存（單一 UPDATE）
+    quantities = {}
     for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        product.stock += item.quantity
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    release_stock(db, quantities)
 
-    order.status = "CANCELLED"
+    outbox_service.enqueue_status_change(db, order, old_status, "CANCELLED")
     db.commit()
+    catalog_cache.invalidate_products(quantities, lists=False)
     return order
 
 def update_order_status(db: Session, order_id: str, new_status: str):
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    order.status = new_status
+    old_status = change_order_status(db, order, new_status)
+    outbox_service.enqueue_status_change(db, order, old_status, new_status)
     db.commit()
     return order
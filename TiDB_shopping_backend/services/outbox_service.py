@@ -0,0 +1,401 @@
+"""
+交易式 outbox 與訂單副作用的背景處理
+
+結帳交易只做必要的寫入（扣庫存、訂單、訂單明細，以及庫存低於門檻的第一次調價），其餘副作用改成一筆 outbox 事件，
+與訂單寫在同一個交易內：訂單成立就一定有事件，訂單 rollback 事件也跟著消失。
+
+背景 worker（FastAPI event loop 上的 asyncio task，實際處理在 threadpool）批次取出未處理事件，
+把整批合併後套用：
+- products.sold：每批一句 CASE UPDATE（只計入 COUNTED_STATUSES 的訂單，取消 / 退款時扣回）
+- 熱銷排行榜（product_sales）與銷售趨勢彙總（sales_daily / sales_hourly）
+副作用與標記 processed_at 在同一個交易內完成；多個行程同時處理同一批時，標記列數不符的一方整批 rollback，
+因此每個事件只會被套用一次。整批失敗時改為逐筆處理，連續失敗 OUTBOX_MAX_ATTEMPTS 次的事件不再重試
+（留在資料表中供排查，計入 dead_letters）。
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import AdminSessionLocal
+from models.order import Order
+from models.outbox import OutboxEvent
+from models.product import Product
+from services import catalog_cache, leaderboard_service, sales_rollup_service
+from services.stock_service import run_with_retry
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+
+OUTBOX_WORKER_ENABLED = os.getenv("OUTBOX_WORKER_ENABLED", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# 已處理事件保留多久後刪除，以及 worker 多久清理一次
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "600"))
+PURGE_CHUNK_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class AlreadyProcessed(Exception):
+    """這批事件有部分已被其他 worker 處理"""
+
+
+class OutboxStats:
+    """worker 的批次大小、延遲與失敗統計（執行緒安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.events = 0
+        self.failures = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.last_processed_at: Optional[datetime] = None
+
+    def record_batch(self, size: int, lag_seconds: float, elapsed_ms: float):
+        with self._lock:
+            self.batches += 1
+            self.events += size
+            self.last_batch_size = size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.last_batch_ms = elapsed_ms
+            self.last_lag_seconds = lag_seconds
+            self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+            self.last_processed_at = datetime.utcnow()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "events": self.events,
+                "failures": self.failures,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "avg_batch_size": round(self.events / self.batches, 2) if self.batches else 0.0,
+                "last_batch_ms": round(self.last_batch_ms, 2),
+                "last_lag_seconds": round(self.last_lag_seconds, 3),
+                "max_lag_seconds": round(self.max_lag_seconds, 3),
+                "last_processed_at": self.last_processed_at,
+            }
+
+
+stats = OutboxStats()
+
+
+# ------------------------------
+# 寫入事件（在呼叫端的交易內，不 commit）
+# ------------------------------
+
+def enqueue(db: Session, event_type: str, aggregate_id: str, payload: dict) -> None:
+    db.execute(insert(OutboxEvent).values(
+        event_type=event_type,
+        aggregate_id=aggregate_id,
+        payload=json.dumps(payload, default=str),
+        created_at=datetime.utcnow(),
+        attempts=0,
+    ))
+
+
+def _item_payload(items: Iterable) -> List[dict]:
+    payload = []
+    for item in items:
+        get = item.get if isinstance(item, dict) else lambda k: getattr(item, k)
+        payload.append({"product_id": get("product_id"), "quantity": get("quantity"), "price": get("price")})
+    return payload
+
+
+def enqueue_order_created(db: Session, order_id: str, order_date: datetime, total_amount: float, status: str,
+                          order_items: Iterable) -> None:
+    enqueue(db, ORDER_CREATED, order_id, {
+        "order_id": order_id,
+        "order_date": order_date.isoformat(),
+        "total_amount": total_amount,
+        "status": status,
+        "items": _item_payload(order_items),
+    })
+
+
+def enqueue_status_change(db: Session, order: Order, old_status: Optional[str], new_status: Optional[str]) -> None:
+    """狀態變更影響排行榜或銷售趨勢時才寫入事件（只有這時才需要載入訂單明細）"""
+    if (
+        leaderboard_service.is_counted(old_status) == leaderboard_service.is_counted(new_status)
+        and not sales_rollup_service.order_sign(old_status, new_status)
+    ):
+        return
+    enqueue(db, ORDER_STATUS_CHANGED, order.id, {
+        "order_id": order.id,
+        "order_date": order.order_date.isoformat() if order.order_date else None,
+        "total_amount": order.total_amount,
+        "old_status": old_status,
+        "new_status": new_status,
+        "items": _item_payload(order.items),
+    })
+
+
+# ------------------------------
+# 套用事件
+# ------------------------------
+
+def _apply_sold(db: Session, sold: Dict[int, int]) -> None:
+    if not sold:
+        return
+    db.execute(
+        update(Product)
+        .where(Product.id.in_(sold))
+        .values(sold=func.coalesce(Product.sold, 0) + case(sold, value=Product.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_events(db: Session, events: List[OutboxEvent]) -> Set[int]:
+    """在目前交易內套用一批事件（不 commit），回傳 sold 有變動的商品"""
+    sold: Dict[int, int] = {}
+    sales: Dict[int, list] = {}
+    buckets: Dict[tuple, list] = {}
+
+    for event in events:
+        payload = json.loads(event.payload)
+        order_date = datetime.fromisoformat(payload["order_date"]) if payload.get("order_date") else None
+        if event.event_type == ORDER_CREATED:
+            old_status, new_status = None, payload["status"]
+        elif event.event_type == ORDER_STATUS_CHANGED:
+            old_status, new_status = payload["old_status"], payload["new_status"]
+        else:
+            raise ValueError(f"未知的 outbox 事件類型: {event.event_type}")
+
+        # sold 與排行榜相同，只計入 COUNTED_STATUSES 的訂單（與 sold_sync_service 重新同步的規則一致）：
+        # 建立時加上、取消 / 退款時扣回
+        sign = int(leaderboard_service.is_counted(new_status)) - int(leaderboard_service.is_counted(old_status))
+        if sign:
+            for item in payload["items"]:
+                sold[item["product_id"]] = sold.get(item["product_id"], 0) + sign * item["quantity"]
+            leaderboard_service.add_order_deltas(sales, payload["items"], order_date, sign)
+        sign = sales_rollup_service.order_sign(old_status, new_status)
+        if sign:
+            sales_rollup_service.add_order_buckets(buckets, order_date, payload["total_amount"], sign)
+
+    sold = {pid: delta for pid, delta in sold.items() if delta}
+    _apply_sold(db, sold)
+    leaderboard_service.apply_sales_deltas(db, sales)
+    sales_rollup_service.apply_buckets(db, buckets)
+    return set(sold)
+
+
+def _pending_query(db: Session):
+    return (
+        db.query(OutboxEvent)
+        .filter(OutboxEvent.processed_at.is_(None), OutboxEvent.attempts < OUTBOX_MAX_ATTEMPTS)
+        .order_by(OutboxEvent.created_at, OutboxEvent.id)
+    )
+
+
+def _mark_processed(db: Session, event_ids: List[int]) -> None:
+    result = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(event_ids), OutboxEvent.processed_at.is_(None))
+        .values(processed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(event_ids):
+        raise AlreadyProcessed()
+
+
+def _process(db: Session, events_query) -> tuple:
+    events = events_query.all()
+    if not events:
+        return 0, None, set()
+    changed = apply_events(db, events)
+    _mark_processed(db, [event.id for event in events])
+    return len(events), min(event.created_at for event in events), changed
+
+
+def _record_failure(db: Session, event_id: int, error: Exception) -> None:
+    stats.record_failure()
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == event_id)
+        .values(attempts=OutboxEvent.attempts + 1, last_error=str(error)[:1000])
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _process_one_by_one(db: Session, batch_size: int) -> tuple:
+    """整批失敗時逐筆處理，找出有問題的事件並累計其失敗次數"""
+    event_ids = [event_id for (event_id,) in _pending_query(db).with_entities(OutboxEvent.id).limit(batch_size)]
+    db.rollback()
+    processed, oldest, changed = 0, None, set()
+    for event_id in event_ids:
+        query = _pending_query(db).filter(OutboxEvent.id == event_id)
+        try:
+            count, created_at, event_changed = run_with_retry(db, lambda: _process(db, query))
+        except AlreadyProcessed:
+            continue
+        except Exception as e:
+            _record_failure(db, event_id, e)
+            continue
+        processed += count
+        changed |= event_changed
+        if created_at is not None and (oldest is None or created_at < oldest):
+            oldest = created_at
+    return processed, oldest, changed
+
+
+def process_batch(db: Session, batch_size: Optional[int] = None) -> int:
+    """處理最多 batch_size 個未處理事件（一個交易），回傳處理的事件數"""
+    batch_size = batch_size or OUTBOX_BATCH_SIZE
+    started = time.perf_counter()
+    query = _pending_query(db).limit(batch_size)
+    try:
+        processed, oldest, changed = run_with_retry(db, lambda: _process(db, query))
+    except AlreadyProcessed:
+        return 0
+    except Exception:
+        processed, oldest, changed = _process_one_by_one(db, batch_size)
+
+    if processed:
+        lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        stats.record_batch(processed, lag, (time.perf_counter() - started) * 1000)
+    if changed:
+        catalog_cache.invalidate_products(changed)
+    return processed
+
+
+def drain(db: Session, batch_size: Optional[int] = None) -> int:
+    """處理所有未處理事件（測試、腳本或關機前使用），回傳處理的事件數"""
+    total = 0
+    while True:
+        processed = process_batch(db, batch_size)
+        if not processed:
+            return total
+        total += processed
+
+
+def purge_processed(db: Session, older_than: Optional[timedelta] = None) -> int:
+    """分批刪除已處理超過保留期限的事件，回傳刪除的列數"""
+    cutoff = datetime.utcnow() - (older_than or timedelta(hours=OUTBOX_RETENTION_HOURS))
+    deleted = 0
+    while True:
+        ids = list(db.scalars(
+            select(OutboxEvent.id)
+            .where(OutboxEvent.processed_at.is_not(None), OutboxEvent.processed_at < cutoff)
+            .limit(PURGE_CHUNK_SIZE)
+        ))
+        if not ids:
+            db.rollback()
+            return deleted
+        db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+
+
+def backlog(db: Session) -> dict:
+    """目前未處理的事件數、最舊事件的等待時間（worker 延遲）與放棄重試的事件數"""
+    pending, oldest = (
+        db.query(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at))
+        .filter(OutboxEvent.processed_at.is_(None), OutboxEvent.attempts < OUTBOX_MAX_ATTEMPTS)
+        .one()
+    )
+    dead_letters = (
+        db.query(func.count(OutboxEvent.id))
+        .filter(OutboxEvent.processed_at.is_(None), OutboxEvent.attempts >= OUTBOX_MAX_ATTEMPTS)
+        .scalar()
+    )
+    return {
+        "pending": pending,
+        "oldest_pending_at": oldest,
+        "lag_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+        "dead_letters": dead_letters,
+    }
+
+
+# ------------------------------
+# 背景 worker
+# ------------------------------
+
+class OutboxWorker:
+    """
+    在 event loop 上輪詢 outbox：一批滿了就立刻處理下一批，否則等待 poll_interval；
+    資料庫操作使用同步 Session，在 threadpool 執行，不會卡住 event loop
+    """
+
+    def __init__(self, session_factory: sessionmaker, batch_size: Optional[int] = None,
+                 poll_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval if poll_interval is not None else OUTBOX_POLL_INTERVAL
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._last_purge = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stopping.set()
+        await self._task
+
+    def _process_once(self) -> int:
+        with self.session_factory() as db:
+            processed = process_batch(db, self.batch_size)
+            if time.monotonic() - self._last_purge >= OUTBOX_PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                purge_processed(db)
+        if processed:
+            logger.info("outbox 已處理訂單事件", extra={"events": processed})
+        return processed
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await run_in_threadpool(self._process_once)
+            except Exception:
+                stats.record_failure()
+                logger.exception("outbox worker 錯誤")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batch_size": self.batch_size,
+            "poll_interval_seconds": self.poll_interval,
+            **stats.snapshot(),
+        }
+
+
+worker = OutboxWorker(AdminSessionLocal)
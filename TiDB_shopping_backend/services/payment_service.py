@@ -1,15 +1,24 @@
+from typing import Optional
 from sqlalchemy.orm import Session
 from models.order import Order
 from fastapi import HTTPException
+from schemas.order import OrderOut
+from services import idempotency_service, order_service, outbox_service
 
-def simulate_payment(order_id: str, db: Session):
+def simulate_payment(order_id: str, db: Session, idempotency: Optional[idempotency_service.Claim] = None):
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if order.status != "pending":
+    # 新訂單的狀態為 PENDING（大寫）
+    if (order.status or "").lower() != "pending":
         raise HTTPException(status_code=400, detail="Order already paid or cancelled")
 
-    order.status = "paid"
+    # 條件式轉換狀態：與取消 / 另一筆付款併發時只有一方成功，另一方回 409
+    old_status = order_service.change_order_status(db, order, "paid")
+    outbox_service.enqueue_status_change(db, order, old_status, "paid")
+    if idempotency is not None:
+        # 回應與付款狀態在同一個交易內保存
+        idempotency_service.complete(db, idempotency, 200, OrderOut.model_validate(order))
     db.commit()
     db.refresh(order)
     return order
@@ -1,8 +1,14 @@
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from models.order_item import OrderItem
-from models.product import Product
+from models.product import Product, Category
 from models.order import Order
+from schemas.product import ProductDetailOut
+from pagination import decode_cursor, encode_cursor, keyset_filter, keyset_order, split_page
+from serialization import PRODUCT_FIELDS, dumps, row_dicts
+from services.stock_service import load_shard_info
 
 def get_best_sellers(db: Session, limit: int = 5):
     results = (
@@ -20,3 +26,86 @@ def get_best_sellers(db: Session, limit: int = 5):
     )
 
     return [product for product, _ in results]
+
+# 各排序模式的 keyset 排序鍵（最後一欄 id 作為同值時的穩定排序），需有對應的複合索引
+PRODUCT_SORTS = {
+    "price_asc": ((Product.price, Product.id), False),
+    "price_desc": ((Product.price, Product.id), True),
+    "name_asc": ((Product.name, Product.id), False),
+}
+DEFAULT_PRODUCT_SORT = ((Product.id,), False)
+
+# 列表只選 ProductOut 需要的欄位（不含 description），查詢回傳輕量的 Row，不建立 Product 實體、不進 identity map
+PRODUCT_LIST_COLUMNS = tuple(getattr(Product, name) for name in PRODUCT_FIELDS)
+
+def load_product_list(
+    db: Session,
+    category: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    回傳 (該頁商品, 下一頁 cursor)，商品為 ProductOut 欄位的 dict（不經 Pydantic 驗證，直接交給 orjson）
+    有 cursor 時以 keyset 從上一頁最後一筆之後讀取並忽略 skip；skip 僅為相容舊版 offset 分頁保留
+    """
+    query = db.query(*PRODUCT_LIST_COLUMNS)
+
+    # 篩選分類
+    if category:
+        cat = db.query(Category.name).filter(Category.name == category).first()
+        if (cat):
+            query = query.filter(Product.category_name == cat.name)
+        else:
+            return [], None
+
+    # 排序
+    columns, descending = PRODUCT_SORTS.get(sort_by, DEFAULT_PRODUCT_SORT)
+    mode = f"products:{sort_by if sort_by in PRODUCT_SORTS else 'id'}:{category or ''}"
+    query = query.order_by(*keyset_order(columns, descending))
+
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, mode, len(columns)), descending))
+    elif skip:
+        query = query.offset(skip)
+
+    products, has_more = split_page(query.limit(limit + 1).all(), limit)
+    next_cursor = None
+    if has_more:
+        last = products[-1]
+        next_cursor = encode_cursor(mode, [getattr(last, column.key) for column in columns])
+    return row_dicts(PRODUCT_FIELDS, products), next_cursor
+
+def load_product_list_json(db: Session, *args) -> Tuple[bytes, Optional[str], List[int]]:
+    """
+    與 load_product_list 相同，但商品已序列化為 JSON bytes，另外回傳頁內商品 id（作為快取 tags）；
+    商品目錄快取存這個版本，命中時不必再序列化
+    """
+    products, next_cursor = load_product_list(db, *args)
+    return dumps(products), next_cursor, [p["id"] for p in products]
+
+def load_all_products_json(db: Session) -> bytes:
+    """管理端完整商品列表（ProductOut 欄位）；逐列從 cursor 轉成 dict，不保留整批 Row / 實體"""
+    return dumps(row_dicts(PRODUCT_FIELDS, db.execute(select(*PRODUCT_LIST_COLUMNS))))
+
+def load_product_detail(db: Session, product_id: int) -> ProductDetailOut:
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # 分片庫存模式下，實際庫存為各分片總和
+    shard_info = load_shard_info(db, [product.id])
+    stock = shard_info[product.id][1] if product.id in shard_info else product.stock
+
+    # 返回產品詳細資訊，包括 description
+    return ProductDetailOut(
+        id=product.id,
+        name=product.name,
+        description=product.description,
+        price=product.price,
+        image_url=product.image_url,
+        sold=product.sold,
+        stock=stock,
+        category_name=product.category_name
+    )
@@ -0,0 +1,178 @@
+"""
+每日 / 每小時銷售彙總（sales_daily / sales_hourly）
+
+GET /api/analytics/sales-trends 原本每次都以 func.date(order_date) 對整個區間的訂單 GROUP BY，
+無法利用索引，且隨歷史資料線性成長。改為：
+- 訂單在「計入 / 不計入」之間切換（建立、付款、取消、狀態變更）時，由 outbox worker 把一批訂單的差額
+  依區間合併，每個區間一句 upsert 套用到彙總列
+- 已結束的區間直接讀彙總表（每天 / 每小時一列），只有今天（或這個小時）尚未結束的區間即時從 orders 計算
+- rebuild() 以完整重算覆寫指定區間，供首次部署回填與對帳使用（scripts/backfill_sales_rollup.py）
+區間以 order_date（UTC）切分。
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.order import Order
+from models.sales_rollup import SalesDaily, SalesHourly
+from services.analytics_service import PAID_STATUSES, with_tiflash
+
+GRANULARITIES = {
+    # granularity: (彙總表, 區間欄位名稱)
+    "day": (SalesDaily, "bucket_date"),
+    "hour": (SalesHourly, "bucket_start"),
+}
+
+SalesTrend = namedtuple("SalesTrend", "sale_date orders_count revenue avg_order_value")
+
+
+def is_counted(status: Optional[str]) -> bool:
+    return status in PAID_STATUSES
+
+
+def bucket_of(moment: datetime, granularity: str):
+    """時間點所屬的區間：day 為日期，hour 為該小時的起點"""
+    if granularity == "day":
+        return moment.date()
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert(db: Session, granularity: str, bucket, orders_delta: int, revenue_delta: float) -> None:
+    """把差額加到單一彙總列；該列不存在時建立（MySQL / TiDB 與 SQLite 都是一句原子的 upsert）"""
+    model, key = GRANULARITIES[granularity]
+    now = datetime.utcnow()
+    increments = {
+        "orders_count": model.orders_count + orders_delta,
+        "revenue": model.revenue + revenue_delta,
+        "updated_at": now,
+    }
+    values = {key: bucket, "orders_count": orders_delta, "revenue": revenue_delta, "updated_at": now}
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        db.execute(mysql_insert(model).values(**values).on_duplicate_key_update(**increments))
+    elif dialect == "sqlite":
+        db.execute(
+            sqlite_insert(model).values(**values)
+            .on_conflict_do_update(index_elements=[key], set_=increments)
+        )
+    else:
+        result = db.execute(
+            update(model).where(getattr(model, key) == bucket).values(**increments)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.add(model(**values))
+
+
+def add_order_buckets(buckets: Dict[tuple, list], order_date: Optional[datetime], total_amount: Optional[float],
+                      sign: int = 1) -> None:
+    """把一張訂單以 sign（+1 / -1）累加到 buckets = {(granularity, 區間): [orders, revenue]}"""
+    if order_date is None:
+        return
+    for granularity in GRANULARITIES:
+        delta = buckets.setdefault((granularity, bucket_of(order_date, granularity)), [0, 0.0])
+        delta[0] += sign
+        delta[1] += sign * float(total_amount or 0)
+
+
+def apply_buckets(db: Session, buckets: Dict[tuple, list]) -> None:
+    """每個有差額的區間一句 upsert；同一批內多張同日訂單只會寫一次該日的彙總列"""
+    for (granularity, bucket), (orders, revenue) in sorted(buckets.items()):
+        if orders or revenue:
+            _upsert(db, granularity, bucket, orders, revenue)
+
+
+def order_sign(old_status: Optional[str], new_status: Optional[str]) -> int:
+    """狀態變更對彙總的影響：+1 開始計入、-1 不再計入、0 不影響"""
+    return int(is_counted(new_status)) - int(is_counted(old_status))
+
+
+def _bucket_expression(db: Session, granularity: str):
+    if granularity == "day":
+        return func.date(Order.order_date)
+    if db.get_bind().dialect.name == "mysql":
+        return func.date_format(Order.order_date, "%Y-%m-%d %H:00:00")
+    return func.strftime("%Y-%m-%d %H:00:00", Order.order_date)
+
+
+def _parse_bucket(value, granularity: str):
+    # SQLite 的 date() / strftime() 回傳字串，TiDB / MySQL 的 DATE() 回傳 date
+    if granularity == "day":
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def live_buckets(db: Session, start: datetime, end: Optional[datetime] = None, granularity: str = "day",
+                 tiflash: bool = False) -> List[tuple]:
+    """從 orders 即時彙總 [start, end) 區間，回傳 (區間, 訂單數, 營收)；大範圍重算時以 tiflash=True 導向列存"""
+    bucket = _bucket_expression(db, granularity).label("bucket")
+    query = (
+        db.query(bucket, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0))
+        .filter(Order.status.in_(PAID_STATUSES))
+        .filter(Order.order_date >= start)
+    )
+    if end is not None:
+        query = query.filter(Order.order_date < end)
+    # 以別名分組：MySQL 的 ONLY_FULL_GROUP_BY 不會把兩個參數化的 DATE_FORMAT 視為同一個運算式
+    query = query.group_by("bucket").order_by("bucket")
+    if tiflash:
+        query = with_tiflash(query, "orders")
+    return [(_parse_bucket(b, granularity), int(count), float(revenue)) for b, count, revenue in query.all()]
+
+
+def _range_start(start) -> datetime:
+    return start if isinstance(start, datetime) else datetime.combine(start, time.min)
+
+
+def sales_trends(db: Session, days: int = 7, granularity: str = "day") -> List[SalesTrend]:
+    """
+    最近 days 天的銷售趨勢：已結束的區間讀彙總表，目前區間（今天 / 這個小時）即時計算
+    只回傳有訂單的區間，依時間排序
+    """
+    model, key = GRANULARITIES[granularity]
+    column = getattr(model, key)
+    now = datetime.utcnow()
+    start = bucket_of(now - timedelta(days=days), granularity)
+    current = bucket_of(now, granularity)
+
+    stored = (
+        db.query(column, model.orders_count, model.revenue)
+        .filter(column >= start, column < current, model.orders_count > 0)
+        .order_by(column)
+        .all()
+    )
+    rows = [(bucket, count, revenue) for bucket, count, revenue in stored]
+    rows += live_buckets(db, _range_start(current), granularity=granularity)
+    return [
+        SalesTrend(bucket, count, revenue, revenue / count if count else 0.0)
+        for bucket, count, revenue in rows
+    ]
+
+
+def rebuild(db: Session, since: date, until: Optional[date] = None) -> dict:
+    """
+    以 orders 完整重算 [since, until) 的每日與每小時彙總並覆寫（until 預設為明天，即包含今天）
+    與增量 hook 同時執行時，重算期間被付款 / 取消的訂單可能少算或多算，建議離峰執行或只回填過去的日期
+    """
+    until = until or datetime.utcnow().date() + timedelta(days=1)
+    start, end = datetime.combine(since, time.min), datetime.combine(until, time.min)
+    now = datetime.utcnow()
+    result = {}
+    for granularity, (model, key) in GRANULARITIES.items():
+        column = getattr(model, key)
+        rows = live_buckets(db, start, end, granularity, tiflash=True)
+        bounds = (since, until) if granularity == "day" else (start, end)
+        db.query(model).filter(column >= bounds[0], column < bounds[1]).delete(synchronize_session=False)
+        db.add_all(
+            model(**{key: bucket}, orders_count=count, revenue=revenue, updated_at=now)
+            for bucket, count, revenue in rows
+        )
+        result[granularity] = len(rows)
+    db.commit()
+    return {"since": since, "until": until, "buckets": result}
@@ -0,0 +1,194 @@
+"""
+products.sold 重新同步（集合式）
+
+每個區塊只送一句 UPDATE products JOIN (依商品彙總訂單明細的子查詢) SET sold = ...，
+再以一句 UPDATE 把沒有任何訂單明細的商品歸零；只改寫與實際銷量不同的列，不再逐一查詢商品；大型目錄依 id 範圍切塊，每塊一個短交易。
+
+增量模式只處理上一次成功執行之後 product_sales.updated_at 有變動的商品
+（outbox worker 套用訂單建立 / 取消 / 狀態變更事件時會更新 updated_at），適合每分鐘由 cron 執行。
+每次執行都寫入 sync_runs，記錄耗時與變更列數。
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from models.order import Order
+from models.order_item import OrderItem
+from models.product import Product
+from models.product_sales import ProductSales
+from models.sync_run import SyncRun
+from services import catalog_cache
+from services.leaderboard_service import COUNTED_STATUSES
+from services.stock_service import run_with_retry
+
+JOB_NAME = "sold_sync"
+# 全量模式每塊的商品 id 範圍；增量模式每塊的商品數
+SOLD_SYNC_CHUNK_SIZE = int(os.getenv("SOLD_SYNC_CHUNK_SIZE", "5000"))
+# 增量模式往前多涵蓋的秒數：上一輪開始前已寫入、但在其之後才 commit 的訂單也會被處理到
+SOLD_SYNC_OVERLAP_SECONDS = int(os.getenv("SOLD_SYNC_OVERLAP_SECONDS", "60"))
+
+
+def _sync_statements(low: Optional[int] = None, high: Optional[int] = None, ids: Optional[List[int]] = None):
+    """
+    回傳該區塊要執行的兩句 UPDATE：
+    1. UPDATE products JOIN (各商品實際銷量) SET sold = actual_sales WHERE sold <> actual_sales
+    2. 完全沒有訂單明細的商品 sold 歸零
+    彙總子查詢只讀 order_items / orders，不引用被更新的 products，避免 MySQL 1093 限制。
+    """
+    if ids is not None:
+        item_filter, product_filter = OrderItem.product_id.in_(ids), Product.id.in_(ids)
+    else:
+        item_filter = and_(OrderItem.product_id >= low, OrderItem.product_id < high)
+        product_filter = and_(Product.id >= low, Product.id < high)
+
+    actual = (
+        select(
+            OrderItem.product_id.label("product_id"),
+            func.coalesce(func.sum(
+                case((Order.status.in_(COUNTED_STATUSES), OrderItem.quantity), else_=0)
+            ), 0).label("actual_sales"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(item_filter)
+        .group_by(OrderItem.product_id)
+        .subquery("actual")
+    )
+    sync = (
+        update(Product)
+        .where(
+            Product.id == actual.c.product_id,
+            # 只改寫有差異的列：rowcount 即為變更列數，也避免無謂的寫入衝突
+            or_(Product.sold.is_(None), Product.sold != actual.c.actual_sales),
+        )
+        .values(sold=actual.c.actual_sales)
+        .execution_options(synchronize_session=False)
+    )
+    has_items = select(OrderItem.id).join(Order, Order.id == OrderItem.order_id).where(
+        OrderItem.product_id == Product.id
+    )
+    reset = (
+        update(Product)
+        .where(product_filter, or_(Product.sold.is_(None), Product.sold != 0), ~has_items.exists())
+        .values(sold=0)
+        .execution_options(synchronize_session=False)
+    )
+    return sync, reset
+
+
+def _sync_chunk(db: Session, statements) -> int:
+    return sum(db.execute(statement).rowcount for statement in statements)
+
+
+def _id_ranges(db: Session, chunk_size: int):
+    low, high = db.query(func.min(Product.id), func.max(Product.id)).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, start + chunk_size
+
+
+def _chunks(ids: List[int], chunk_size: int) -> Iterable[List[int]]:
+    for i in range(0, len(ids), chunk_size):
+        yield ids[i:i + chunk_size]
+
+
+def _last_success(db: Session) -> Optional[SyncRun]:
+    return (
+        db.query(SyncRun)
+        .filter(SyncRun.job == JOB_NAME, SyncRun.status == "success")
+        .order_by(SyncRun.started_at.desc())
+        .first()
+    )
+
+
+def sync_sold(db: Session, incremental: bool = False, chunk_size: Optional[int] = None) -> SyncRun:
+    """
+    執行一次同步並回傳 sync_runs 紀錄。
+    incremental=True 但沒有成功的前次紀錄時，自動改為全量。
+    """
+    chunk_size = chunk_size or SOLD_SYNC_CHUNK_SIZE
+    started = time.perf_counter()
+    previous = _last_success(db) if incremental else None
+    run = SyncRun(
+        job=JOB_NAME,
+        mode="incremental" if previous else "full",
+        status="running",
+        started_at=datetime.utcnow(),
+        since=previous.started_at - timedelta(seconds=SOLD_SYNC_OVERLAP_SECONDS) if previous else None,
+        rows_changed=0,
+        chunks=0,
+    )
+    db.add(run)
+    db.commit()
+
+    # commit 後 ORM 物件會過期，統計先放在區域變數，結束時一次寫回
+    since = run.since
+    stats = {"products_checked": 0, "rows_changed": 0, "chunks": 0}
+    changed_ids: Optional[List[int]] = [] if previous else None
+    status, error = "failed", None
+    try:
+        if previous:
+            touched = sorted(db.scalars(
+                select(ProductSales.product_id).where(ProductSales.updated_at >= since)
+            ))
+            stats["products_checked"] = len(touched)
+            chunks = [(_sync_statements(ids=ids), ids) for ids in _chunks(touched, chunk_size)]
+        else:
+            stats["products_checked"] = db.query(func.count(Product.id)).scalar()
+            chunks = [(_sync_statements(low, high), None) for low, high in _id_ranges(db, chunk_size)]
+        db.rollback()  # 結束讀取用的交易，之後每塊各自一個短交易
+
+        for statements, ids in chunks:
+            changed = run_with_retry(db, lambda: _sync_chunk(db, statements))
+            stats["rows_changed"] += changed
+            stats["chunks"] += 1
+            if changed_ids is not None and changed:
+                changed_ids.extend(ids)
+        status = "success"
+    except Exception as e:
+        db.rollback()
+        error = str(e)[:1000]
+        raise
+    finally:
+        run.status = status
+        run.error = error
+        for key, value in stats.items():
+            setattr(run, key, value)
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = int((time.perf_counter() - started) * 1000)
+        db.commit()
+
+    if stats["rows_changed"]:
+        # 全量模式不知道是哪些商品變更，直接清空商品快取
+        catalog_cache.invalidate_products(changed_ids)
+    return run
+
+
+def recent_runs(db: Session, limit: int = 20) -> List[SyncRun]:
+    return (
+        db.query(SyncRun)
+        .filter(SyncRun.job == JOB_NAME)
+        .order_by(SyncRun.started_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def run_to_dict(run: SyncRun) -> dict:
+    return {
+        "id": run.id,
+        "mode": run.mode,
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "since": run.since,
+        "duration_ms": run.duration_ms,
+        "products_checked": run.products_checked,
+        "rows_changed": run.rows_changed,
+        "chunks": run.chunks,
+        "error": run.error,
+    }
@@ -0,0 +1,401 @@
+"""
+庫存預留引擎
+
+以條件式原子扣減（UPDATE products SET stock = stock - :q WHERE id = :id AND stock >= :q）
+取代「先讀 stock、在 Python 扣減、再寫回」的作法，避免併發結帳時超賣；
+TiDB 樂觀交易在熱點商品上的寫入衝突則以指數退避重試整個交易，並統計每個商品的衝突率。
+
+熱銷商品可以開啟分片庫存模式：庫存拆到 product_stock_shards 的 N 列子計數器，
+結帳隨機扣減其中一個分片（不足時改扣其他分片），products.stock 則固定為 0，
+讀取時以各分片總和作為實際庫存。
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from models.stock_shard import ProductStockShard
+
+T = TypeVar("T")
+
+# TiDB / MySQL 中可以透過重跑交易解決的錯誤碼
+# duplicate key（1062）不在其中：併發的第一次寫入（調價紀錄、排行榜 / 彙總列）一律以 upsert 處理，
+# 其餘的重複鍵代表資料或程式錯誤，重試也不會成功
+RETRYABLE_ERROR_CODES = {
+    1205,  # Lock wait timeout exceeded
+    1213,  # Deadlock found when trying to get lock
+    8002,  # TiDB: SELECT ... FOR UPDATE 寫入衝突
+    8022,  # TiDB: 交易提交失敗，可重試
+    8028,  # TiDB: 交易期間 schema 變更
+    9007,  # TiDB: Write conflict
+}
+
+# SQLite 本地替身（測試 / 壓測）對應的錯誤訊息
+RETRYABLE_SQLITE_MESSAGES = ("database is locked",)
+
+# ConflictStats 最多追蹤的商品數
+STATS_MAX_PRODUCTS = int(os.getenv("STOCK_STATS_MAX_PRODUCTS", "1000"))
+
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.005
+MAX_BACKOFF_SECONDS = 0.2
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Not enough stock for product {product_id}")
+        self.product_id = product_id
+
+
+class ConflictStats:
+    """
+    每個商品的預留次數 / 衝突次數 / 重試耗盡次數（執行緒安全）
+    最多保留 max_products 個商品（LRU），長時間運行、商品數很多時記憶體不會無限增長；
+    熱點商品持續被結帳，會一直留在統計中
+    """
+
+    def __init__(self, max_products: int = STATS_MAX_PRODUCTS):
+        self.max_products = max_products
+        self._lock = threading.Lock()
+        self._counters: "OrderedDict[int, Dict[str, int]]" = OrderedDict()
+        self.evicted = 0
+
+    def _bump(self, product_ids: Iterable[int], field: str):
+        with self._lock:
+            for pid in product_ids:
+                counters = self._counters.get(pid)
+                if counters is None:
+                    counters = self._counters[pid] = {"attempts": 0, "conflicts": 0, "exhausted": 0, "insufficient": 0}
+                    if len(self._counters) > self.max_products:
+                        self._counters.popitem(last=False)
+                        self.evicted += 1
+                else:
+                    self._counters.move_to_end(pid)
+                counters[field] += 1
+
+    def record_attempt(self, product_ids: Iterable[int]):
+        self._bump(product_ids, "attempts")
+
+    def record_conflict(self, product_ids: Iterable[int]):
+        self._bump(product_ids, "conflicts")
+
+    def record_exhausted(self, product_ids: Iterable[int]):
+        self._bump(product_ids, "exhausted")
+
+    def record_insufficient(self, product_ids: Iterable[int]):
+        self._bump(product_ids, "insufficient")
+
+    def snapshot(self):
+        with self._lock:
+            items = [(pid, dict(c)) for pid, c in self._counters.items()]
+        return [
+            {
+                "product_id": pid,
+                **c,
+                "conflict_rate": round(c["conflicts"] / c["attempts"], 4) if c["attempts"] else 0.0,
+            }
+            for pid, c in sorted(items, key=lambda kv: kv[1]["conflicts"], reverse=True)
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self.evicted = 0
+
+
+stats = ConflictStats()
+
+
+def is_write_conflict(exc: BaseException) -> bool:
+    """判斷資料庫錯誤是否為可重試的寫入衝突"""
+    orig = getattr(exc, "orig", None)
+    args = getattr(orig, "args", ())
+    if args and isinstance(args[0], int):
+        return args[0] in RETRYABLE_ERROR_CODES
+    message = str(orig if orig is not None else exc)
+    return any(m in message for m in RETRYABLE_SQLITE_MESSAGES)
+
+
+def backoff_seconds(attempt: int) -> float:
+    """指數退避加上 full jitter，避免重試的交易再次同時撞上同一列"""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def run_with_retry(
+    db: Session,
+    work: Callable[[], T],
+    product_ids: Iterable[int] = (),
+    max_retries: int = MAX_RETRIES,
+) -> T:
+    """
+    執行 work() 並 commit；遇到寫入衝突時 rollback、退避後重跑整個交易。
+    work 必須可重複執行（每次都重新讀取 / 寫入所需資料）。
+    """
+    product_ids = list(product_ids)
+    for attempt in range(max_retries + 1):
+        stats.record_attempt(product_ids)
+        try:
+            result = work()
+            db.commit()
+            return result
+        except DBAPIError as exc:
+            db.rollback()
+            if not is_write_conflict(exc):
+                raise
+            stats.record_conflict(product_ids)
+            if attempt == max_retries:
+                stats.record_exhausted(product_ids)
+                raise
+            time.sleep(backoff_seconds(attempt))
+        except InsufficientStock as exc:
+            db.rollback()
+            stats.record_insufficient([exc.product_id])
+            raise
+        except Exception:
+            db.rollback()
+            raise
+
+
+async def run_with_retry_async(
+    db,
+    work: Callable[[Session], T],
+    product_ids: Iterable[int] = (),
+    max_retries: int = MAX_RETRIES,
+) -> T:
+    """
+    run_with_retry 的 AsyncSession 版本：work 以同步 Session 在 db.run_sync() 內執行，
+    退避改用 asyncio.sleep，不會卡住 event loop
+    """
+    product_ids = list(product_ids)
+    for attempt in range(max_retries + 1):
+        stats.record_attempt(product_ids)
+        try:
+            result = await db.run_sync(work)
+            await db.commit()
+            return result
+        except DBAPIError as exc:
+            await db.rollback()
+            if not is_write_conflict(exc):
+                raise
+            stats.record_conflict(product_ids)
+            if attempt == max_retries:
+                stats.record_exhausted(product_ids)
+                raise
+            await asyncio.sleep(backoff_seconds(attempt))
+        except InsufficientStock as exc:
+            await db.rollback()
+            stats.record_insufficient([exc.product_id])
+            raise
+        except Exception:
+            await db.rollback()
+            raise
+
+
+def load_shard_info(db: Session, product_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+    """一次查詢取得分片商品的 (分片數, 分片庫存總和)；未分片的商品不會出現在結果中"""
+    rows = db.execute(
+        select(ProductStockShard.product_id, func.count(), func.sum(ProductStockShard.stock))
+        .where(ProductStockShard.product_id.in_(list(product_ids)))
+        .group_by(ProductStockShard.product_id)
+    ).all()
+    return {pid: (int(count), int(total or 0)) for pid, count, total in rows}
+
+
+def effective_stock():
+    """
+    回傳 (分片總和子查詢, 實際庫存欄位)，供查詢以
+    outerjoin(subquery, subquery.c.product_id == Product.id) 一次取得含分片的庫存
+    """
+    shard_totals = (
+        select(ProductStockShard.product_id, func.sum(ProductStockShard.stock).label("total"))
+        .group_by(ProductStockShard.product_id)
+        .subquery()
+    )
+    return shard_totals, func.coalesce(shard_totals.c.total, Product.stock)
+
+
+def reserve_stock(
+    db: Session,
+    quantities: Dict[int, int],
+    extra_values: Optional[dict] = None,
+    shard_info: Optional[Dict[int, Tuple[int, int]]] = None,
+) -> None:
+    """
+    以單一 UPDATE 原子扣減多個商品的庫存：
+    UPDATE products SET stock = stock - CASE id ... END WHERE id IN (...) AND stock >= CASE id ... END
+    只要有任一商品庫存不足（更新列數不符）就拋出 InsufficientStock，呼叫端需 rollback。
+    extra_values 可附帶同一句 UPDATE 要一併更新的欄位（例如 sold、price），只套用在未分片的商品。
+    分片商品改由 _reserve_from_shards 扣減；shard_info 可傳入已查過的 load_shard_info 結果。
+    """
+    if not quantities:
+        return
+    if shard_info is None:
+        shard_info = load_shard_info(db, quantities)
+
+    plain = {pid: qty for pid, qty in quantities.items() if pid not in shard_info}
+    if plain:
+        qty_by_id = case(plain, value=Product.id)
+        result = db.execute(
+            update(Product)
+            .where(Product.id.in_(plain), Product.stock >= qty_by_id)
+            .values(stock=Product.stock - qty_by_id, **(extra_values or {}))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(plain):
+            raise InsufficientStock(_find_short_product(db, plain))
+
+    for pid, qty in quantities.items():
+        if pid in shard_info:
+            _reserve_from_shards(db, pid, qty, shard_info[pid][0])
+
+
+def release_stock(db: Session, quantities: Dict[int, int]) -> None:
+    """歸還庫存（取消訂單）：未分片商品一句 UPDATE，分片商品加回隨機一個分片"""
+    if not quantities:
+        return
+    shard_info = load_shard_info(db, quantities)
+    plain = {pid: qty for pid, qty in quantities.items() if pid not in shard_info}
+    if plain:
+        db.execute(
+            update(Product)
+            .where(Product.id.in_(plain))
+            .values(stock=Product.stock + case(plain, value=Product.id))
+            .execution_options(synchronize_session=False)
+        )
+    for pid, (shard_count, _) in shard_info.items():
+        db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == pid, ProductStockShard.shard_no == random.randrange(shard_count))
+            .values(stock=ProductStockShard.stock + quantities[pid])
+            .execution_options(synchronize_session=False)
+        )
+
+
+def set_product_stock(db: Session, product: Product, new_stock: int) -> int:
+    """管理端直接設定庫存；分片商品會把新庫存平均重新分配到各分片。回傳原本的庫存"""
+    info = load_shard_info(db, [product.id]).get(product.id)
+    if info is None:
+        old_stock = product.stock
+        product.stock = new_stock
+        return old_stock
+    shard_count, old_stock = info
+    _write_shards(db, product.id, _split(new_stock, shard_count))
+    return old_stock
+
+
+def set_stock_levels(db: Session, levels: Dict[int, int]) -> Dict[int, Tuple[str, int]]:
+    """
+    批次設定多個商品的庫存（管理端匯入）：一次查出所有目標商品，
+    未分片商品以單一 CASE UPDATE 寫入，分片商品重新分配到各分片。
+    回傳找得到的商品 {product_id: (name, 原本庫存)}；找不到的 id 不在結果內
+    """
+    if not levels:
+        return {}
+    rows = db.execute(select(Product.id, Product.name, Product.stock).where(Product.id.in_(levels))).all()
+    shard_info = load_shard_info(db, [row.id for row in rows])
+    found = {
+        row.id: (row.name, shard_info[row.id][1] if row.id in shard_info else row.stock)
+        for row in rows
+    }
+
+    plain = {pid: levels[pid] for pid in found if pid not in shard_info and found[pid][1] != levels[pid]}
+    if plain:
+        db.execute(
+            update(Product)
+            .where(Product.id.in_(plain))
+            .values(stock=case(plain, value=Product.id))
+            .execution_options(synchronize_session=False)
+        )
+    for pid, (shard_count, total) in shard_info.items():
+        if total != levels[pid]:
+            _write_shards(db, pid, _split(levels[pid], shard_count))
+    return found
+
+
+def configure_sharding(db: Session, product: Product, shard_count: int) -> int:
+    """
+    開啟 / 調整 / 關閉商品的分片庫存模式，回傳目前的總庫存。
+    shard_count <= 1 代表關閉分片，庫存收回 products.stock。
+    """
+    info = load_shard_info(db, [product.id]).get(product.id)
+    total = info[1] if info else (product.stock or 0)
+    if shard_count <= 1:
+        db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product.id))
+        product.stock = total
+    else:
+        _write_shards(db, product.id, _split(total, shard_count))
+        product.stock = 0
+    return total
+
+
+def _split(total: int, shard_count: int) -> List[int]:
+    base, remainder = divmod(total, shard_count)
+    return [base + (1 if i < remainder else 0) for i in range(shard_count)]
+
+
+def _write_shards(db: Session, product_id: int, levels: List[int]) -> None:
+    db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product_id))
+    db.execute(
+        insert(ProductStockShard),
+        [{"product_id": product_id, "shard_no": i, "stock": stock} for i, stock in enumerate(levels)]
+    )
+
+
+def _take_from_shard(db: Session, product_id: int, shard_no: int, qty: int) -> bool:
+    result = db.execute(
+        update(ProductStockShard)
+        .where(
+            ProductStockShard.product_id == product_id,
+            ProductStockShard.shard_no == shard_no,
+            ProductStockShard.stock >= qty,
+        )
+        .values(stock=ProductStockShard.stock - qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _reserve_from_shards(db: Session, product_id: int, qty: int, shard_count: int) -> None:
+    # 1. 隨機挑一個分片直接扣減，一般情況只需要這一句 UPDATE
+    first = random.randrange(shard_count)
+    if _take_from_shard(db, product_id, first, qty):
+        return
+
+    # 2. 該分片不足：讀出所有分片，依庫存由多到少改扣其他分片
+    levels = dict(db.execute(
+        select(ProductStockShard.shard_no, ProductStockShard.stock)
+        .where(ProductStockShard.product_id == product_id)
+    ).all())
+    if sum(levels.values()) < qty:
+        raise InsufficientStock(product_id)
+    by_stock = sorted(levels.items(), key=lambda kv: kv[1], reverse=True)
+    for shard_no, stock in by_stock:
+        if shard_no != first and stock >= qty and _take_from_shard(db, product_id, shard_no, qty):
+            return
+
+    # 3. 沒有單一分片足夠：跨多個分片湊齊數量（整個交易失敗時會一起 rollback）
+    remaining = qty
+    for shard_no, stock in by_stock:
+        take = min(stock, remaining)
+        if take > 0 and _take_from_shard(db, product_id, shard_no, take):
+            remaining -= take
+        if remaining == 0:
+            return
+    raise InsufficientStock(product_id)
+
+
+def _find_short_product(db: Session, quantities: Dict[int, int]) -> int:
+    """扣減失敗時找出是哪個商品庫存不足（只在失敗路徑多一次查詢）"""
+    current = dict(db.execute(select(Product.id, Product.stock).where(Product.id.in_(quantities))).all())
+    for pid, qty in quantities.items():
+        if current.get(pid) is None or current[pid] < qty:
+            return pid
+    return next(iter(quantities))
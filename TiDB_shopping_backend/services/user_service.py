@@ -0,0 +1,46 @@
+"""
+使用者資料查詢（含快取）
+
+/api/auth/me 每次換頁都會被呼叫，使用者名稱 / email 幾乎不變，
+因此先讀行程內快取；PUT /me/profile 修改後呼叫 invalidate_profile()。
+USER_PROFILE_CACHE_TTL=0 可停用快取。
+"""
+import os
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models import User
+
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "60"))
+
+# key = user_id，value = {"id", "name", "email"}
+user_profiles = TTLCache(
+    maxsize=int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000")),
+    ttl=USER_PROFILE_CACHE_TTL,
+    name="user_profiles",
+)
+
+
+def load_profile(db: Session, user_id: str) -> Optional[dict]:
+    row = db.query(User.id, User.name, User.email).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return {"id": row.id, "name": row.name, "email": row.email}
+
+
+def get_profile(db: Session, user_id: str) -> Optional[dict]:
+    """回傳使用者基本資料；找不到時回傳 None（不快取，避免註冊後短時間內查無資料）"""
+    if USER_PROFILE_CACHE_TTL <= 0:
+        return load_profile(db, user_id)
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        profile = load_profile(db, user_id)
+        if profile is not None:
+            user_profiles.set(user_id, profile)
+    return profile
+
+
+def invalidate_profile(user_id: str) -> None:
+    user_profiles.invalidate(user_id)
@@ -0,0 +1,35 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from dependencies.auth import ALGORITHM, SECRET_KEY, token_cache, verify_authorization
+
+
+def make_token(sub="user-1", expires_in=3600):
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + expires_in}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def test_verified_token_is_cached_until_exp():
+    token_cache.clear()
+    token = make_token(expires_in=1)
+
+    assert verify_authorization(f"Bearer {token}") == "user-1"
+    assert token_cache.get(token) == "user-1"
+
+    # 快取期限不可超過 token 本身的 exp
+    time.sleep(2.1)
+    assert token_cache.get(token) is None
+    with pytest.raises(HTTPException) as exc:
+        verify_authorization(f"Bearer {token}")
+    assert exc.value.status_code == 401
+
+
+def test_invalid_token_is_not_cached():
+    token_cache.clear()
+    forged = jwt.encode({"sub": "user-1", "exp": int(time.time()) + 3600}, "wrong-secret", algorithm=ALGORITHM)
+
+    with pytest.raises(HTTPException):
+        verify_authorization(f"Bearer {forged}")
+    assert token_cache.get(forged) is None
@@ -0,0 +1,113 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+from api import product
+from models import Category, Product, ProductStockShard
+from schemas.product import StockUpdateItem
+from services import inventory_service
+
+
+def seed(session_factory, count=10):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        for pid in range(1, count + 1):
+            db.add(Product(id=pid, name=f"p{pid}", price=1.0, stock=5, sold=0, category_name="c"))
+        db.commit()
+
+
+def test_bulk_import_is_set_based_and_reports_each_row(sqlite_engine, session_factory):
+    seed(session_factory, 10)
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda c, cur, st, p, ctx, em: statements.append(st))
+
+    items = [StockUpdateItem(product_id=pid, stock=pid * 10) for pid in range(1, 11)]
+    items += [StockUpdateItem(product_id=3, stock=30), StockUpdateItem(product_id=999, stock=1)]
+    with session_factory() as db:
+        result = inventory_service.import_items(inventory_service.StockImport(db, chunk_size=6), items)
+
+    # 每批：載入商品、載入分片、一句 CASE UPDATE（12 列分成 2 批）
+    assert sum(st.lstrip().upper().startswith("UPDATE PRODUCTS") for st in statements) == 2
+    assert result.summary() == {
+        "rows": 12, "chunks": 2, "updated": 10, "unchanged": 1, "not_found": 1, "superseded": 0, "invalid": 0
+    }
+    assert result.results[0].model_dump(exclude_none=True) == {
+        "product_id": 1, "status": "updated", "product_name": "p1", "old_stock": 5, "new_stock": 10
+    }
+    with session_factory() as db:
+        assert db.get(Product, 3).stock == 30
+        assert db.get(Product, 10).stock == 100
+
+
+def test_csv_upload_streams_in_chunks(session_factory, monkeypatch):
+    seed(session_factory, 50)
+    with session_factory() as db:
+        db.add_all(ProductStockShard(product_id=50, shard_no=i, stock=1) for i in range(4))
+        db.commit()
+    monkeypatch.setattr(inventory_service, "BULK_STOCK_CHUNK_SIZE", 7)
+
+    app = FastAPI()
+    app.include_router(product.router)
+
+    def admin_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[database.get_admin_db] = admin_db
+    lines = ["﻿Product_ID,stock"] + [f"{pid},{pid + 100}" for pid in range(1, 51)] + ["abc,1", "7,-1", "404,3", ""]
+    body = "\r\n".join(lines).encode()
+
+    def chunks():
+        for i in range(0, len(body), 64):
+            yield body[i:i + 64]
+
+    resp = TestClient(app).post("/api/admin/products/bulk-update-stock/csv", content=chunks())
+    data = resp.json()
+    assert resp.status_code == 200, data
+    assert data["summary"]["updated"] == 50 and data["summary"]["chunks"] == 8
+    assert data["summary"]["invalid"] == 2 and data["summary"]["not_found"] == 1
+    assert [(e["line"], e["status"]) for e in data["errors"]] == [(52, "invalid"), (53, "invalid"), (54, "not_found")]
+
+    with session_factory() as db:
+        assert db.get(Product, 1).stock == 101
+        # 分片商品的新庫存平均分配到各分片
+        assert sum(s.stock for s in db.query(ProductStockShard).filter_by(product_id=50)) == 150
+
+    resp = TestClient(app).post("/api/admin/products/bulk-update-stock/csv", content=b"sku,qty\n1,2\n")
+    assert resp.status_code == 400
+
+
+def test_failed_chunk_reports_committed_rows(session_factory, monkeypatch):
+    seed(session_factory, 10)
+    monkeypatch.setattr(inventory_service, "BULK_STOCK_CHUNK_SIZE", 4)
+    set_stock_levels = inventory_service.set_stock_levels
+    calls = []
+
+    def fail_second_chunk(db, levels):
+        calls.append(levels)
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        return set_stock_levels(db, levels)
+
+    monkeypatch.setattr(inventory_service, "set_stock_levels", fail_second_chunk)
+    app = FastAPI()
+    app.include_router(product.router)
+
+    def admin_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[database.get_admin_db] = admin_db
+    resp = TestClient(app).post(
+        "/api/admin/products/bulk-update-stock",
+        json=[{"product_id": pid, "stock": 50} for pid in range(1, 11)]
+    )
+    assert resp.status_code == 500
+    detail = resp.json()["detail"]
+    assert "boom" in detail["message"]
+    # 第一批已 commit，呼叫端可據此只重送其餘的列
+    assert detail["summary"]["chunks"] == 1 and detail["summary"]["updated"] == 4
+    assert [r["product_id"] for r in detail["results"]] == [1, 2, 3, 4]
+    with session_factory() as db:
+        assert (db.get(Product, 4).stock, db.get(Product, 5).stock) == (50, 5)
@@ -0,0 +1,43 @@
+from cache import TTLCache
+from services import catalog_cache
+
+
+def page(*product_ids):
+    return b"[]", None, list(product_ids)
+
+
+def test_list_pages_survive_stock_only_changes():
+    catalog_cache.invalidate_products()
+    lists = catalog_cache.product_lists
+    lists.get_or_load((None, None, 0, 2, None), lambda: page(1, 2), tags=catalog_cache.list_page_tags(None))
+    lists.get_or_load((None, None, 0, 2, "c"), lambda: page(3, 4), tags=catalog_cache.list_page_tags(None))
+    lists.get_or_load((None, "price_asc", 0, 2, None), lambda: page(5, 6), tags=catalog_cache.list_page_tags("price_asc"))
+    lists.get_or_load(("admin",), lambda: b"[]", tags=catalog_cache.admin_list_tags)
+
+    # 只扣庫存：列表頁全部保留
+    catalog_cache.invalidate_products([1, 3], lists=False)
+    assert len(lists) == 4
+
+    # sold 變動：只有包含該商品的頁與管理端列表失效
+    catalog_cache.invalidate_products([1])
+    assert lists.get((None, None, 0, 2, None)) is None
+    assert lists.get(("admin",)) is None
+    assert lists.get((None, None, 0, 2, "c")) is not None
+
+    # 調價：價格排序頁即使不含該商品也失效
+    catalog_cache.invalidate_products([3], reorder=True)
+    assert len(lists) == 0
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def loader():
+        # 讀取期間另一個請求更新了商品並讓快取失效
+        cache.invalidate(1)
+        return "stale"
+
+    assert cache.get_or_load(1, loader) == "stale"
+    assert cache.get(1) is None
+    assert cache.get_or_load(1, lambda: "fresh") == "fresh"
+    assert cache.get(1) == "fresh"
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import exports
+from models import Category, Order, OrderItem, Product, User
+from services import export_service
+
+
+def seed(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="u1", email="u1@example.com", password="x"))
+        for pid in range(1, 6):
+            db.add(Product(id=pid, name=f"商品{pid}", price=10.0 * pid, stock=pid, sold=0, category_name="c"))
+        for n in range(3):
+            db.add(Order(id=f"o{n}", order_number=f"ORD-{n}", order_date=datetime(2024, 1, 1 + n),
+                         total_amount=10.0, status="paid", user_id="u1"))
+            db.add(OrderItem(id=f"i{n}", order_id=f"o{n}", product_id=1, product_name="商品1", quantity=1, price=10.0))
+        db.commit()
+
+
+def client_for(session_factory):
+    app = FastAPI()
+    app.include_router(exports.router)
+    app.dependency_overrides[exports.get_export_session_factory] = lambda: session_factory
+    return TestClient(app)
+
+
+def test_export_ndjson_and_csv(session_factory):
+    seed(session_factory)
+    client = client_for(session_factory)
+
+    resp = client.get("/api/admin/export/products")
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in rows] == [1, 2, 3, 4, 5]
+    assert rows[0]["name"] == "商品1" and rows[0]["stock"] == 1
+
+    resp = client.get("/api/admin/export/orders", params={"format": "csv", "since": "2024-01-02T00:00:00"})
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [r["id"] for r in rows] == ["o1", "o2"]
+    assert rows[0]["order_date"] == "2024-01-02T00:00:00"
+
+    resp = client.get("/api/admin/export/order_items", params={"format": "csv"})
+    assert len(list(csv.DictReader(io.StringIO(resp.text)))) == 3
+    assert client.get("/api/admin/export/users").status_code == 422
+
+
+def test_export_streams_in_batches(session_factory):
+    seed(session_factory)
+    batches = list(export_service.stream_batches(session_factory, "products", batch_size=2))
+
+    # 第一個元素為欄位名稱，其後每批最多 batch_size 列
+    assert batches[0][:2] == ["id", "name"]
+    assert [len(b) for b in batches[1:]] == [2, 2, 1]
+
+    chunks = list(export_service.to_csv(iter(batches)))
+    assert len(chunks) == 3
+    assert chunks[0].startswith("id,name,")
+
+
+def test_empty_csv_export_has_header(session_factory):
+    chunks = list(export_service.export_stream(session_factory, "orders", "csv"))
+    assert "".join(chunks).strip() == "id,order_number,order_date,user_id,status,total_amount"
@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Order, Product, User
+from models.order_item import OrderItem
+from scripts.generate_data import STATUSES, DatasetConfig, generate
+
+CONFIG = DatasetConfig(products=50, users=20, orders=500, days=30, chunk_size=64, seed=7)
+
+
+def snapshot(session_factory):
+    with session_factory() as db:
+        orders = db.query(Order.id, Order.order_number, Order.status, Order.user_id, Order.total_amount).all()
+        items = db.query(OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity).all()
+        return sorted(orders), sorted(items)
+
+
+def test_generated_orders_are_consistent_and_deterministic(sqlite_engine, session_factory, tmp_path):
+    result = generate(sqlite_engine, CONFIG, log=lambda message: None)
+    assert result["rows"]["orders"] == 500 and result["rows"]["order_items"] >= 500
+
+    with session_factory() as db:
+        assert db.query(func.count(Product.id)).scalar() == 50
+        assert db.query(func.count(User.id)).scalar() == 20
+        # 訂單金額等於明細加總，且每張訂單都有明細
+        totals = dict(
+            db.query(OrderItem.order_id, func.sum(OrderItem.price * OrderItem.quantity))
+            .group_by(OrderItem.order_id)
+            .all()
+        )
+        for order in db.query(Order).all():
+            assert abs(totals[order.id] - order.total_amount) < 0.01
+        assert {status for (status,) in db.query(Order.status).distinct()} <= set(STATUSES)
+        # Zipf：最熱門的商品遠多於平均
+        counts = [c for (_, c) in db.query(OrderItem.product_id, func.count()).group_by(OrderItem.product_id)]
+        assert max(counts) > 3 * sum(counts) / 50
+
+    # 同一個 seed 在另一個資料庫產生相同的資料
+    other = create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    Base.metadata.create_all(bind=other)
+    generate(other, CONFIG, log=lambda message: None)
+    assert snapshot(sessionmaker(bind=other)) == snapshot(session_factory)
+    other.dispose()
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import database
+from api import orders, payments
+from dependencies.auth import get_current_user_id
+from models import Category, IdempotencyKey, Order, Product, User
+from services import idempotency_service
+
+ORDER = {"items": [{"product_id": 1, "quantity": 2}]}
+
+
+def make_client(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.add(Product(id=1, name="p1", price=10.0, stock=3, sold=0, category_name="c"))
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(orders.router)
+    app.include_router(payments.router)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[database.get_db] = get_db
+    app.dependency_overrides[get_current_user_id] = lambda: "u1"
+    idempotency_service.responses.clear()
+    return TestClient(app)
+
+
+def test_retried_order_is_replayed_without_touching_inventory(sqlite_engine, session_factory):
+    client = make_client(session_factory)
+    first = client.post("/api/orders", json=ORDER, headers={"Idempotency-Key": "k1"})
+    assert first.status_code == 201
+
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda c, cur, st, p, ctx, em: statements.append(st))
+    retry = client.post("/api/orders", json=ORDER, headers={"Idempotency-Key": "k1"})
+    assert retry.status_code == 201 and retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert statements == []  # 行程內快取命中
+
+    # 快取失效（例如另一個 worker）時由資料表回傳
+    idempotency_service.responses.clear()
+    assert client.post("/api/orders", json=ORDER, headers={"Idempotency-Key": "k1"}).json() == first.json()
+    assert not any(st.lstrip().upper().startswith("UPDATE PRODUCTS") for st in statements)
+
+    with session_factory() as db:
+        assert db.query(Order).count() == 1
+        assert db.get(Product, 1).stock == 1
+
+    # 同一個 key 搭配不同內容
+    other = {"items": [{"product_id": 1, "quantity": 1}]}
+    assert client.post("/api/orders", json=other, headers={"Idempotency-Key": "k1"}).status_code == 422
+
+
+def test_failed_request_releases_key_and_in_progress_key_conflicts(session_factory):
+    client = make_client(session_factory)
+    too_many = {"items": [{"product_id": 1, "quantity": 5}]}
+    assert client.post("/api/orders", json=too_many, headers={"Idempotency-Key": "k2"}).status_code == 400
+    with session_factory() as db:
+        assert db.query(IdempotencyKey).count() == 0
+
+    now = datetime.utcnow()
+    with session_factory() as db:
+        db.add(IdempotencyKey(
+            scope="orders:u1", key="k3", request_hash=idempotency_service.request_hash(ORDER["items"]),
+            status="in_progress", lock_token="other", locked_at=now, created_at=now,
+            expires_at=now + timedelta(hours=1),
+        ))
+        db.commit()
+    resp = client.post("/api/orders", json=ORDER, headers={"Idempotency-Key": "k3"})
+    assert resp.status_code == 409 and resp.headers["Retry-After"] == "1"
+
+    # 持有者逾時未完成時，重送的請求接手
+    with session_factory() as db:
+        db.get(IdempotencyKey, ("orders:u1", "k3")).locked_at = now - timedelta(minutes=5)
+        db.commit()
+    assert client.post("/api/orders", json=ORDER, headers={"Idempotency-Key": "k3"}).status_code == 201
+
+
+def test_payment_replay_and_ttl_cleanup(session_factory):
+    client = make_client(session_factory)
+    order_id = client.post("/api/orders", json=ORDER).json()["id"]
+
+    paid = client.post(f"/api/payments/simulate/{order_id}", headers={"Idempotency-Key": "pay-1"})
+    assert paid.status_code == 200 and paid.json()["status"] == "paid"
+    retry = client.post(f"/api/payments/simulate/{order_id}", headers={"Idempotency-Key": "pay-1"})
+    assert retry.status_code == 200 and retry.headers["Idempotent-Replayed"] == "true"
+    # 沒有 key 的重送仍照舊回報已付款
+    assert client.post(f"/api/payments/simulate/{order_id}").status_code == 400
+    # 另一張訂單用同一個 key 付款，不會重播第一張訂單的回應
+    other_id = client.post("/api/orders", json={"items": [{"product_id": 1, "quantity": 1}]}).json()["id"]
+    other = client.post(f"/api/payments/simulate/{other_id}", headers={"Idempotency-Key": "pay-1"})
+    assert other.status_code == 200 and other.json()["id"] == other_id
+    assert "Idempotent-Replayed" not in other.headers
+
+    with session_factory() as db:
+        db.get(IdempotencyKey, (f"payments:{order_id}", "pay-1")).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        assert idempotency_service.purge_expired(db) == 1
+        assert db.query(IdempotencyKey).count() == 1
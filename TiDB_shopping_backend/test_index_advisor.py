@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from models import Product
+from scripts.index_advisor import create_missing_indexes, run_advisor
+
+
+def test_hot_queries_use_indexes(sqlite_engine, session_factory):
+    report = run_advisor(sqlite_engine)
+
+    assert report["flavor"] == "sqlite"
+    assert report["violations"] == []
+    # 檢查用的測試資料一律 rollback
+    with session_factory() as db:
+        assert db.query(Product).count() == 0
+
+
+def test_missing_index_is_flagged_and_recreated(sqlite_engine):
+    with sqlite_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_order_items_order_id"))
+
+    flagged = {(v["query"], v["table"]) for v in run_advisor(sqlite_engine)["violations"]}
+    assert ("GET /api/orders", "order_items") in flagged
+
+    assert create_missing_indexes(sqlite_engine) == ["order_items.ix_order_items_order_id"]
+    assert run_advisor(sqlite_engine)["violations"] == []
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from models import Category, Product, ProductSales, User
+from services import order_service, outbox_service
+from services.leaderboard_service import _insert_missing, reconcile, top_products
+
+
+def seed(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        for pid in (1, 2, 3):
+            db.add(Product(id=pid, name=f"p{pid}", price=10.0 * pid, stock=100, sold=0, category_name="c"))
+        db.commit()
+
+
+def test_incremental_leaderboard_matches_full_recompute(session_factory):
+    seed(session_factory)
+    with session_factory() as db:
+        first = order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}])
+        order_service.create_order(db, "u1", [{"product_id": 2, "quantity": 5}])
+        cancelled = order_service.create_order(db, "u1", [{"product_id": 3, "quantity": 9}])
+        order_service.cancel_order(db, "u1", cancelled.id)
+        order_service.update_order_status(db, first.id, "shipped")
+        outbox_service.drain(db)
+
+        ranking = [(p.id, units) for p, units in top_products(db, 3)]
+        assert ranking == [(2, 6), (1, 2), (3, 0)]
+        assert db.get(ProductSales, 2).order_count == 2
+        assert reconcile(db)["mismatch_count"] == 0
+
+
+def test_reconcile_repairs_drift(session_factory):
+    seed(session_factory)
+    with session_factory() as db:
+        order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 4}])
+        outbox_service.drain(db)
+        db.get(ProductSales, 1).units_sold = 999
+        db.commit()
+
+        result = reconcile(db, repair=True)
+        assert result["mismatch_count"] == 1
+        assert db.get(ProductSales, 1).units_sold == 4
+        assert reconcile(db)["mismatch_count"] == 0
+
+
+def test_concurrent_first_sale_is_merged(session_factory):
+    seed(session_factory)
+    sold_at = datetime(2024, 1, 1)
+    with session_factory() as db:
+        # 另一個 worker 在查詢既有列之後、INSERT 之前已建立同一商品的排行榜列
+        _insert_missing(db, [{"product_id": 1, "units_sold": 2, "order_count": 1, "revenue": 20.0,
+                              "last_sold_date": sold_at, "updated_at": sold_at}])
+        _insert_missing(db, [{"product_id": 1, "units_sold": 3, "order_count": 1, "revenue": 30.0,
+                              "last_sold_date": sold_at, "updated_at": sold_at}])
+        db.commit()
+        row = db.get(ProductSales, 1)
+        assert (row.units_sold, row.order_count, row.revenue) == (5, 2, 50.0)
@@ -0,0 +1,58 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+import logging_config
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    logging_config.shutdown()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    for name in ("app.test", "sqlalchemy", "database.InstrumentedQueuePool"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+def test_json_records_with_module_levels(restore_root_logger):
+    stream = io.StringIO()
+    logging_config.configure_logging(level="WARNING", levels="app.test=DEBUG", fmt="json", stream=stream)
+    logger = logging.getLogger("app.test")
+    logger.debug("訂單 %s 已建立", "o1", extra={"user_id": "u1"})
+    logging.getLogger("app.other").info("不輸出")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("失敗")
+    logging_config.shutdown()  # 等背景執行緒寫完
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["msg"] for r in records] == ["訂單 o1 已建立", "失敗"]
+    assert records[0]["level"] == "DEBUG" and records[0]["user_id"] == "u1"
+    assert "ValueError: boom" in records[1]["exc_info"]
+
+
+def test_sampling_keeps_first_records_then_one_in_n_and_all_warnings():
+    sampler = logging_config.SamplingFilter(period=60, initial=3, thereafter=5)
+
+    def record(level, msg):
+        return logging.makeLogRecord({"name": "app", "levelno": level, "msg": msg})
+
+    passed = [sampler.filter(record(logging.INFO, "request %s")) for _ in range(13)]
+    assert passed == [True] * 3 + [False] * 4 + [True] + [False] * 4 + [True]
+    assert sampler.filter(record(logging.INFO, "另一個訊息"))  # 以訊息樣板分別計數
+    assert all(sampler.filter(record(logging.WARNING, "request %s")) for _ in range(10))
+    assert sampler.dropped == 8
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logging_config.NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for n in range(5):
+        handler.handle(logging.makeLogRecord({"name": "app", "levelno": logging.INFO, "msg": f"m{n}"}))
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
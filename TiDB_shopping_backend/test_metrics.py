@@ -0,0 +1,71 @@
+import pstats
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+import database
+import metrics
+from api import orders
+from dependencies.auth import get_current_user_id
+from models import Category, Product, User
+
+
+def make_client(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.add(Product(id=1, name="p1", price=10.0, stock=10, sold=0, category_name="c"))
+        db.commit()
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(orders.router)
+    app.add_api_route("/metrics", lambda: PlainTextResponse(metrics.render()))
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[database.get_db] = get_db
+    app.dependency_overrides[get_current_user_id] = lambda: "u1"
+    return TestClient(app)
+
+
+def test_requests_are_labelled_by_route_template_with_sql_counts(session_factory):
+    client = make_client(session_factory)
+    created = client.post("/api/orders", json={"items": [{"product_id": 1, "quantity": 1}]}).json()
+    labels = ("GET", "/api/orders/{order_id}")
+    before = metrics.REQUEST_STATEMENTS.count(labels)
+
+    assert client.get(f"/api/orders/{created['id']}").status_code == 200
+    assert client.get("/api/orders/missing").status_code == 404
+
+    assert metrics.REQUEST_STATEMENTS.count(labels) == before + 2
+    assert metrics.REQUESTS.value(labels + ("404",)) >= 1
+    text = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/orders/{order_id}"}' in text
+    assert "/api/orders/missing" not in text  # 路徑參數不會變成標籤
+    # 下單請求至少執行了查商品、扣庫存、寫訂單與明細
+    post_sum = next(
+        line for line in text.splitlines()
+        if line.startswith('http_request_db_statements_sum{method="POST",route="/api/orders"}')
+    )
+    assert float(post_sum.rsplit(" ", 1)[1]) >= 4
+
+
+def test_profile_header_writes_a_profile(session_factory, tmp_path, monkeypatch):
+    client = make_client(session_factory)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path / "profiles"))
+
+    # 未啟用時忽略標頭
+    assert "X-Profile-File" not in client.get("/api/orders", headers={"X-Profile": "1"}).headers
+
+    monkeypatch.setattr(metrics, "PROFILING_ENABLED", True)
+    response = client.get("/api/orders", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    path = response.headers["X-Profile-File"]
+    assert path.startswith(str(tmp_path)) and path.endswith(".prof")
+    # 同步端點在 threadpool 執行，profile 需包含端點函式本身
+    functions = {name for (_, _, name) in pstats.Stats(path).stats}
+    assert "list_orders" in functions
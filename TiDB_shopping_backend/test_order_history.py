@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import Category, Order, OrderItem, Product, User
+from services import order_service
+
+
+def seed_orders(session_factory, user_id, order_count, items_per_order=3):
+    with session_factory() as db:
+        if db.get(Category, "c") is None:
+            db.add(Category(name="c"))
+            for pid in (1, 2, 3):
+                db.add(Product(id=pid, name=f"p{pid}", price=10.0, stock=100, sold=0, category_name="c"))
+        db.add(User(id=user_id, name=user_id, email=f"{user_id}@example.com", password="x"))
+        start = datetime(2024, 1, 1)
+        for n in range(order_count):
+            order_id = f"{user_id}-o{n}"
+            db.add(Order(
+                id=order_id, order_number=f"ORD-{order_id}", order_date=start + timedelta(hours=n),
+                total_amount=10.0 * items_per_order, status="PENDING", user_id=user_id
+            ))
+            for i in range(items_per_order):
+                db.add(OrderItem(
+                    id=f"{order_id}-i{i}", order_id=order_id, product_id=i % 3 + 1,
+                    product_name=f"p{i % 3 + 1}", quantity=1, price=10.0
+                ))
+        db.commit()
+
+
+def count_queries(engine, session_factory, user_id):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with session_factory() as db:
+            orders, _ = order_service.list_orders(db, user_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return orders, len(statements)
+
+
+def test_order_history_query_count_is_constant(sqlite_engine, session_factory):
+    seed_orders(session_factory, "few", 2)
+    seed_orders(session_factory, "many", 60)
+
+    few, few_queries = count_queries(sqlite_engine, session_factory, "few")
+    many, many_queries = count_queries(sqlite_engine, session_factory, "many")
+
+    assert len(few) == 2 and len(many) == 60
+    assert all(len(order["items"]) == 3 for order in many)
+    # 訂單一次 + 明細一次；若回到逐筆 lazy load 會變成 1 + N
+    assert many_queries == few_queries == 2
+    # 新到舊排序
+    assert [o["id"] for o in many[:2]] == ["many-o59", "many-o58"]
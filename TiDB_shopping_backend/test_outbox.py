@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+
+from models import Category, OutboxEvent, Product, ProductSales, User
+from models.order import PriceAdjustHistory
+from services import order_service, outbox_service
+
+
+def seed(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.add(Product(id=1, name="p1", price=10.0, stock=1000, sold=0, category_name="c"))
+        db.add(Product(id=2, name="p2", price=20.0, stock=501, sold=0, category_name="c"))
+        db.commit()
+
+
+def test_checkout_defers_side_effects_to_one_batch(session_factory):
+    seed(session_factory)
+    with session_factory() as db:
+        for _ in range(3):
+            order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 1}])
+
+        # 結帳只扣庫存、調價並寫入事件；第二、三張訂單都讓庫存低於門檻，但每個商品只調一次
+        assert db.get(Product, 1).sold == 0
+        assert db.get(Product, 2).stock == 498
+        assert db.get(Product, 2).price == 30.0
+        assert db.query(PriceAdjustHistory).count() == 1
+        assert db.query(ProductSales).count() == 0
+        assert outbox_service.backlog(db)["pending"] == 3
+
+        outbox_service.stats.reset()
+        assert outbox_service.drain(db, batch_size=10) == 3
+        assert outbox_service.stats.snapshot()["last_batch_size"] == 3
+        db.expire_all()
+        assert (db.get(Product, 1).sold, db.get(Product, 2).sold) == (3, 3)
+        assert db.get(ProductSales, 1).order_count == 3
+        assert outbox_service.backlog(db)["pending"] == 0
+
+
+def test_price_bump_is_claimed_once(session_factory):
+    seed(session_factory)
+    now = datetime.utcnow()
+    with session_factory() as db:
+        # 兩筆結帳都在讀到調價紀錄前判定要調價：只有先寫入 price_adjust_history 的一方調價
+        assert order_service.claim_price_bumps(db, [2], now) == {2}
+        assert order_service.claim_price_bumps(db, [2], now) == set()
+        db.commit()
+        assert db.get(Product, 2).price == 30.0
+        assert db.query(PriceAdjustHistory).count() == 1
+
+
+def test_bad_event_is_isolated_and_dead_lettered(session_factory, monkeypatch):
+    seed(session_factory)
+    monkeypatch.setattr(outbox_service, "OUTBOX_MAX_ATTEMPTS", 2)
+    with session_factory() as db:
+        outbox_service.enqueue(db, "unknown", "x", {})
+        db.commit()
+        order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 2}])
+
+        assert outbox_service.process_batch(db) == 1
+        assert outbox_service.process_batch(db) == 0
+        backlog = outbox_service.backlog(db)
+        assert (backlog["pending"], backlog["dead_letters"]) == (0, 1)
+        assert db.get(Product, 1).sold == 2
+        assert "unknown" in db.query(OutboxEvent).filter(OutboxEvent.event_type == "unknown").one().last_error
+
+
+def test_worker_processes_events_in_background(session_factory):
+    seed(session_factory)
+    with session_factory() as db:
+        order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 5}])
+
+    async def run():
+        worker = outbox_service.OutboxWorker(session_factory, batch_size=50, poll_interval=0.01)
+        worker.start()
+        for _ in range(200):
+            if worker.stats()["events"]:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        return worker
+
+    outbox_service.stats.reset()
+    worker = asyncio.run(run())
+    assert not worker.running
+    with session_factory() as db:
+        assert db.get(Product, 1).sold == 5
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from models import Category, Order, Product, User
+from schemas.product import ProductOut
+from pagination import encode_cursor
+from services import order_service, product_service
+
+
+def seed_products(session_factory):
+    with session_factory() as db:
+        db.add_all([Category(name="a"), Category(name="b")])
+        for pid in range(1, 41):
+            # 價格與名稱刻意重複，驗證同值時以 id 穩定排序、不漏不重
+            db.add(Product(
+                id=pid, name=f"p{pid % 7}", price=float(pid % 5), stock=1, sold=0,
+                category_name="a" if pid % 3 else "b"
+            ))
+        # 名稱 / 價格為 NULL 的商品也不能被 keyset 漏掉（NULL 排在最小）
+        for pid in range(41, 45):
+            db.add(Product(id=pid, name=None, price=None, stock=1, sold=0, category_name="a"))
+        db.commit()
+
+
+def walk_pages(db, category, sort_by, limit):
+    seen, cursor = [], None
+    while True:
+        page, cursor = product_service.load_product_list(db, category, sort_by, 0, limit, cursor)
+        seen.extend(p["id"] for p in page)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("sort_by", [None, "price_asc", "price_desc", "name_asc"])
+@pytest.mark.parametrize("category", [None, "a"])
+def test_product_cursor_pages_match_full_ordering(session_factory, sort_by, category):
+    seed_products(session_factory)
+    with session_factory() as db:
+        full, cursor = product_service.load_product_list(db, category, sort_by, 0, 100)
+        assert cursor is None
+        assert walk_pages(db, category, sort_by, 7) == [p["id"] for p in full]
+
+
+def test_product_list_selects_columns_without_entities(session_factory):
+    seed_products(session_factory)
+    with session_factory() as db:
+        page, _ = product_service.load_product_list(db, "a", "price_asc", 0, 5)
+        assert list(page[0]) == list(ProductOut.model_fields)
+        product_service.load_all_products_json(db)
+        assert len(db.identity_map) == 0  # 唯讀列表不建立 Product 實體
+
+
+def test_cursor_from_another_sort_mode_is_rejected(session_factory):
+    seed_products(session_factory)
+    with session_factory() as db:
+        _, cursor = product_service.load_product_list(db, None, "price_asc", 0, 5)
+        with pytest.raises(HTTPException) as exc:
+            product_service.load_product_list(db, None, "name_asc", 0, 5, cursor)
+        assert exc.value.status_code == 400
+        with pytest.raises(HTTPException):
+            product_service.load_product_list(db, None, None, 0, 5, "not-a-cursor")
+
+
+@pytest.mark.parametrize("values", [[], [1.0], [1.0, 2, 3], [{"x": 1}, 2], [[1], 2]])
+def test_tampered_cursor_is_rejected(session_factory, values):
+    seed_products(session_factory)
+    with session_factory() as db:
+        db.add(User(id="u1", name="u1", email="u1@example.com", password="x"))
+        db.commit()
+        for load, mode in (
+            (lambda c: product_service.load_product_list(db, None, "price_asc", 0, 5, c), "products:price_asc:"),
+            (lambda c: order_service.list_orders(db, "u1", 5, c), "orders"),
+        ):
+            with pytest.raises(HTTPException) as exc:
+                load(encode_cursor(mode, values))
+            assert exc.value.status_code == 400
+
+
+def test_order_history_cursor_pages(session_factory):
+    with session_factory() as db:
+        db.add(User(id="u1", name="u1", email="u1@example.com", password="x"))
+        start = datetime(2024, 1, 1)
+        for n in range(25):
+            # 每兩筆同一時間，驗證 order_date 相同時以 id 區分
+            db.add(Order(
+                id=f"o{n:02d}", order_number=f"ORD-{n}", order_date=start + timedelta(hours=n // 2),
+                total_amount=1.0, status="PENDING", user_id="u1"
+            ))
+        db.commit()
+
+        full, cursor = order_service.list_orders(db, "u1")
+        assert cursor is None and len(full) == 25
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = order_service.list_orders(db, "u1", 4, cursor)
+            seen.extend(o["id"] for o in page)
+            if cursor is None:
+                break
+        assert seen == [o["id"] for o in full]
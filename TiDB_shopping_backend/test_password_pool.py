@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+import utils
+from utils import PasswordPool
+
+
+@pytest.fixture
+def pool():
+    # 低 rounds 讓測試跑得快；worker=1、佇列=0 方便製造滿載
+    pool = PasswordPool(workers=1, queue_size=0, timeout=30, rounds=4)
+    yield pool
+    pool.shutdown()
+
+
+def test_hash_and_verify_in_worker_process(pool):
+    hashed = pool.hash("secret-password")
+    assert hashed.startswith("$2b$04$")
+    assert pool.verify("secret-password", hashed)
+    assert not pool.verify("wrong-password", hashed)
+
+    stats = pool.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["compute_seconds_avg"] > 0
+
+
+def test_full_queue_returns_429(pool, monkeypatch):
+    # 以 Event 佔住唯一的 slot（改用 thread pool，worker 等到 release 才完成）
+    release = threading.Event()
+
+    def blocked_verify(plain_password, hashed_password):
+        release.wait(10)
+        return True, 0.0
+
+    monkeypatch.setattr(utils, "_verify_in_worker", blocked_verify)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pool, "_get_executor", lambda: executor)
+
+    worker = threading.Thread(target=pool.verify, args=("secret-password", "hashed"))
+    worker.start()
+    deadline = time.monotonic() + 10
+    while pool.stats()["in_flight"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    try:
+        with pytest.raises(HTTPException) as exc:
+            pool.hash("another-password")
+    finally:
+        release.set()
+        worker.join()
+        executor.shutdown()
+
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+
+def test_timed_out_task_keeps_its_slot_until_it_finishes(pool, monkeypatch):
+    # 逾時後仍在執行的工作繼續佔用名額，直到真正結束才歸還
+    release = threading.Event()
+
+    def blocked_verify(plain_password, hashed_password):
+        release.wait(10)
+        return True, 0.0
+
+    monkeypatch.setattr(utils, "_verify_in_worker", blocked_verify)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pool, "_get_executor", lambda: executor)
+    pool.timeout = 0.05
+
+    try:
+        with pytest.raises(HTTPException) as exc:
+            pool.verify("secret-password", "hashed")
+        assert exc.value.status_code == 503
+        with pytest.raises(HTTPException) as exc:
+            pool.verify("secret-password", "hashed")
+        assert exc.value.status_code == 429
+
+        release.set()
+        deadline = time.monotonic() + 10
+        while pool.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()["in_flight"] == 0
+        assert pool.verify("secret-password", "hashed") is True
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database
+from api import product
+from models import Category, Order, Product, SalesDaily, User
+from services import order_service, outbox_service, sales_rollup_service
+
+
+def seed(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.add(Product(id=1, name="p1", price=10.0, stock=1000, sold=0, category_name="c"))
+        db.commit()
+
+
+def add_order(db, order_id, order_date, status="PENDING", total=10.0):
+    db.add(Order(id=order_id, order_number=order_id, order_date=order_date, total_amount=total,
+                 status=status, user_id="u1"))
+    db.commit()
+    return db.get(Order, order_id)
+
+
+def test_hooks_keep_rollup_in_step_with_orders(session_factory):
+    seed(session_factory)
+    now = datetime.utcnow()
+    with session_factory() as db:
+        for i, days_ago in enumerate((0, 0, 3, 3, 3, 40, 400)):
+            order = add_order(db, f"o{i}", now - timedelta(days=days_ago), total=10.0 * (i + 1))
+            order_service.update_order_status(db, order.id, "paid")
+        # 付款後取消 / 出貨不影響計數；回到非計入狀態會扣回
+        order_service.update_order_status(db, "o3", "shipped")
+        order_service.update_order_status(db, "o4", "refunded")
+        created = order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 1}])
+        outbox_service.drain(db)
+
+        trends = sales_rollup_service.sales_trends(db, 365)
+        live = sales_rollup_service.live_buckets(db, now - timedelta(days=365))
+        assert [(t.sale_date, t.orders_count, t.revenue) for t in trends] == live
+        assert [t.orders_count for t in trends] == [1, 2, 2]
+        assert trends[1].avg_order_value == 35.0
+
+        # 待付款訂單不計入；今天的區間即時計算
+        assert created.status == "PENDING"
+        three_days_ago = (now - timedelta(days=3)).date()
+        assert db.get(SalesDaily, three_days_ago).orders_count == 2
+        assert db.get(SalesDaily, now.date()).orders_count == 2
+
+
+def test_rebuild_backfills_history_and_hourly(session_factory):
+    seed(session_factory)
+    now = datetime.utcnow()
+    with session_factory() as db:
+        # 直接寫入的歷史訂單沒有經過 hook
+        for i in range(5):
+            add_order(db, f"h{i}", now - timedelta(days=2, minutes=i), status="delivered", total=20.0)
+        assert sales_rollup_service.sales_trends(db, 7) == []
+
+        result = sales_rollup_service.rebuild(db, (now - timedelta(days=30)).date())
+        assert result["buckets"]["day"] == 1
+        trends = sales_rollup_service.sales_trends(db, 7)
+        assert [(t.orders_count, t.revenue) for t in trends] == [(5, 100.0)]
+
+        hourly = sales_rollup_service.sales_trends(db, 7, "hour")
+        assert sum(t.orders_count for t in hourly) == 5
+        assert all(t.sale_date.minute == 0 for t in hourly)
+
+
+def test_sales_trends_route_returns_iso_dates(session_factory):
+    seed(session_factory)
+    with session_factory() as db:
+        add_order(db, "o1", datetime.utcnow(), status="paid")
+
+    app = FastAPI()
+    app.include_router(product.router)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[database.get_analytics_db] = get_db
+    client = TestClient(app)
+    hourly = client.get("/api/analytics/sales-trends", params={"granularity": "hour"}).json()["data"]
+    # 與改版前相同使用 isoformat（日期與時間以 T 分隔）
+    assert hourly[0]["date"] == datetime.fromisoformat(hourly[0]["date"]).strftime("%Y-%m-%dT%H:00:00")
+    daily = client.get("/api/analytics/sales-trends").json()["data"]
+    assert daily[0]["date"] == datetime.utcnow().date().isoformat()
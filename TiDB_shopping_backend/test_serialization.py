@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+import database
+import serialization
+from api import orders, product
+from dependencies.auth import get_current_user_id
+from models import Category, Order, Product, User
+from models.order_item import OrderItem
+from schemas.order import OrderOut
+from schemas.product import ProductOut
+from services import catalog_cache
+
+
+def test_fast_path_matches_response_model_output(session_factory):
+    with session_factory() as db:
+        db.add(Category(name="茶"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        for pid in range(1, 6):
+            db.add(Product(id=pid, name=f"烏龍 {pid}", price=pid * 1.5, stock=9, sold=pid,
+                           description="x" * 100, category_name="茶" if pid % 2 else None))
+        db.add(Order(id="o1", order_number="ORD-1", order_date=datetime(2024, 5, 1, 12, 30, 0, 123456),
+                     total_amount=4.5, status="paid", user_id="u1"))
+        db.add_all([OrderItem(id=f"i{n}", order_id="o1", product_id=n, product_name=f"烏龍 {n}",
+                              quantity=1, price=n * 1.5) for n in (1, 2)])
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(product.router)
+    app.include_router(orders.router)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    for dependency in (database.get_db, database.get_admin_db):
+        app.dependency_overrides[dependency] = get_db
+    app.dependency_overrides[get_current_user_id] = lambda: "u1"
+    catalog_cache.invalidate_products()
+    client = TestClient(app)
+
+    # 與原本由 FastAPI 以 response_model 驗證、序列化的結果逐位元組相同
+    products_adapter = TypeAdapter(List[ProductOut])
+    with session_factory() as db:
+        all_products = db.query(Product).order_by(Product.id).all()
+        expected_products = products_adapter.dump_json(products_adapter.validate_python(all_products))
+        expected_first_page = products_adapter.dump_json(products_adapter.validate_python(all_products[:2]))
+        expected_order = OrderOut.model_validate(db.get(Order, "o1")).model_dump_json().encode()
+
+    first_page = client.get("/api/products", params={"limit": 2})
+    assert first_page.headers["content-type"] == "application/json"
+    assert first_page.content == expected_first_page
+    second_page = client.get("/api/products", params={"limit": 2, "cursor": first_page.headers["X-Next-Cursor"]})
+    assert [p["id"] for p in second_page.json()] == [3, 4]
+    assert client.get("/api/admin/products").content == expected_products
+    assert client.get("/api/orders").content == b"[" + expected_order + b"]"
+    assert client.get("/api/orders/o1").content == expected_order
+
+
+def test_stdlib_fallback_and_decimal_values(monkeypatch):
+    content = {"revenue": Decimal("12.50"), "units": Decimal("3"), "at": datetime(2024, 1, 2, 3, 4, 5), "名稱": "茶"}
+    with_orjson = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(content) == with_orjson
+    assert json.loads(with_orjson) == {"revenue": 12.5, "units": 3, "at": "2024-01-02T03:04:05", "名稱": "茶"}
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import Category, Order, OrderItem, Product, ProductSales, SyncRun, User
+from services import order_service, outbox_service, sold_sync_service
+
+
+def seed(session_factory, count=10):
+    with session_factory() as db:
+        db.add(Category(name="c"))
+        for pid in range(1, count + 1):
+            db.add(Product(id=pid, name=f"p{pid}", price=1.0, stock=100, sold=0, category_name="c"))
+        db.commit()
+
+
+def add_order(db, order_id, status, items):
+    db.add(Order(id=order_id, order_number=order_id, status=status, total_amount=0))
+    for i, (pid, qty) in enumerate(items):
+        db.add(OrderItem(id=f"{order_id}-{i}", order_id=order_id, product_id=pid,
+                         product_name=f"p{pid}", quantity=qty, price=1.0))
+
+
+def test_full_sync_fixes_drift_with_one_update_per_chunk(sqlite_engine, session_factory):
+    seed(session_factory, 10)
+    with session_factory() as db:
+        add_order(db, "o1", "paid", [(1, 2), (2, 3)])
+        add_order(db, "o2", "cancelled", [(1, 5)])
+        add_order(db, "o3", "PENDING", [(2, 1)])
+        db.get(Product, 9).sold = 7  # 沒有任何訂單卻有銷量
+        db.commit()
+
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda c, cur, st, p, ctx, em: statements.append(st))
+    with session_factory() as db:
+        run = sold_sync_service.run_to_dict(sold_sync_service.sync_sold(db, chunk_size=4))
+
+    # 每塊兩句 UPDATE（同步有訂單明細的商品、無明細的歸零），10 個商品分成 3 塊
+    assert sum(st.lstrip().upper().startswith("UPDATE PRODUCTS") for st in statements) == 6
+    assert (run["status"], run["mode"], run["rows_changed"], run["chunks"], run["products_checked"]) == (
+        "success", "full", 3, 3, 10
+    )
+    assert run["duration_ms"] is not None
+    with session_factory() as db:
+        assert {p.id: p.sold for p in db.query(Product)} == {1: 2, 2: 4, **{pid: 0 for pid in range(3, 11)}}
+        # 再執行一次沒有任何差異
+        assert sold_sync_service.sync_sold(db).rows_changed == 0
+        assert db.query(SyncRun).count() == 2
+
+
+def test_incremental_sync_only_touches_recently_changed_products(session_factory):
+    seed(session_factory, 5)
+    with session_factory() as db:
+        sold_sync_service.sync_sold(db)
+        add_order(db, "o1", "paid", [(1, 2), (2, 3)])
+        # 排行榜 hook 只更新了商品 1；商品 2 的異動很久以前就處理過
+        db.add(ProductSales(product_id=1, units_sold=2, order_count=1, updated_at=datetime.utcnow()))
+        db.add(ProductSales(product_id=2, units_sold=3, order_count=1,
+                            updated_at=datetime.utcnow() - timedelta(days=1)))
+        db.commit()
+
+        run = sold_sync_service.sync_sold(db, incremental=True)
+        assert (run.mode, run.products_checked, run.rows_changed) == ("incremental", 1, 1)
+        assert db.get(Product, 1).sold == 2
+        assert db.get(Product, 2).sold == 0
+
+        assert [r.mode for r in sold_sync_service.recent_runs(db)] == ["incremental", "full"]
+
+
+def test_incremental_without_previous_run_falls_back_to_full(session_factory):
+    seed(session_factory, 3)
+    with session_factory() as db:
+        run = sold_sync_service.sync_sold(db, incremental=True)
+        assert run.mode == "full" and run.products_checked == 3
+
+
+def test_outbox_sold_matches_resync_after_cancel(session_factory):
+    seed(session_factory, 3)
+    with session_factory() as db:
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.commit()
+        order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 2}])
+        cancelled = order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 3}, {"product_id": 2, "quantity": 1}])
+        outbox_service.drain(db)
+        order_service.cancel_order(db, "u1", cancelled.id)
+        outbox_service.drain(db)
+        db.expire_all()
+        assert (db.get(Product, 1).sold, db.get(Product, 2).sold) == (2, 0)
+
+        # outbox 維護的 sold 與重新同步的規則相同，全量 / 增量同步都不需要修正
+        assert sold_sync_service.sync_sold(db).rows_changed == 0
+        assert sold_sync_service.sync_sold(db, incremental=True).rows_changed == 0
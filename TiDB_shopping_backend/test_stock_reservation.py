@@ -0,0 +1,144 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from models import Category, Order, OrderItem, OutboxEvent, Product, User
+from services import order_service, outbox_service
+from services.stock_service import (
+    ConflictStats,
+    InsufficientStock,
+    configure_sharding,
+    is_write_conflict,
+    load_shard_info,
+    reserve_stock,
+    stats,
+)
+
+
+def seed(session_factory, stock):
+    with session_factory() as db:
+        db.add(Category(name="flash"))
+        db.add(User(id="u1", name="buyer", email="buyer@example.com", password="x"))
+        db.add(Product(id=1, name="限量商品", price=100.0, stock=stock, sold=0, category_name="flash"))
+        db.commit()
+
+
+def test_reserve_stock_rejects_insufficient(session_factory):
+    seed(session_factory, stock=5)
+    with session_factory() as db:
+        with pytest.raises(InsufficientStock) as exc:
+            reserve_stock(db, {1: 6})
+        assert exc.value.product_id == 1
+        db.rollback()
+        reserve_stock(db, {1: 5})
+        db.commit()
+        assert db.get(Product, 1).stock == 0
+
+
+def test_concurrent_orders_never_oversell(session_factory):
+    stock = 100
+    attempts = 300
+    seed(session_factory, stock=stock)
+    stats.reset()
+
+    def place(_):
+        with session_factory() as db:
+            try:
+                order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 1}])
+                return True
+            except HTTPException as e:
+                assert e.status_code == 400
+                return False
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(place, range(attempts)))
+
+    with session_factory() as db:
+        product = db.get(Product, 1)
+        sold_units = sum(i.quantity for i in db.query(OrderItem).all())
+        assert sum(results) == stock
+        assert product.stock == 0
+        assert sold_units == stock
+        assert db.query(Order).count() == stock
+
+    snapshot = {row["product_id"]: row for row in stats.snapshot()}
+    assert snapshot[1]["insufficient"] == attempts - stock
+
+
+def test_concurrent_cancels_release_stock_once(session_factory, monkeypatch):
+    seed(session_factory, stock=10)
+    with session_factory() as db:
+        order_id = order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 4}]).id
+
+    # 兩個取消請求都先讀到 PENDING，再同時嘗試轉換狀態
+    both_checked = threading.Barrier(2)
+    change_order_status = order_service.change_order_status
+
+    def change_after_both_checked(db, order, new_status):
+        both_checked.wait(timeout=5)
+        return change_order_status(db, order, new_status)
+
+    monkeypatch.setattr(order_service, "change_order_status", change_after_both_checked)
+
+    def cancel(_):
+        with session_factory() as db:
+            try:
+                order_service.cancel_order(db, "u1", order_id)
+                return 200
+            except HTTPException as e:
+                return e.status_code
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert sorted(pool.map(cancel, range(2))) == [200, 409]
+
+    with session_factory() as db:
+        assert db.get(Product, 1).stock == 10
+        assert db.query(OutboxEvent).filter(OutboxEvent.event_type == outbox_service.ORDER_STATUS_CHANGED).count() == 1
+
+
+def test_is_write_conflict_recognises_tidb_codes():
+    class FakeDBError(Exception):
+        def __init__(self, code):
+            self.orig = Exception(code, "Write conflict")
+
+    assert is_write_conflict(FakeDBError(9007))
+    assert is_write_conflict(FakeDBError(1213))
+    assert not is_write_conflict(FakeDBError(1146))
+    # 重複鍵由 upsert 處理，不重試
+    assert not is_write_conflict(FakeDBError(1062))
+
+
+def test_conflict_stats_keep_most_recent_products():
+    bounded = ConflictStats(max_products=2)
+    bounded.record_attempt([1, 2])
+    bounded.record_conflict([1])
+    bounded.record_attempt([3])
+    assert sorted(row["product_id"] for row in bounded.snapshot()) == [1, 3]
+    assert bounded.evicted == 1
+
+
+def test_sharded_stock_never_oversells_and_falls_back(session_factory):
+    seed(session_factory, stock=50)
+    with session_factory() as db:
+        configure_sharding(db, db.get(Product, 1), 4)
+        db.commit()
+        assert load_shard_info(db, [1]) == {1: (4, 50)}
+
+    def place(_):
+        with session_factory() as db:
+            try:
+                order_service.create_order(db, "u1", [{"product_id": 1, "quantity": 3}])
+                return True
+            except HTTPException:
+                return False
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(place, range(40)))
+
+    with session_factory() as db:
+        # 50 // 3 = 16 筆訂單可以成立；最後幾筆需要跨分片湊齊
+        assert sum(results) == 16
+        assert load_shard_info(db, [1])[1][1] == 2
+        assert db.get(Product, 1).stock == 0
@@ -1,4 +1,11 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from fastapi import HTTPException
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
 from jose import jwt
 from datetime import datetime, timedelta
 
@@ -6,7 +13,10 @@ SECRET_KEY = "your-secret-key"  # 請替換為更安全的值
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost（每 +1 約加倍 CPU 時間）；既有雜湊的 rounds 記在雜湊值內，調整後仍可驗證
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -21,3 +31,132 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# ------------------------------
+# 密碼雜湊 worker pool
+# bcrypt 每次約 100–300ms CPU，直接在 request thread 執行會在登入尖峰拖慢所有 API。
+# 改交由獨立的 process pool 計算，佇列有上限，滿了直接回 429 讓客戶端稍後重試。
+# 可用環境變數調整：
+#   PASSWORD_POOL_WORKERS（預設 CPU 數，最多 4）/ PASSWORD_POOL_QUEUE_SIZE / PASSWORD_POOL_TIMEOUT
+# ------------------------------
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def _hash_in_worker(password: str, rounds: int):
+    return _timed(bcrypt.using(rounds=rounds).hash, password)
+
+
+def _verify_in_worker(plain_password: str, hashed_password: str):
+    return _timed(pwd_context.verify, plain_password, hashed_password)
+
+
+class PasswordPool:
+    """有界佇列的 bcrypt process pool，並記錄排隊 / 計算時間"""
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.rounds = rounds
+        # 執行中 + 排隊中的工作總數上限
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.compute_seconds_total = 0.0
+        self.compute_seconds_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # 第一次使用時才建立，避免 import 時就啟動子行程
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="登入請求過多，請稍後再試",
+                headers={"Retry-After": "1"},
+            )
+        submitted = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        try:
+            result, compute_seconds = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 已在子行程執行中的 bcrypt 無法取消：名額在工作真正結束時才由 done callback 歸還，
+            # 逾時的請求不會讓實際排隊的工作數超過 workers + queue_size（已取消的 future 會立即呼叫 callback）
+            future.cancel()
+            future.add_done_callback(self._release)
+            with self._lock:
+                self.timeouts += 1
+            raise HTTPException(status_code=503, detail="密碼驗證逾時，請稍後再試")
+        except BaseException:
+            self._release()
+            raise
+        self._release()
+        elapsed = time.perf_counter() - submitted
+        with self._lock:
+            self.completed += 1
+            self.compute_seconds_total += compute_seconds
+            self.compute_seconds_max = max(self.compute_seconds_max, compute_seconds)
+            self.wait_seconds_total += max(elapsed - compute_seconds, 0.0)
+        return result
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash_in_worker, password, self.rounds)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify_in_worker, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "bcrypt_rounds": self.rounds,
+                "in_flight": self.in_flight,
+                "completed": done,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "queue_wait_seconds_avg": round(self.wait_seconds_total / done, 6) if done else 0.0,
+                "compute_seconds_avg": round(self.compute_seconds_total / done, 6) if done else 0.0,
+                "compute_seconds_max": round(self.compute_seconds_max, 6),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+password_pool = PasswordPool(
+    workers=int(os.getenv("PASSWORD_POOL_WORKERS", min(os.cpu_count() or 1, 4))),
+    queue_size=int(os.getenv("PASSWORD_POOL_QUEUE_SIZE", "16")),
+    timeout=float(os.getenv("PASSWORD_POOL_TIMEOUT", "10")),
+)